@@ -0,0 +1,29 @@
+"""Import recorder_server for benchmarks without the interactive prompt"""
+import io
+import os
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_server():
+    """
+    Import recorder_server answering 'local' to the backend prompt
+
+    The import runs inside a temporary directory so the run directory it
+    creates does not end up in the repository's snapshots/.
+    """
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    previous_cwd = os.getcwd()
+    previous_stdin = sys.stdin
+    os.chdir(tempfile.mkdtemp(prefix='recorder_bench_'))
+    sys.stdin = io.StringIO("local\n")
+    try:
+        import recorder_server
+    finally:
+        sys.stdin = previous_stdin
+        os.chdir(previous_cwd)
+    print()
+    return recorder_server
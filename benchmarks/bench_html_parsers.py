@@ -0,0 +1,157 @@
+"""
+Compare HTML parser backends on parse + field extraction
+
+Builds a synthetic corpus of form-heavy pages from 100 KB to 20 MB and, for
+every backend in HTML_PARSER_BACKEND's choices that is installed, measures
+the time to parse and extract visible fields and the peak memory (RSS
+growth, and Python allocations via tracemalloc, which does not see lxml's
+C heap). Each
+measurement runs in a separate process so peak RSS is not shared between
+runs.
+Extraction results are compared against html.parser and any difference is
+reported.
+
+Usage:
+    python benchmarks/bench_html_parsers.py [size_kb ...]
+"""
+import hashlib
+import multiprocessing
+import random
+import sys
+import time
+import tracemalloc
+
+from _load_server import load_server
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+BACKENDS = ['html.parser', 'lxml', 'html5lib']
+DEFAULT_SIZES_KB = [100, 1000, 5000, 20000]
+
+INPUT_TYPES = ['text', 'password', 'email', 'number', 'date', 'tel',
+               'url', 'search', 'checkbox', 'radio', 'hidden', 'submit']
+
+
+def build_page(size_kb, seed=0):
+    """Build a synthetic page of roughly size_kb kilobytes"""
+    rng = random.Random(seed)
+    target = size_kb * 1024
+    parts = ['<!DOCTYPE html><html><head><title>Synthetic</title></head><body>']
+    size = len(parts[0])
+    block = 0
+    while size < target:
+        block += 1
+        fields = []
+        for i in range(rng.randint(2, 8)):
+            field_type = rng.choice(INPUT_TYPES)
+            field_id = f"f{block}_{i}"
+            attrs = f'id="{field_id}" name="{field_id}" type="{field_type}"'
+            if rng.random() < 0.2:
+                attrs += ' style="display: none"'
+            if rng.random() < 0.1:
+                attrs += ' hidden'
+            if rng.random() < 0.3:
+                attrs += f' maxlength="{rng.randint(5, 80)}" placeholder="Value {i}"'
+            fields.append(
+                f'<div class="row"><label for="{field_id}">Field {field_id}</label>'
+                f'<input {attrs}><small class="hint">Hint for {field_id}</small></div>')
+        if rng.random() < 0.3:
+            fields.append(
+                f'<textarea id="t{block}" rows="3">Notes {block}</textarea>')
+        text = ' '.join(rng.choice(['lorem', 'ipsum', 'dolor', 'sit', 'amet'])
+                        for _ in range(rng.randint(20, 120)))
+        chunk = (f'<section id="s{block}"><h2>Section {block}</h2><p>{text}</p>'
+                 f'<form action="/submit/{block}"><fieldset><legend>Form {block}</legend>'
+                 f'{"".join(fields)}</fieldset></form>'
+                 f'<table><tr><td>{block}</td><td>{text[:40]}</td></tr></table></section>')
+        parts.append(chunk)
+        size += len(chunk)
+    parts.append('</body></html>')
+    return ''.join(parts)
+
+
+def extract(server, html, backend):
+    soup = server.make_soup(html, backend)
+    return [(identifier_type, identifier_value, server.is_element_visible(el))
+            for el, identifier_type, identifier_value in server.extract_target_fields(soup)]
+
+
+def measure(server, backend, size_kb, queue):
+    if server is None:
+        server = load_server()
+    html = build_page(size_kb)
+    rss_before = resource.getrusage(
+        resource.RUSAGE_SELF).ru_maxrss if resource else 0
+    start = time.perf_counter()
+    fields = extract(server, html, backend)
+    elapsed = time.perf_counter() - start
+    rss_growth = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss -
+                  rss_before) if resource else None
+
+    # Separate pass: tracemalloc slows parsing down too much to time it
+    tracemalloc.start()
+    extract(server, html, backend)
+    _, python_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    queue.put({
+        'seconds': elapsed,
+        'python_peak_mb': python_peak / 1024 / 1024,
+        # ru_maxrss is in KB on Linux
+        'rss_growth_mb': rss_growth / 1024 if rss_growth is not None else None,
+        'field_count': len(fields),
+        'fields_digest': hashlib.sha256(repr(fields).encode('utf-8')).hexdigest(),
+        'first_fields': fields[:200],
+    })
+
+
+def run_isolated(server, backend, size_kb):
+    # fork reuses the imported server; spawn re-imports it in the child
+    method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else 'spawn'
+    context = multiprocessing.get_context(method)
+    queue = context.Queue()
+    process = context.Process(target=measure, args=(
+        server if method == 'fork' else None, backend, size_kb, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def installed_backends(server):
+    available = []
+    for backend in BACKENDS:
+        try:
+            server.BeautifulSoup('<p></p>', backend)
+            available.append(backend)
+        except server.FeatureNotFound:
+            print(f"Skipping {backend}: not installed")
+    return available
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES_KB
+    server = load_server()
+    backends = installed_backends(server)
+
+    print(f"{'size':>9} {'backend':<12} {'seconds':>9} {'py peak MB':>11} {'RSS +MB':>9} {'fields':>7}  match")
+    for size_kb in sizes:
+        reference = None
+        for backend in backends:
+            result = run_isolated(server, backend, size_kb)
+            if reference is None:
+                reference = result
+            match = 'yes' if result['fields_digest'] == reference['fields_digest'] else 'NO'
+            rss = f"{result['rss_growth_mb']:9.1f}" if result['rss_growth_mb'] is not None else f"{'n/a':>9}"
+            print(f"{size_kb:>7}KB {backend:<12} {result['seconds']:9.3f} "
+                  f"{result['python_peak_mb']:11.1f} {rss} {result['field_count']:7d}  {match}")
+            if match == 'NO':
+                diff = [pair for pair in zip(reference['first_fields'], result['first_fields'])
+                        if pair[0] != pair[1]][:5]
+                print(f"    first differences vs html.parser: {diff}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""
+Time convert_to_katalon_format on recordings from 1K to 1M events
+
+Builds synthetic event logs (page loads, clicks, typing, submits, the
+extension's own suggestion events with duration_ms, clicks inside the
+suggestion modal and popup events) and times the conversion. For logs up to
+--check events the output is compared byte for byte with the original
+algorithm, which rescans the whole log for every kept event and is far too
+slow for the larger sizes.
+
+Usage:
+    python benchmarks/bench_katalon_conversion.py [--check N] [events ...]
+"""
+import hashlib
+import random
+import sys
+import time
+
+from _load_server import load_server
+
+DEFAULT_SIZES = [1000, 10000, 100000, 1000000]
+DEFAULT_CHECK = 10000
+
+EXTENSION_TYPES = ['suggest_inputs_start', 'suggest_inputs_complete',
+                   'suggestion_modal_open', 'suggestion_modal_confirm',
+                   'suggestion_modal_submit_success']
+MODAL_IDS = ['edit-range', 'edit-examples', 'edit-confirm', 'suggest-inputs']
+
+
+def build_events(count, seed=0):
+    """A recording of count events with realistic gaps between them"""
+    rng = random.Random(seed)
+    now = 1700000000000
+    events = []
+    while len(events) < count:
+        now += rng.choice([50, 300, 900, 1500, 4000, 12000])
+        roll = rng.random()
+        if roll < 0.05:
+            events.append({'type': 'pageload', 'time': now,
+                           'url': f'http://example.com/page{rng.randint(1, 50)}'})
+        elif roll < 0.35:
+            events.append({'type': 'click', 'time': now, 'tag': 'BUTTON',
+                           'id': f'btn{rng.randint(1, 200)}', 'xpath': '//button',
+                           'url': 'http://example.com/form'})
+        elif roll < 0.65:
+            events.append({'type': 'change', 'time': now, 'tag': rng.choice(['INPUT', 'TEXTAREA', 'SELECT']),
+                           'id': rng.choice(['', f'field{rng.randint(1, 50)}']),
+                           'xpath': f'//input[{rng.randint(1, 9)}]', 'value': f'value {len(events)}',
+                           'url': 'http://example.com/form'})
+        elif roll < 0.7:
+            events.append({'type': 'submit', 'time': now, 'tag': 'FORM', 'id': '',
+                           'xpath': '//form', 'url': 'http://example.com/form'})
+        elif roll < 0.85:
+            event = {'type': rng.choice(EXTENSION_TYPES), 'time': now,
+                     'url': 'popup', 'id': 'suggest-inputs'}
+            if rng.random() < 0.7:
+                # Mostly whole milliseconds, sometimes performance.now() style
+                event['duration_ms'] = rng.choice(
+                    [rng.randint(200, 20000), rng.uniform(200, 20000)])
+            events.append(event)
+        elif roll < 0.95:
+            events.append({'type': rng.choice(['click', 'change']), 'time': now, 'tag': 'INPUT',
+                           'id': rng.choice(MODAL_IDS) + str(rng.randint(0, 3)),
+                           'url': 'http://example.com/form'})
+        else:
+            events.append({'type': 'click', 'time': now, 'tag': 'DIV', 'id': 'x',
+                           'url': 'chrome-extension://abc/popup.html'})
+    return events
+
+
+class ScanDurations:
+    """The original duration lookup: scan every event for each query"""
+
+    extension_types = frozenset()
+
+    def __init__(self, events):
+        self.events = events
+
+    def between(self, start, end):
+        total = 0
+        for event in self.events:
+            if start < event.get('time', 0) < end and event.get('type', '') in self.extension_types:
+                if 'duration_ms' in event:
+                    total += event['duration_ms']
+        return total
+
+
+def digest(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def main():
+    args = sys.argv[1:]
+    check = DEFAULT_CHECK
+    if args[:1] == ['--check']:
+        check = int(args[1])
+        args = args[2:]
+    sizes = [int(arg) for arg in args] or DEFAULT_SIZES
+    server = load_server()
+    ScanDurations.extension_types = server.KATALON_EXTENSION_EVENTS
+
+    print(f"{'events':>9} {'seconds':>9} {'rows':>8}  {'digest':<16}  original")
+    for size in sizes:
+        events = build_events(size)
+        start = time.perf_counter()
+        html = server.convert_to_katalon_format(events)
+        elapsed = time.perf_counter() - start
+        original = 'skipped'
+        if size <= check:
+            fast = server.ExtensionDurations
+            server.ExtensionDurations = ScanDurations
+            try:
+                start = time.perf_counter()
+                reference = server.convert_to_katalon_format(events)
+                scan_seconds = time.perf_counter() - start
+            finally:
+                server.ExtensionDurations = fast
+            original = f"{'identical' if reference == html else 'DIFFERENT'} ({scan_seconds:.3f}s)"
+        print(f"{size:>9} {elapsed:9.3f} {html.count('<tr>') - 1:8d}  {digest(html):<16}  {original}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,7 @@
 // background.js
 
+importScripts('transport.js');
+
 // Store suggestion responses to handle popup closing
 let suggestionResponses = new Map();
 
@@ -160,23 +162,77 @@ chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
         }
         
         const serverRequestStartTime = Date.now();
-        
-        // Send request to Python server
-        fetch('http://localhost:5000/suggest_inputs', {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ html: response.html })
-        })
-        .then(res => {
+        let firstSuggestionTime = null;
+        const arr = [];
+
+        // Clear suggestions from a previous request before new ones stream in
+        chrome.storage.local.set({ currentSuggestions: [] });
+        chrome.tabs.sendMessage(tabId, { type: 'injectInputSuggestions', suggestions: [] }, function() {
+          if (chrome.runtime.lastError) {
+            console.warn('Injection message failed:', chrome.runtime.lastError.message);
+          }
+        });
+
+        // Render each field as soon as the server emits it
+        const handleRecord = (record) => {
+          if (record.type === 'field') {
+            if (firstSuggestionTime === null) {
+              firstSuggestionTime = Date.now();
+            }
+            arr.push(record.field);
+            chrome.storage.local.set({ currentSuggestions: arr });
+            chrome.tabs.sendMessage(tabId, {
+              type: 'appendInputSuggestion',
+              suggestion: record.field,
+              idx: arr.length - 1,
+              suggestions: arr
+            }, function(injectionResponse) {
+              if (chrome.runtime.lastError) {
+                console.warn('Injection message failed:', chrome.runtime.lastError.message);
+              }
+            });
+          } else if (record.type === 'error') {
+            console.warn('Suggestion failed for field:', record);
+          } else if (record.type === 'summary' && record.error) {
+            throw new Error(record.error);
+          }
+        };
+
+        // Send request to Python server (NDJSON stream, one record per line)
+        postJson('http://localhost:5000/suggest_inputs_stream', { html: response.html })
+        .then(async res => {
           if (!res.ok) {
             throw new Error(`HTTP ${res.status}: ${res.statusText}`);
           }
-          return res.json();
+          const reader = res.body.getReader();
+          const decoder = new TextDecoder();
+          let buffered = '';
+          while (true) {
+            const { done, value } = await reader.read();
+            buffered += decoder.decode(value || new Uint8Array(), { stream: !done });
+            let newline;
+            while ((newline = buffered.indexOf('\n')) >= 0) {
+              const line = buffered.slice(0, newline).trim();
+              buffered = buffered.slice(newline + 1);
+              if (line) {
+                handleRecord(JSON.parse(line));
+              }
+            }
+            if (done) {
+              break;
+            }
+          }
+          if (buffered.trim()) {
+            handleRecord(JSON.parse(buffered));
+          }
+          return arr;
         })
         .then(data => {
           const serverResponseTime = Date.now();
           const serverDuration = serverResponseTime - serverRequestStartTime;
           const totalRequestDuration = serverResponseTime - requestStartTime;
+          const firstSuggestionDuration = firstSuggestionTime !== null ?
+            firstSuggestionTime - serverRequestStartTime : null;
           
           // Store the response with timing info
           suggestionResponses.set(tabId, {
@@ -186,44 +242,17 @@ chrome.runtime.onMessage.addListener((request, sender, sendResponse) => {
               server_request_start_time: serverRequestStartTime,
               server_response_time: serverResponseTime,
               server_duration_ms: serverDuration,
+              first_suggestion_ms: firstSuggestionDuration,
               total_request_duration_ms: totalRequestDuration
             }
           });
           
-          // Try to get the array from data
-          let arr = data;
-          if (data && data.raw) {
-            try { 
-              arr = JSON.parse(data.raw); 
-            } catch (e) { 
-              console.error('Failed to parse suggestions:', e);
-              arr = []; 
-            }
-          }
-          
-          if (!Array.isArray(arr)) {
-            arr = [];
-          }
-          
-          // Store suggestions in local storage for popup access
-          chrome.storage.local.set({ currentSuggestions: arr });
-          
-          // Send suggestions to content script for DOM injection
-          chrome.tabs.sendMessage(tabId, { 
-            type: 'injectInputSuggestions', 
-            suggestions: arr 
-          }, function(injectionResponse) {
-            // Handle injection response (optional)
-            if (chrome.runtime.lastError) {
-              console.warn('Injection message failed:', chrome.runtime.lastError.message);
-            }
-          });
-          
           sendResponse({ 
             success: true, 
             suggestions: arr,
             timing: {
               server_duration_ms: serverDuration,
+              first_suggestion_ms: firstSuggestionDuration,
               total_request_duration_ms: totalRequestDuration
             }
           });
@@ -69,18 +69,12 @@
             css,
             event: lastEvent
           });
-          fetch('http://localhost:5000/snapshot', {
-            method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({
-              eventType: eventType,
-              time: Date.now(),
-              url: window.location.href,
-              html: html,
-              css: css,
-              event: lastEvent
-            })
-          }).catch(error => {
+          postSnapshot('http://localhost:5000/snapshot', {
+            eventType: eventType,
+            time: Date.now(),
+            url: window.location.href,
+            event: lastEvent
+          }, html, css).catch(error => {
             console.error('Failed to send snapshot:', error);
             chrome.storage.local.set({ serverError: true });
           });
@@ -97,18 +91,12 @@
               css,
               event: lastEvent
             });
-            fetch('http://localhost:5000/snapshot', {
-              method: 'POST',
-              headers: { 'Content-Type': 'application/json' },
-              body: JSON.stringify({
-                eventType: eventType,
-                time: Date.now(),
-                url: window.location.href,
-                html: html,
-                css: css,
-                event: lastEvent
-              })
-            }).catch(error => {
+            postSnapshot('http://localhost:5000/snapshot', {
+              eventType: eventType,
+              time: Date.now(),
+              url: window.location.href,
+              event: lastEvent
+            }, html, css).catch(error => {
               console.error('Failed to send snapshot:', error);
               chrome.storage.local.set({ serverError: true });
             });
@@ -273,198 +261,204 @@
     if (request && request.type === 'injectInputSuggestions') {
       injectInputSuggestionButtons(request.suggestions);
     }
+    if (request && request.type === 'appendInputSuggestion') {
+      // Streaming: add one button without touching the ones already shown
+      injectInputSuggestionButton(request.suggestion, request.idx, request.suggestions);
+    }
     return true;
   }); function injectInputSuggestionButtons(suggestions) {
     // Remove any existing suggestion buttons first
     document.querySelectorAll('.input-suggestion-btn').forEach(btn => btn.remove());
 
-    suggestions.forEach((item, idx) => {
-      const el = document.getElementById(item.id) || document.querySelector(`[name="${item.name}"]`);
-      if (!el) return;
-
-      const btn = document.createElement('button');
-      btn.textContent = '?';
-      btn.className = 'input-suggestion-btn';
-      btn.setAttribute('data-idx', idx);
-
-      // Enhanced CSS for better visibility
-      btn.style.cssText = `
-      all: initial !important;
-      font-family: Arial, sans-serif !important;
-      font-size: 14px !important;
-      font-weight: bold !important;
-      line-height: 1 !important;
-      
-      /* Size and positioning */
-      width: 24px !important;
-      height: 24px !important;
-      min-width: 24px !important;
-      min-height: 24px !important;
-      max-width: 24px !important;
-      max-height: 24px !important;
-      
-      /* Visual appearance */
-      background: linear-gradient(135deg, #007bff 0%, #0056b3 100%) !important;
-      color: white !important;
-      border: 2px solid #ffffff !important;
-      border-radius: 50% !important;
-      
-      /* Shadow for visibility */
-      box-shadow: 0 2px 8px rgba(0, 0, 0, 0.3), 
-                  0 0 0 1px rgba(0, 123, 255, 0.5) !important;
-      
-      /* Positioning */
-      position: absolute !important;
-      z-index: 999999 !important;
-      
-      /* Layout */
-      display: inline-flex !important;
-      align-items: center !important;
-      justify-content: center !important;
-      
-      /* Interaction */
-      cursor: pointer !important;
-      user-select: none !important;
-      
-      /* Reset all possible inherited styles */
-      margin: 0 !important;
-      padding: 0 !important;
-      text-decoration: none !important;
-      text-align: center !important;
-      vertical-align: baseline !important;
-      white-space: nowrap !important;
-      
-      /* Transitions */
-      transition: all 0.2s ease !important;
-      
-      /* Ensure visibility */
-      opacity: 1 !important;
-      visibility: visible !important;
-      overflow: visible !important;
-      transform: none !important;
-      
-      /* Text properties */
-      text-shadow: none !important;
-      text-transform: none !important;
-      letter-spacing: normal !important;
-      word-spacing: normal !important;
-      
-      /* Box model */
-      box-sizing: border-box !important;
-      float: none !important;
-      clear: none !important;
-    `;
+    suggestions.forEach((item, idx) => injectInputSuggestionButton(item, idx, suggestions));
+  }
+
+  function injectInputSuggestionButton(item, idx, suggestions) {
+    const el = document.getElementById(item.id) || document.querySelector(`[name="${item.name}"]`);
+    if (!el) return;
+
+    const btn = document.createElement('button');
+    btn.textContent = '?';
+    btn.className = 'input-suggestion-btn';
+    btn.setAttribute('data-idx', idx);
+
+    // Enhanced CSS for better visibility
+    btn.style.cssText = `
+    all: initial !important;
+    font-family: Arial, sans-serif !important;
+    font-size: 14px !important;
+    font-weight: bold !important;
+    line-height: 1 !important;
+    
+    /* Size and positioning */
+    width: 24px !important;
+    height: 24px !important;
+    min-width: 24px !important;
+    min-height: 24px !important;
+    max-width: 24px !important;
+    max-height: 24px !important;
+    
+    /* Visual appearance */
+    background: linear-gradient(135deg, #007bff 0%, #0056b3 100%) !important;
+    color: white !important;
+    border: 2px solid #ffffff !important;
+    border-radius: 50% !important;
+    
+    /* Shadow for visibility */
+    box-shadow: 0 2px 8px rgba(0, 0, 0, 0.3), 
+                0 0 0 1px rgba(0, 123, 255, 0.5) !important;
+    
+    /* Positioning */
+    position: absolute !important;
+    z-index: 999999 !important;
+    
+    /* Layout */
+    display: inline-flex !important;
+    align-items: center !important;
+    justify-content: center !important;
+    
+    /* Interaction */
+    cursor: pointer !important;
+    user-select: none !important;
+    
+    /* Reset all possible inherited styles */
+    margin: 0 !important;
+    padding: 0 !important;
+    text-decoration: none !important;
+    text-align: center !important;
+    vertical-align: baseline !important;
+    white-space: nowrap !important;
+    
+    /* Transitions */
+    transition: all 0.2s ease !important;
+    
+    /* Ensure visibility */
+    opacity: 1 !important;
+    visibility: visible !important;
+    overflow: visible !important;
+    transform: none !important;
+    
+    /* Text properties */
+    text-shadow: none !important;
+    text-transform: none !important;
+    letter-spacing: normal !important;
+    word-spacing: normal !important;
+    
+    /* Box model */
+    box-sizing: border-box !important;
+    float: none !important;
+    clear: none !important;
+  `;
+
+    // Position the button relative to the input field
+    const positionButton = () => {
+      const rect = el.getBoundingClientRect();
+      const scrollTop = window.pageYOffset || document.documentElement.scrollTop;
+      const scrollLeft = window.pageXOffset || document.documentElement.scrollLeft;
+
+      // Position to the right of the input field with some margin
+      btn.style.setProperty('top', `${rect.top + scrollTop + (rect.height - 24) / 2}px`, 'important');
+      btn.style.setProperty('left', `${rect.right + scrollLeft + 8}px`, 'important');
+    };
 
-      // Position the button relative to the input field
-      const positionButton = () => {
-        const rect = el.getBoundingClientRect();
-        const scrollTop = window.pageYOffset || document.documentElement.scrollTop;
-        const scrollLeft = window.pageXOffset || document.documentElement.scrollLeft;
+    // Initial positioning
+    positionButton();
 
-        // Position to the right of the input field with some margin
-        btn.style.setProperty('top', `${rect.top + scrollTop + (rect.height - 24) / 2}px`, 'important');
-        btn.style.setProperty('left', `${rect.right + scrollLeft + 8}px`, 'important');
-      };
+    // Reposition on scroll and resize
+    const repositionHandler = () => {
+      if (document.contains(el) && document.contains(btn)) {
+        positionButton();
+      }
+    };
 
-      // Initial positioning
-      positionButton();
+    window.addEventListener('scroll', repositionHandler);
+    window.addEventListener('resize', repositionHandler);
 
-      // Reposition on scroll and resize
-      const repositionHandler = () => {
-        if (document.contains(el) && document.contains(btn)) {
-          positionButton();
-        }
-      };
+    btn.title = 'Click to edit field suggestions';
 
-      window.addEventListener('scroll', repositionHandler);
-      window.addEventListener('resize', repositionHandler);
+    // Enhanced hover effects
+    btn.addEventListener('mouseenter', function () {
+      const state = this.getAttribute('data-state');
+      if (!state) {
+        this.style.setProperty('transform', 'scale(1.1)', 'important');
+        this.style.setProperty('box-shadow', '0 3px 12px rgba(0, 0, 0, 0.4), 0 0 0 2px rgba(0, 123, 255, 0.8)', 'important');
+      }
+    });
 
-      btn.title = 'Click to edit field suggestions';
+    btn.addEventListener('mouseleave', function () {
+      const state = this.getAttribute('data-state');
+      if (state === 'confirmed' || state === 'submitted') {
+        this.style.setProperty('background', 'linear-gradient(135deg, #28a745 0%, #1e7e34 100%)', 'important');
+        this.style.setProperty('transform', 'scale(1)', 'important');
+        this.style.setProperty('box-shadow', '0 2px 8px rgba(0, 0, 0, 0.3), 0 0 0 1px rgba(40, 167, 69, 0.5)', 'important');
+      } else if (state === 'cancelled' || state === 'failed') {
+        this.style.setProperty('background', 'linear-gradient(135deg, #dc3545 0%, #bd2130 100%)', 'important');
+        this.style.setProperty('transform', 'scale(1)', 'important');
+        this.style.setProperty('box-shadow', '0 2px 8px rgba(0, 0, 0, 0.3), 0 0 0 1px rgba(220, 53, 69, 0.5)', 'important');
+      } else {
+        this.style.setProperty('transform', 'scale(1)', 'important');
+        this.style.setProperty('box-shadow', '0 2px 8px rgba(0, 0, 0, 0.3), 0 0 0 1px rgba(0, 123, 255, 0.5)', 'important');
+      }
+    });
 
-      // Enhanced hover effects
-      btn.addEventListener('mouseenter', function () {
-        const state = this.getAttribute('data-state');
-        if (!state) {
-          this.style.setProperty('transform', 'scale(1.1)', 'important');
-          this.style.setProperty('box-shadow', '0 3px 12px rgba(0, 0, 0, 0.4), 0 0 0 2px rgba(0, 123, 255, 0.8)', 'important');
-        }
-      });
+    // State-based styling
+    const updateButtonState = (state) => {
+      btn.setAttribute('data-state', state);
+      switch (state) {
+        case 'confirmed':
+        case 'submitted':
+          btn.style.setProperty('background', 'linear-gradient(135deg, #28a745 0%, #1e7e34 100%)', 'important');
+          btn.style.setProperty('border-color', '#ffffff', 'important');
+          btn.style.setProperty('box-shadow', '0 2px 8px rgba(0, 0, 0, 0.3), 0 0 0 1px rgba(40, 167, 69, 0.5)', 'important');
+          break;
+        case 'cancelled':
+        case 'failed':
+          btn.style.setProperty('background', 'linear-gradient(135deg, #dc3545 0%, #bd2130 100%)', 'important');
+          btn.style.setProperty('border-color', '#ffffff', 'important');
+          btn.style.setProperty('box-shadow', '0 2px 8px rgba(0, 0, 0, 0.3), 0 0 0 1px rgba(220, 53, 69, 0.5)', 'important');
+          break;
+        default:
+          btn.style.setProperty('background', 'linear-gradient(135deg, #007bff 0%, #0056b3 100%)', 'important');
+          btn.style.setProperty('border-color', '#ffffff', 'important');
+          btn.style.setProperty('box-shadow', '0 2px 8px rgba(0, 0, 0, 0.3), 0 0 0 1px rgba(0, 123, 255, 0.5)', 'important');
+      }
+    };
 
-      btn.addEventListener('mouseleave', function () {
-        const state = this.getAttribute('data-state');
-        if (state === 'confirmed' || state === 'submitted') {
-          this.style.setProperty('background', 'linear-gradient(135deg, #28a745 0%, #1e7e34 100%)', 'important');
-          this.style.setProperty('transform', 'scale(1)', 'important');
-          this.style.setProperty('box-shadow', '0 2px 8px rgba(0, 0, 0, 0.3), 0 0 0 1px rgba(40, 167, 69, 0.5)', 'important');
-        } else if (state === 'cancelled' || state === 'failed') {
-          this.style.setProperty('background', 'linear-gradient(135deg, #dc3545 0%, #bd2130 100%)', 'important');
-          this.style.setProperty('transform', 'scale(1)', 'important');
-          this.style.setProperty('box-shadow', '0 2px 8px rgba(0, 0, 0, 0.3), 0 0 0 1px rgba(220, 53, 69, 0.5)', 'important');
-        } else {
-          this.style.setProperty('transform', 'scale(1)', 'important');
-          this.style.setProperty('box-shadow', '0 2px 8px rgba(0, 0, 0, 0.3), 0 0 0 1px rgba(0, 123, 255, 0.5)', 'important');
-        }
-      });
+    btn.onclick = (e) => {
+      e.stopPropagation();
+      e.preventDefault();
 
-      // State-based styling
-      const updateButtonState = (state) => {
-        btn.setAttribute('data-state', state);
-        switch (state) {
-          case 'confirmed':
-          case 'submitted':
-            btn.style.setProperty('background', 'linear-gradient(135deg, #28a745 0%, #1e7e34 100%)', 'important');
-            btn.style.setProperty('border-color', '#ffffff', 'important');
-            btn.style.setProperty('box-shadow', '0 2px 8px rgba(0, 0, 0, 0.3), 0 0 0 1px rgba(40, 167, 69, 0.5)', 'important');
-            break;
-          case 'cancelled':
-          case 'failed':
-            btn.style.setProperty('background', 'linear-gradient(135deg, #dc3545 0%, #bd2130 100%)', 'important');
-            btn.style.setProperty('border-color', '#ffffff', 'important');
-            btn.style.setProperty('box-shadow', '0 2px 8px rgba(0, 0, 0, 0.3), 0 0 0 1px rgba(220, 53, 69, 0.5)', 'important');
-            break;
-          default:
-            btn.style.setProperty('background', 'linear-gradient(135deg, #007bff 0%, #0056b3 100%)', 'important');
-            btn.style.setProperty('border-color', '#ffffff', 'important');
-            btn.style.setProperty('box-shadow', '0 2px 8px rgba(0, 0, 0, 0.3), 0 0 0 1px rgba(0, 123, 255, 0.5)', 'important');
-        }
-      };
-
-      btn.onclick = (e) => {
-        e.stopPropagation();
-        e.preventDefault();
-
-        // Record question mark button click event
-        const questionMarkClickTime = Date.now();
-        record({
-          type: 'suggestion_question_mark_click',
-          time: questionMarkClickTime,
-          url: window.location.href,
-          tag: 'BUTTON',
-          id: `suggestion-btn-${idx}`,
-          class: 'input-suggestion-btn',
-          value: null,
-          x: e.clientX || null,
-          y: e.clientY || null,
-          xpath: null,
-          field_name: item.name || item.id || '',
-          field_type: item.type || '',
-          suggestion_index: idx
-        });
+      // Record question mark button click event
+      const questionMarkClickTime = Date.now();
+      record({
+        type: 'suggestion_question_mark_click',
+        time: questionMarkClickTime,
+        url: window.location.href,
+        tag: 'BUTTON',
+        id: `suggestion-btn-${idx}`,
+        class: 'input-suggestion-btn',
+        value: null,
+        x: e.clientX || null,
+        y: e.clientY || null,
+        xpath: null,
+        field_name: item.name || item.id || '',
+        field_type: item.type || '',
+        suggestion_index: idx
+      });
 
-        try {
-          showEditModal(item, idx, suggestions, questionMarkClickTime);
-        } catch (err) {
-          console.error('Failed to open popup:', err);
-          alert('Failed to open popup window. Please check if popup blocking is enabled.');
-        }
-      };
+      try {
+        showEditModal(item, idx, suggestions, questionMarkClickTime);
+      } catch (err) {
+        console.error('Failed to open popup:', err);
+        alert('Failed to open popup window. Please check if popup blocking is enabled.');
+      }
+    };
 
-      // Append to body instead of next to the element to avoid layout issues
-      document.body.appendChild(btn);
+    // Append to body instead of next to the element to avoid layout issues
+    document.body.appendChild(btn);
 
-      // Store reference for state updates
-      btn.updateState = updateButtonState;
-    });
+    // Store reference for state updates
+    btn.updateState = updateButtonState;
   }  // Move the message listener setup outside the showEditModal function to ensure it's always available
   if (!window.hasSetupMessageListener) {
     window.hasSetupMessageListener = true;
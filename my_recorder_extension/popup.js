@@ -20,11 +20,7 @@ document.getElementById('toggle-recording').onclick = function () {
       updateToggleButton();
       // If stopping recording, send events to Python backend
       if (wasRecording && !newRecording) {
-        fetch('http://localhost:5000/events', {
-          method: 'POST',
-          headers: { 'Content-Type': 'application/json' },
-          body: JSON.stringify({ events: result.recordedEvents })
-        }).then(() => {
+        postJson('http://localhost:5000/events', { events: result.recordedEvents }).then(() => {
           chrome.storage.local.set({ serverError: false });
           updateCount();
         }).catch(error => {
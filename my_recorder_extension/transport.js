@@ -0,0 +1,53 @@
+// transport.js
+// Shared by content.js, background.js and popup.js
+
+// Bodies at least this large are sent gzip-compressed
+const COMPRESS_MIN_BYTES = 16 * 1024;
+
+// POST a JSON payload, compressing large bodies with CompressionStream when
+// the browser supports it. Resolves to the fetch Response.
+async function postJson(url, payload) {
+  const body = JSON.stringify(payload);
+  const headers = { 'Content-Type': 'application/json' };
+  if (body.length < COMPRESS_MIN_BYTES || typeof CompressionStream === 'undefined') {
+    return fetch(url, { method: 'POST', headers, body });
+  }
+  const stream = new Blob([body]).stream().pipeThrough(new CompressionStream('gzip'));
+  const compressed = await new Response(stream).blob();
+  headers['Content-Encoding'] = 'gzip';
+  return fetch(url, { method: 'POST', headers, body: compressed });
+}
+
+// Snapshot upload in the server's framed format: a 4-byte big-endian header
+// length, a JSON header naming each part and its byte size, then the raw
+// HTML and CSS. The server streams the parts to disk instead of parsing one
+// large JSON string. Retries while the server answers 429 (busy).
+const SNAPSHOT_MAX_RETRIES = 3;
+
+async function postSnapshot(url, meta, html, css) {
+  const htmlBlob = new Blob([html]);
+  const cssBlob = new Blob([css]);
+  const header = new TextEncoder().encode(JSON.stringify(Object.assign({}, meta, {
+    parts: [['html', htmlBlob.size], ['css', cssBlob.size]]
+  })));
+  const prefix = new Uint8Array(4);
+  new DataView(prefix.buffer).setUint32(0, header.length);
+  let body = new Blob([prefix, header, htmlBlob, cssBlob]);
+  const headers = { 'Content-Type': 'application/x-snapshot-frames' };
+  if (body.size >= COMPRESS_MIN_BYTES && typeof CompressionStream !== 'undefined') {
+    body = await new Response(body.stream().pipeThrough(new CompressionStream('gzip'))).blob();
+    headers['Content-Encoding'] = 'gzip';
+  }
+
+  for (let attempt = 0; ; attempt++) {
+    const response = await fetch(url, { method: 'POST', headers, body });
+    if (response.status !== 429 || attempt >= SNAPSHOT_MAX_RETRIES) {
+      if (!response.ok) {
+        throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+      }
+      return response;
+    }
+    const delay = Number(response.headers.get('Retry-After')) || 1;
+    await new Promise(resolve => setTimeout(resolve, delay * 1000 * (attempt + 1)));
+  }
+}
@@ -1,4 +1,5 @@
-from flask import Flask, request
+from flask import Flask, request, Response, stream_with_context
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
 from flask_cors import CORS
 import os
 import json
@@ -7,7 +8,7 @@ from ollama import chat
 import time
 import uuid
 from pydantic import BaseModel, Field
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, FeatureNotFound
 from openai import OpenAI
 import tiktoken
 from deep_translator import GoogleTranslator
@@ -17,11 +18,26 @@ import threading
 import webbrowser
 import csv
 import math
-from collections import defaultdict
-from itertools import product
+import random
+from collections import defaultdict, OrderedDict
+from itertools import product, islice, combinations
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from urllib.parse import urlparse
 import socket
 import sys
+import hashlib
+import gzip
+import zlib
+import io
+import queue
+import atexit
+import sqlite3
+from bisect import bisect_left, bisect_right
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 
 def check_port_available(port):
@@ -42,9 +58,174 @@ def check_port_available(port):
 # Use cl100k_base encoding (close approximation for Llama)
 encoding = tiktoken.get_encoding("cl100k_base")
 
+# Number of token counts memoized by content hash
+TOKEN_CACHE_MAX_ENTRIES = 50000
+
+
+class TokenCounter:
+    """
+    Memoized token counting on top of a tiktoken encoding
+
+    Assembled strings are counted whole rather than summed from part counts:
+    BPE pre-tokens only split reliably before a space that follows
+    non-whitespace, and the joins in the prompts built here are tag to tag
+    ('><', '">\n<') or text to tag, which the encoder merges across.
+    """
+
+    def __init__(self, encoding, max_entries):
+        self.encoding = encoding
+        self.max_entries = max_entries
+        self.counts = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.encode_seconds = 0.0
+        self.encoded_chars = 0
+
+    def count(self, text):
+        key = hashlib.blake2b(text.encode(
+            'utf-8', 'surrogatepass'), digest_size=16).digest()
+        with self.lock:
+            cached = self.counts.get(key)
+            if cached is not None:
+                self.counts.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        start = time.perf_counter()
+        tokens = len(self.encoding.encode(text))
+        elapsed = time.perf_counter() - start
+
+        with self.lock:
+            self.encode_seconds += elapsed
+            self.encoded_chars += len(text)
+            self.counts[key] = tokens
+            while len(self.counts) > self.max_entries:
+                self.counts.popitem(last=False)
+        return tokens
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.counts),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'encode_seconds': round(self.encode_seconds, 4),
+                'encoded_chars': self.encoded_chars,
+            }
+
+
+token_counter = TokenCounter(encoding, TOKEN_CACHE_MAX_ENTRIES)
+
+# How budget checks (e.g. the 60K truncation threshold) count tokens:
+# 'exact' always runs the BPE encoder, 'estimate' works from characters and
+# bytes and only encodes when the estimate is within the margin of the budget.
+TOKEN_COUNT_MODE = 'exact'
+
+# Estimator coefficients and relative error margin, calibrated against
+# cl100k_base on recorded snapshots (see calibrate_token_estimator)
+TOKEN_ESTIMATOR = {
+    'ascii_chars_per_token': 3.2,
+    'non_ascii_bytes_per_token': 2.6,
+    'margin': 0.35,
+}
+
+# Updated from request and job worker threads, so only under the lock
+token_estimator_stats = {'estimates': 0, 'exact_fallbacks': 0}
+token_estimator_lock = threading.Lock()
+
 
 def count_tokens(text):
-    return len(encoding.encode(text))
+    return token_counter.count(text)
+
+
+def text_size_features(text):
+    """Return (ASCII characters, UTF-8 bytes of non-ASCII characters)"""
+    ascii_chars = len(text.encode('ascii', 'ignore'))
+    non_ascii_bytes = len(text.encode('utf-8', 'surrogatepass')) - ascii_chars
+    return ascii_chars, non_ascii_bytes
+
+
+def estimate_tokens(text, params=None):
+    """Approximate cl100k_base token count from character and byte counts"""
+    params = params or TOKEN_ESTIMATOR
+    ascii_chars, non_ascii_bytes = text_size_features(text)
+    return (ascii_chars / params['ascii_chars_per_token'] +
+            non_ascii_bytes / params['non_ascii_bytes_per_token'])
+
+
+def exceeds_token_budget(text, budget, mode=None):
+    """Return True if text has more than budget tokens"""
+    mode = mode or TOKEN_COUNT_MODE
+    if mode == 'estimate':
+        estimate = estimate_tokens(text)
+        margin = TOKEN_ESTIMATOR['margin']
+        # |estimate - exact| <= margin * exact bounds the exact count
+        over = estimate / (1 + margin) > budget
+        under = estimate / (1 - margin) <= budget
+        with token_estimator_lock:
+            token_estimator_stats['estimates'] += 1
+            if not (over or under):
+                token_estimator_stats['exact_fallbacks'] += 1
+        if over:
+            return True
+        if under:
+            return False
+    return count_tokens(text) > budget
+
+
+def calibrate_token_estimator(texts):
+    """
+    Fit estimator coefficients and margin against the exact encoder
+
+    Args:
+        texts (list): Sample documents (e.g. recorded HTML snapshots)
+
+    Returns:
+        dict: Parameters in the TOKEN_ESTIMATOR format plus sample statistics
+    """
+    samples = []
+    for text in texts:
+        if not text:
+            continue
+        ascii_chars, non_ascii_bytes = text_size_features(text)
+        samples.append((ascii_chars, non_ascii_bytes,
+                       len(encoding.encode(text))))
+    if not samples:
+        raise ValueError("No non-empty samples to calibrate on")
+
+    # Least squares fit of tokens = a * ascii_chars + b * non_ascii_bytes
+    saa = sum(a * a for a, _, _ in samples)
+    sbb = sum(b * b for _, b, _ in samples)
+    sab = sum(a * b for a, b, _ in samples)
+    sat = sum(a * t for a, _, t in samples)
+    sbt = sum(b * t for _, b, t in samples)
+    det = saa * sbb - sab * sab
+    if det > 0:
+        per_ascii = (sat * sbb - sbt * sab) / det
+        per_non_ascii = (saa * sbt - sab * sat) / det
+    else:
+        # Single kind of content in the corpus: fit one shared ratio
+        per_ascii = per_non_ascii = sum(t for _, _, t in samples) / \
+            max(1, sum(a + b for a, b, _ in samples))
+    per_ascii = max(per_ascii, 1e-6)
+    per_non_ascii = max(per_non_ascii, 1e-6)
+
+    params = {
+        'ascii_chars_per_token': 1 / per_ascii,
+        'non_ascii_bytes_per_token': 1 / per_non_ascii,
+    }
+    errors = [abs(a * per_ascii + b * per_non_ascii - t) / t
+              for a, b, t in samples if t]
+    # Pad the worst observed error so unseen pages stay inside the margin
+    params['margin'] = min(0.9, round(max(errors, default=0.0) * 1.2 + 0.02, 3))
+    params['samples'] = len(samples)
+    params['mean_error'] = round(sum(errors) / len(errors), 4) if errors else 0.0
+    params['max_error'] = round(max(errors, default=0.0), 4)
+    return params
 
 
 ollama_url = 'http://localhost:11434/v1'
@@ -87,6 +268,119 @@ RUN_ID = f"run_{_run_time}_{_run_uid}"
 RUN_SAVE_DIR = os.path.join(SAVE_DIR, RUN_ID)
 os.makedirs(RUN_SAVE_DIR, exist_ok=True)
 
+# How /snapshot stores page HTML and CSS: 'blobs' writes each unique payload
+# once, compressed, under BLOB_STORE_DIR and a small <event>_snapshot.json
+# manifest per event; 'files' writes verbatim <event>.html/.css files.
+SNAPSHOT_STORE = 'blobs'
+BLOB_STORE_DIR = os.path.join(SAVE_DIR, 'blobs')
+# 'gzip' or 'zstd' (needs the optional zstandard package)
+BLOB_COMPRESSION = 'gzip'
+# Snapshot ingestion limits: bodies over SNAPSHOT_MAX_BODY_BYTES get 413,
+# requests beyond SNAPSHOT_MAX_CONCURRENT in flight get 429. Streamed
+# snapshots are copied to disk SNAPSHOT_CHUNK_BYTES at a time.
+SNAPSHOT_MAX_BODY_BYTES = 64 * 1024 * 1024
+SNAPSHOT_MAX_CONCURRENT = 4
+SNAPSHOT_CHUNK_BYTES = 64 * 1024
+
+# BeautifulSoup tree builder for page and Katalon HTML: 'html.parser' (pure
+# Python, always available), 'lxml' or 'html5lib'. Falls back to
+# 'html.parser' when the chosen backend is not installed.
+HTML_PARSER_BACKEND = 'html.parser'
+
+# Form batch mode: number of fields (sharing a <form> or the page) described
+# in one structured LLM request. Set to 1 to send one request per field.
+SUGGEST_BATCH_SIZE = 8
+
+# What the prompt's user message carries for each field: 'html' sends the
+# page (or a 60K-token window of it), 'digest' sends a compact description
+# built from the element, its label, aria text, form headings and hints.
+PROMPT_CONTEXT_MODE = 'html'
+
+# Pruning steps applied to page HTML before token counting, truncation and
+# prompting (see PRUNE_STEPS). An empty list disables pruning.
+HTML_PRUNE_STEPS = ['scripts', 'styles', 'comments',
+                    'svg', 'data_uris', 'tracking', 'whitespace']
+
+# Maximum number of LLM requests in flight at once, per backend
+LLM_MAX_IN_FLIGHT = {
+    'local': 2,
+    'api': 8,
+}
+# Field suggestion cache shared by all runs (stored under SAVE_DIR)
+SUGGESTION_CACHE_ENABLED = True
+SUGGESTION_CACHE_PATH = os.path.join(SAVE_DIR, 'field_suggestion_cache.json')
+SUGGESTION_CACHE_MAX_ENTRIES = 5000
+SUGGESTION_CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+# How Persian limitations are produced: 'translate' asks the model for
+# English and translates it, 'bilingual' asks for English and Persian in the
+# same structured call and only translates when the Persian is missing or
+# not in Persian script.
+LIMITATIONS_MODE = 'translate'
+# Share of letters that must be Persian/Arabic script for 'bilingual' output
+PERSIAN_MIN_SCRIPT_RATIO = 0.3
+
+# Translation of limitations text: backend 'google' (deep_translator) or
+# 'offline' (no network, for tests), and a cache shared by all runs
+TRANSLATION_BACKEND = 'google'
+TRANSLATION_CACHE_PATH = os.path.join(SAVE_DIR, 'translation_cache.json')
+TRANSLATION_CACHE_MAX_ENTRIES = 20000
+
+# Background jobs (see /jobs): worker threads shared by all job kinds, and
+# how many finished jobs stay in memory. Every finished job is also written
+# to RUN_SAVE_DIR/jobs/<job_id>.json.
+JOB_WORKERS = 4
+JOB_HISTORY_LIMIT = 200
+JOBS_DIR = os.path.join(RUN_SAVE_DIR, 'jobs')
+
+# Transport: request bodies may be sent gzip/deflate-compressed (inflated up
+# to MAX_DECOMPRESSED_BODY_BYTES); responses of COMPRESS_MIN_BYTES or more
+# are gzipped for clients that accept it. JSON responses are compact unless
+# RESPONSE_JSON_INDENT is set (e.g. 2 for debugging).
+COMPRESS_RESPONSES = True
+COMPRESS_MIN_BYTES = 1024
+MAX_DECOMPRESSED_BODY_BYTES = 512 * 1024 * 1024
+RESPONSE_JSON_INDENT = None
+
+# Write-behind persistence for snapshots, suggestions and confirmations:
+# 'batched' lets the OS flush files and fsyncs them on shutdown, 'fsync'
+# fsyncs every file as it is written. Producers block once
+# WRITE_QUEUE_MAX_ITEMS writes or WRITE_QUEUE_MAX_BYTES of payload (snapshot
+# HTML/CSS, saved pages) are pending.
+PERSISTENCE_MODE = 'batched'
+WRITE_QUEUE_MAX_ITEMS = 256
+WRITE_QUEUE_MAX_BYTES = 128 * 1024 * 1024
+
+# Run store: one SQLite database, shared by all runs, indexing snapshot
+# metadata, events, suggestion results, field updates and confirmations by
+# field and URL. The per-run JSON files are still written alongside it.
+RUN_STORE_PATH = os.path.join(SAVE_DIR, 'run_store.sqlite3')
+
+# On startup the in-memory field states (latest range/examples per field)
+# can be restored from this many most recent earlier runs, so a restarted
+# server continues where it left off. States are keyed by field name only,
+# so only enable this when the runs record the same application; 0 (the
+# default) keeps field state per run.
+FIELD_STATE_RESTORE_RUNS = 0
+
+# Test case generation: combination rows are produced lazily and written to
+# the CSV TEST_CASE_CSV_CHUNK_ROWS at a time
+TEST_CASE_CSV_CHUNK_ROWS = 1000
+
+# How rows are chosen from the field examples: 'product' (the first
+# num_test_cases rows of the Cartesian product), 'covering' (a covering
+# array in which every combination of values of any TEST_CASE_COVERING_STRENGTH
+# fields appears at least once; 'pairwise' is strength 2) or 'sample'
+# (num_test_cases distinct rows drawn uniformly, reproducible for a seed).
+# Requests can override these with 'strategy', 'strength' and 'seed'.
+TEST_CASE_STRATEGY = 'product'
+TEST_CASE_COVERING_STRENGTH = 2
+TEST_CASE_SAMPLE_SEED = 0
+TEST_CASE_STRATEGIES = ('product', 'covering', 'pairwise', 'sample')
+
+llm_slots = threading.BoundedSemaphore(
+    LLM_MAX_IN_FLIGHT['local' if is_local else 'api'])
+
 client = OpenAI(
     base_url=url,
     api_key=token)
@@ -106,6 +400,46 @@ class FormField(BaseModel):
                                     description="Five example values that violate the limitations for negative testing")
 
 
+class FormBatch(BaseModel):
+    fields: list[FormField] = Field(...,
+                                   description="One entry per requested input or textarea, in the requested order")
+
+
+class BilingualFormField(BaseModel):
+    name: str = Field(...,
+                      description="The 'name' attribute of the input or textarea")
+    id: str = Field(..., description="The 'id' attribute of the element")
+    type: str = Field(...,
+                      description="Input type (text, password, etc.) or 'textarea'")
+    limitations_en: str = Field(
+        ..., description="Validation rules inferred from attributes like minlength, maxlength, pattern, placeholder in English")
+    limitations_fa: str = Field(
+        ..., description="The same validation rules written in Persian")
+    examples: list[str] = Field(...,
+                                description="Five example values that satisfy the limitations")
+    bad_examples: list[str] = Field(...,
+                                    description="Five example values that violate the limitations for negative testing")
+
+
+class BilingualFormBatch(BaseModel):
+    fields: list[BilingualFormField] = Field(...,
+                                            description="One entry per requested input or textarea, in the requested order")
+
+
+# Single-field and batch schemas per LIMITATIONS_MODE
+FIELD_SCHEMAS = {
+    'translate': (FormField, FormBatch),
+    'bilingual': (BilingualFormField, BilingualFormBatch),
+}
+
+
+class BilingualRangeSchema(BaseModel):
+    range_en: str = Field(...,
+                          description="Short description of the limitations in English")
+    range_fa: str = Field(...,
+                          description="The same description written in Persian")
+
+
 class ExampleSchema(BaseModel):
     examples: list[str] = Field(...,
                                 description="Five example values that satisfy the range")
@@ -113,51 +447,1359 @@ class ExampleSchema(BaseModel):
                                     description="Five example values that violate the range for negative testing")
 
 
+class GoogleTranslateBackend:
+    """Google Translate through deep_translator, one request per chunk of texts"""
+
+    name = 'google'
+    # Google's limit per request is 5000 characters
+    max_chars = 4500
+
+    def __init__(self):
+        self.translators = {}
+
+    def translator(self, source, target):
+        if (source, target) not in self.translators:
+            self.translators[(source, target)] = GoogleTranslator(
+                source=source, target=target)
+        return self.translators[(source, target)]
+
+    def translate_batch(self, texts, source, target):
+        """Translate texts joined one per line, falling back to one request per text"""
+        translator = self.translator(source, target)
+        results = []
+        for chunk in self.chunks([' '.join(text.split()) for text in texts]):
+            lines = translator.translate('\n'.join(chunk)).split('\n')
+            if len(lines) != len(chunk):
+                lines = [translator.translate(text) for text in chunk]
+            results.extend(line.strip() for line in lines)
+        return results
+
+    def chunks(self, texts):
+        chunk, size = [], 0
+        for text in texts:
+            if chunk and size + len(text) + 1 > self.max_chars:
+                yield chunk
+                chunk, size = [], 0
+            chunk.append(text)
+            size += len(text) + 1
+        if chunk:
+            yield chunk
+
+
+class OfflineTranslationBackend:
+    """Stand-in backend for tests and offline runs: tags text with the target language"""
+
+    name = 'offline'
+
+    def translate_batch(self, texts, source, target):
+        return [f"[{target}] {text}" for text in texts]
+
+
+TRANSLATION_BACKENDS = {
+    'google': GoogleTranslateBackend,
+    'offline': OfflineTranslationBackend,
+}
+
+
+class TranslationService:
+    """
+    Batched translation with a persistent, bidirectional cache
+
+    Every translation is stored both ways, so text we produced (e.g. a
+    Persian limitation) is never sent back to the backend to be translated
+    into the other language. Backends implement
+    translate_batch(texts, source, target) -> list of str.
+    """
+
+    def __init__(self, backend, path, max_entries):
+        self.backend = backend
+        self.path = path
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.backend_calls = 0
+        self.backend_errors = 0
+        self.backend_seconds = 0.0
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.dirty = False
+        self.save_scheduled = False
+        self.load()
+
+    @staticmethod
+    def key(source, target, text):
+        return f"{source}>{target}:{text}"
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            for key, translation in stored[-self.max_entries:]:
+                self.entries[key] = translation
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Could not load translation cache {self.path}: {e}")
+
+    def save(self):
+        """Write the cache if it changed since the last save"""
+        with self.save_lock:
+            with self.lock:
+                self.save_scheduled = False
+                if not self.dirty:
+                    return
+                self.dirty = False
+                snapshot = list(self.entries.items())
+            temp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+            try:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(snapshot, f, ensure_ascii=False)
+                os.replace(temp_path, self.path)
+            except Exception as e:
+                print(f"Could not save translation cache {self.path}: {e}")
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+    def schedule_save(self):
+        """Mark the cache dirty and queue one save on the background writer"""
+        with self.lock:
+            self.dirty = True
+            if self.save_scheduled:
+                return
+            self.save_scheduled = True
+        background_writer.submit(self.save)
+
+    def put(self, source, target, text, translation):
+        for key, value in ((self.key(source, target, text), translation),
+                           (self.key(target, source, translation), text)):
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def remember(self, source, target, pairs):
+        """Cache (text, translation) pairs produced elsewhere, e.g. by the LLM"""
+        pairs = [(text, translation)
+                 for text, translation in pairs if text and translation]
+        if not pairs:
+            return
+        with self.lock:
+            for text, translation in pairs:
+                self.put(source, target, text, translation)
+        self.schedule_save()
+
+    def translate_many(self, texts, source, target):
+        """
+        Translate texts with at most one backend call
+
+        Args:
+            texts (list): Strings to translate; empty strings pass through
+            source (str): Source language code, e.g. 'en'
+            target (str): Target language code, e.g. 'fa'
+
+        Returns:
+            list: Translations in input order. If the backend fails the
+            original texts are returned and nothing is cached.
+        """
+        results = list(texts)
+        missing = {}
+        with self.lock:
+            for i, text in enumerate(texts):
+                if not text or not text.strip():
+                    continue
+                key = self.key(source, target, text)
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    results[i] = self.entries[key]
+                else:
+                    self.misses += 1
+                    missing.setdefault(text, []).append(i)
+        if not missing:
+            return results
+
+        pending = list(missing)
+        start = time.perf_counter()
+        try:
+            translations = self.backend.translate_batch(
+                pending, source, target)
+            if len(translations) != len(pending):
+                raise ValueError(
+                    f"backend returned {len(translations)} translations for {len(pending)} texts")
+        except Exception as e:
+            print(f"Translation error: {e}")
+            with self.lock:
+                self.backend_calls += 1
+                self.backend_errors += 1
+                self.backend_seconds += time.perf_counter() - start
+            return results
+
+        with self.lock:
+            self.backend_calls += 1
+            self.backend_seconds += time.perf_counter() - start
+            for text, translation in zip(pending, translations):
+                self.put(source, target, text, translation)
+                for i in missing[text]:
+                    results[i] = translation
+        self.schedule_save()
+        return results
+
+    def translate(self, text, source, target):
+        return self.translate_many([text], source, target)[0]
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': self.backend.name,
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'backend_calls': self.backend_calls,
+                'backend_errors': self.backend_errors,
+                'backend_seconds': round(self.backend_seconds, 3),
+                'avg_call_seconds': round(self.backend_seconds / self.backend_calls, 3) if self.backend_calls else 0.0,
+            }
+
+
+translation_service = TranslationService(
+    TRANSLATION_BACKENDS[TRANSLATION_BACKEND](), TRANSLATION_CACHE_PATH, TRANSLATION_CACHE_MAX_ENTRIES)
+
+
 def translate_to_persian(english_text):
-    """Translate English limitations to Persian using deep_translator"""
-    try:
-        translator = GoogleTranslator(source='en', target='fa')
-        return translator.translate(english_text)
-    except Exception as e:
-        print(f"Translation error: {e}")
-        return english_text  # Return original if translation fails
+    """Translate English limitations to Persian (original text if translation fails)"""
+    return translation_service.translate(english_text, 'en', 'fa')
 
 
 def translate_to_english(persian_text):
-    """Translate Persian text to English using deep_translator"""
+    """Translate Persian text to English (original text if translation fails)"""
+    return translation_service.translate(persian_text, 'fa', 'en')
+
+
+def is_persian_text(text):
+    """True if enough of the letters in text are Persian/Arabic script"""
+    letters = [c for c in text or '' if c.isalpha()]
+    if not letters:
+        return False
+    persian = sum(1 for c in letters if '\u0600' <= c <= '\u06FF'
+                  or '\uFB50' <= c <= '\uFDFF' or '\uFE70' <= c <= '\uFEFF')
+    return persian / len(letters) >= PERSIAN_MIN_SCRIPT_RATIO
+
+
+def localize_limitations(fields, limitations_mode=None):
+    """
+    Replace each field's English limitations with Persian, in place
+
+    In 'translate' mode every field's 'limitations' is translated. In
+    'bilingual' mode 'limitations_en'/'limitations_fa' are folded into
+    'limitations', and only fields whose Persian is empty or fails the
+    script check are translated. Either way there is at most one
+    translation call.
+    """
+    if (limitations_mode or LIMITATIONS_MODE) == 'bilingual':
+        pending = []
+        produced = []
+        for data in fields:
+            english = data.pop('limitations_en', '')
+            persian = data.pop('limitations_fa', '')
+            if is_persian_text(persian):
+                data['limitations'] = persian
+                produced.append((english, persian))
+            else:
+                data['limitations'] = english
+                pending.append(data)
+        translation_service.remember('en', 'fa', produced)
+        if pending:
+            print(
+                f"Model Persian missing or not in Persian script for {len(pending)} field(s), translating")
+    else:
+        pending = list(fields)
+
+    translations = translation_service.translate_many(
+        [data['limitations'] for data in pending], 'en', 'fa')
+    for data, translation in zip(pending, translations):
+        data['limitations'] = translation
+    return fields
+
+
+class InflatingStream(io.RawIOBase):
+    """Readable stream that decompresses a gzip/deflate request body as it is read"""
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, raw, length, encoding, max_bytes):
+        self.raw = raw
+        # None when the body runs until EOF (chunked transfer)
+        self.remaining = length
+        self.max_bytes = max_bytes
+        self.produced = 0
+        self.pending = b''
+        self.output = b''
+        first = self._read_raw()
+        # gzip has a gzip header; 'deflate' is zlib-wrapped per HTTP, but
+        # some clients send raw deflate
+        if encoding == 'gzip':
+            wbits = 16 + zlib.MAX_WBITS
+        elif first[:1] and (first[0] & 0x0F) == 8 and int.from_bytes(first[:2], 'big') % 31 == 0:
+            wbits = zlib.MAX_WBITS
+        else:
+            wbits = -zlib.MAX_WBITS
+        self.decompressor = zlib.decompressobj(wbits)
+        self.pending = first
+
+    def _read_raw(self):
+        size = self.chunk_size if self.remaining is None else min(
+            self.chunk_size, self.remaining)
+        data = self.raw.read(size) if size else b''
+        if self.remaining is not None:
+            self.remaining -= len(data)
+        return data
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self.output:
+            if self.decompressor.eof:
+                return 0
+            data = self.decompressor.unconsumed_tail or self.pending or self._read_raw()
+            self.pending = b''
+            if not data:
+                raise BadRequest("Incomplete compressed request body")
+            try:
+                self.output = self.decompressor.decompress(data, len(buffer))
+            except zlib.error as e:
+                raise BadRequest(f"Could not decode compressed request body: {e}")
+        n = min(len(buffer), len(self.output))
+        buffer[:n] = self.output[:n]
+        self.output = self.output[n:]
+        self.produced += n
+        if self.produced > self.max_bytes:
+            raise RequestEntityTooLarge(
+                f"Decompressed body exceeds {self.max_bytes} bytes")
+        return n
+
+
+class DecompressRequestMiddleware:
+    """
+    WSGI middleware that inflates request bodies sent with
+    Content-Encoding: gzip or deflate while the handler reads them, so
+    handlers see plain JSON (or snapshot frames) without the compressed or
+    decompressed body being held in memory
+
+    max_bytes_for_path(path) gives the largest decompressed body accepted
+    for a request path.
+    """
+
+    def __init__(self, wsgi_app, max_bytes_for_path):
+        self.wsgi_app = wsgi_app
+        self.max_bytes_for_path = max_bytes_for_path
+
+    def __call__(self, environ, start_response):
+        encoding = environ.get('HTTP_CONTENT_ENCODING', '').strip().lower()
+        if encoding not in ('gzip', 'deflate'):
+            return self.wsgi_app(environ, start_response)
+
+        length = environ.get('CONTENT_LENGTH')
+        environ = dict(environ)
+        environ.pop('HTTP_CONTENT_ENCODING')
+        environ['wsgi.input'] = io.BufferedReader(InflatingStream(
+            environ['wsgi.input'], int(length) if length else None, encoding,
+            self.max_bytes_for_path(environ.get('PATH_INFO', ''))),
+            buffer_size=InflatingStream.chunk_size)
+        # The decompressed length is unknown; read until the stream ends
+        environ.pop('CONTENT_LENGTH', None)
+        environ['wsgi.input_terminated'] = True
+        return self.wsgi_app(environ, start_response)
+
+
+def decompressed_body_limit(path):
+    """Snapshots are cut off at their own size limit while they are inflated"""
+    if path == '/snapshot':
+        return min(SNAPSHOT_MAX_BODY_BYTES, MAX_DECOMPRESSED_BODY_BYTES)
+    return MAX_DECOMPRESSED_BODY_BYTES
+
+
+app.wsgi_app = DecompressRequestMiddleware(app.wsgi_app, decompressed_body_limit)
+
+
+@app.after_request
+def compress_response(response):
+    """gzip responses for clients that accept it; streamed responses are left alone"""
+    if not COMPRESS_RESPONSES or response.direct_passthrough or response.is_streamed:
+        return response
+    if 'gzip' not in request.headers.get('Accept-Encoding', '').lower():
+        return response
+    if 'Content-Encoding' in response.headers or response.status_code < 200:
+        return response
+    mimetype = response.mimetype or ''
+    if not (mimetype.startswith('text/') or mimetype in ('application/json', 'application/javascript')):
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+    response.set_data(gzip.compress(data, compresslevel=5))
+    response.headers['Content-Encoding'] = 'gzip'
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def dumps_response(payload):
+    """Serialize a JSON response body: compact unless RESPONSE_JSON_INDENT is set"""
+    if RESPONSE_JSON_INDENT is None:
+        return json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+    return json.dumps(payload, ensure_ascii=False, indent=RESPONSE_JSON_INDENT)
+
+
+class BackgroundWriter:
+    """
+    Write-behind persistence: handlers enqueue file writes and return, one
+    thread performs them in submission order
+
+    The queue is bounded, so a burst of writes blocks its producers once
+    max_items, or max_bytes of payload, are pending instead of growing
+    without limit. With durability
+    'fsync' each file is fsynced as it is written; with 'batched' files are
+    left to the OS and fsynced together on flush().
+    """
+
+    def __init__(self, max_items, durability, max_bytes=None):
+        self.queue = queue.Queue(maxsize=max_items)
+        self.durability = durability
+        self.max_bytes = max_bytes
+        self.pending_bytes = 0
+        self.unsynced = set()
+        self.written = 0
+        self.errors = 0
+        self.lock = threading.Lock()
+        self.space = threading.Condition(self.lock)
+        self.thread = threading.Thread(
+            target=self._run, name='background-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, func, *args, size=0):
+        """
+        Queue func(*args) to run on the writer thread
+
+        size is the payload the queued call holds in memory (bytes, roughly);
+        it counts against max_bytes until the call has run. A single call
+        larger than max_bytes waits for an empty queue.
+        """
+        if size and self.max_bytes:
+            with self.space:
+                while self.pending_bytes and self.pending_bytes + size > self.max_bytes:
+                    self.space.wait()
+                self.pending_bytes += size
+        self.queue.put((func, args, size))
+
+    def write_text(self, path, text):
+        self.submit(self._write_text, path, text, size=len(text))
+
+    def write_json(self, path, data):
+        """Queue data for path as indented JSON; data must not be mutated afterwards"""
+        self.submit(self._write_json, path, data)
+
+    def _write_text(self, path, text):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+            self.finish_file(f)
+
+    def _write_json(self, path, data):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            self.finish_file(f)
+
+    def finish_file(self, f, path=None):
+        """
+        Call on an open file after writing it: fsync now or on the next flush
+
+        path is the name the file will end up with, if it is renamed later
+        """
+        if self.durability == 'fsync':
+            f.flush()
+            os.fsync(f.fileno())
+        else:
+            with self.lock:
+                self.unsynced.add(path or f.name)
+
+    def _run(self):
+        while True:
+            func, args, size = self.queue.get()
+            try:
+                func(*args)
+                with self.lock:
+                    self.written += 1
+            except Exception as e:
+                print(f"Background write failed ({getattr(func, '__name__', func)}): {e}")
+                with self.lock:
+                    self.errors += 1
+            finally:
+                if size and self.max_bytes:
+                    with self.space:
+                        self.pending_bytes -= size
+                        self.space.notify_all()
+                self.queue.task_done()
+
+    def flush(self):
+        """Block until every queued write is done and fsync what batched mode left unsynced"""
+        self.queue.join()
+        with self.lock:
+            paths, self.unsynced = self.unsynced, set()
+        for path in paths:
+            try:
+                fd = os.open(path, os.O_RDONLY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+            except OSError as e:
+                print(f"Could not fsync {path}: {e}")
+
+    def stats(self):
+        with self.lock:
+            return {
+                'durability': self.durability,
+                'pending': self.queue.qsize(),
+                'pending_bytes': self.pending_bytes,
+                'written': self.written,
+                'errors': self.errors,
+                'unsynced_files': len(self.unsynced),
+            }
+
+
+background_writer = BackgroundWriter(WRITE_QUEUE_MAX_ITEMS, PERSISTENCE_MODE, WRITE_QUEUE_MAX_BYTES)
+atexit.register(background_writer.flush)
+
+
+class BlobStore:
+    """
+    Content-addressed store of compressed blobs
+
+    A blob is named by the SHA-256 of its uncompressed bytes and written
+    once, so identical HTML/CSS payloads from different events or runs
+    share one file: <root>/<first 2 hex digits>/<digest>.gz (or .zst).
+    """
+
+    EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+
+    def __init__(self, root, compression):
+        self.root = root
+        if compression == 'zstd' and zstandard is None:
+            print("zstandard is not installed, compressing snapshots with gzip")
+            compression = 'gzip'
+        self.compression = compression
+        self.known = set()
+        self.blobs_written = 0
+        self.blobs_reused = 0
+        self.bytes_in = 0
+        self.bytes_written = 0
+        self.lock = threading.Lock()
+
+    def path_for(self, digest, compression=None):
+        extension = self.EXTENSIONS[compression or self.compression]
+        return os.path.join(self.root, digest[:2], digest + extension)
+
+    def find(self, digest):
+        """Path of an existing blob in any supported compression, or None"""
+        for compression in self.EXTENSIONS:
+            path = self.path_for(digest, compression)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def put(self, data):
+        """Store text or bytes and return its digest"""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        with self.lock:
+            self.bytes_in += len(data)
+            if digest in self.known or self.find(digest):
+                self.known.add(digest)
+                self.blobs_reused += 1
+                return digest
+
+        if self.compression == 'zstd':
+            compressed = zstandard.ZstdCompressor(level=10).compress(data)
+        else:
+            compressed = gzip.compress(data, compresslevel=6, mtime=0)
+        path = self.path_for(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Unique temp name: two requests may store the same blob at once
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(compressed)
+            background_writer.finish_file(f, path)
+        os.replace(temp_path, path)
+        with self.lock:
+            self.known.add(digest)
+            self.blobs_written += 1
+            self.bytes_written += len(compressed)
+        return digest
+
+    def put_stream(self, chunks):
+        """
+        Store a payload given as an iterable of byte chunks, compressing it
+        into a temp file as it arrives
+
+        Returns:
+            tuple: (digest, uncompressed size in bytes)
+        """
+        os.makedirs(self.root, exist_ok=True)
+        temp_path = os.path.join(self.root, f"incoming-{uuid.uuid4().hex}.tmp")
+        hasher = hashlib.sha256()
+        size = 0
+        try:
+            with open(temp_path, 'wb') as raw:
+                if self.compression == 'zstd':
+                    writer = zstandard.ZstdCompressor(
+                        level=10).stream_writer(raw, closefd=False)
+                else:
+                    writer = gzip.GzipFile(
+                        fileobj=raw, mode='wb', compresslevel=6, mtime=0)
+                with writer:
+                    for chunk in chunks:
+                        hasher.update(chunk)
+                        size += len(chunk)
+                        writer.write(chunk)
+                digest = hasher.hexdigest()
+                path = self.path_for(digest)
+                background_writer.finish_file(raw, path)
+                compressed_size = raw.tell()
+
+            with self.lock:
+                self.bytes_in += size
+                reused = digest in self.known or self.find(digest)
+                if reused:
+                    self.known.add(digest)
+                    self.blobs_reused += 1
+            if reused:
+                os.remove(temp_path)
+                return digest, size
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        with self.lock:
+            self.known.add(digest)
+            self.blobs_written += 1
+            self.bytes_written += compressed_size
+        return digest, size
+
+    def get(self, digest):
+        """Return a blob's uncompressed bytes"""
+        path = self.find(digest)
+        if path is None:
+            raise FileNotFoundError(f"Blob {digest} not found in {self.root}")
+        with open(path, 'rb') as f:
+            compressed = f.read()
+        if path.endswith(self.EXTENSIONS['zstd']):
+            if zstandard is None:
+                raise RuntimeError(
+                    f"zstandard is required to read {path}")
+            return zstandard.ZstdDecompressor().decompress(compressed)
+        return gzip.decompress(compressed)
+
+    def get_text(self, digest):
+        return self.get(digest).decode('utf-8')
+
+    def stats(self):
+        with self.lock:
+            return {
+                'compression': self.compression,
+                'blobs_written': self.blobs_written,
+                'blobs_reused': self.blobs_reused,
+                'bytes_in': self.bytes_in,
+                'bytes_written': self.bytes_written,
+            }
+
+
+blob_store = BlobStore(BLOB_STORE_DIR, BLOB_COMPRESSION)
+
+
+def save_snapshot(run_dir, base, html, css):
+    """
+    Save an event's HTML and CSS
+
+    With SNAPSHOT_STORE = 'blobs' the payloads go to the blob store and
+    <base>_snapshot.json records their digests; with 'files' they are
+    written verbatim as <base>.html and <base>.css.
+
+    Returns:
+        dict: {'html': (digest, size), 'css': (digest, size)}, None for 'files'
+    """
+    if SNAPSHOT_STORE != 'blobs':
+        with open(os.path.join(run_dir, f"{base}.html"), "w", encoding="utf-8") as f:
+            f.write(html)
+            background_writer.finish_file(f)
+        with open(os.path.join(run_dir, f"{base}.css"), "w", encoding="utf-8") as f:
+            f.write(css)
+            background_writer.finish_file(f)
+        return
+
+    parts = {}
+    for part, text in (('html', html), ('css', css)):
+        data = text.encode('utf-8')
+        parts[part] = (blob_store.put(data), len(data))
+    write_snapshot_manifest(run_dir, base, parts)
+    return parts
+
+
+def write_snapshot_manifest(run_dir, base, parts):
+    """Write <base>_snapshot.json for parts given as {'html': (digest, size), ...}"""
+    manifest = {part: {'blob': digest, 'bytes': size}
+                for part, (digest, size) in parts.items()}
+    with open(os.path.join(run_dir, f"{base}_snapshot.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        background_writer.finish_file(f)
+
+
+def load_snapshot(run_dir, base):
+    """
+    Load an event's HTML and CSS whichever way they were saved
+
+    Returns:
+        dict: {'html': str, 'css': str}, a part is None if it is missing
+    """
+    manifest_path = os.path.join(run_dir, f"{base}_snapshot.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        return {part: blob_store.get_text(manifest[part]['blob'])
+                if part in manifest else None for part in ('html', 'css')}
+
+    snapshot = {}
+    for part in ('html', 'css'):
+        try:
+            with open(os.path.join(run_dir, f"{base}.{part}"), 'r', encoding='utf-8', newline='') as f:
+                snapshot[part] = f.read()
+        except FileNotFoundError:
+            snapshot[part] = None
+    return snapshot
+
+
+def list_snapshots(run_dir):
+    """Base names (<eventType>_<time>) of the snapshots saved in a run directory"""
+    files = set(os.listdir(run_dir))
+    bases = {f[:-len('_snapshot.json')]
+             for f in files if f.endswith('_snapshot.json')}
+    # Verbatim snapshots are the .html files that have a matching .css
+    bases.update(f[:-len('.css')] for f in files
+                 if f.endswith('.css') and f[:-len('.css')] + '.html' in files)
+    return sorted(bases)
+
+
+def migrate_run_dir(run_dir, keep_originals=False):
+    """
+    Move a run directory's verbatim .html/.css snapshots into the blob store
+
+    Each snapshot gets a manifest, is read back through load_snapshot and
+    compared before its original files are removed.
+
+    Returns:
+        dict: Snapshot count and bytes before/after for the run
+    """
+    report = {'run': os.path.basename(run_dir), 'snapshots': 0,
+              'bytes_before': 0, 'errors': []}
+    files = set(os.listdir(run_dir))
+    for base in list_snapshots(run_dir):
+        if f"{base}_snapshot.json" in files:
+            continue
+        paths = [os.path.join(run_dir, f"{base}.{part}")
+                 for part in ('html', 'css')]
+        try:
+            original = load_snapshot(run_dir, base)
+            parts = {}
+            for part in ('html', 'css'):
+                data = original[part].encode('utf-8')
+                parts[part] = (blob_store.put(data), len(data))
+            write_snapshot_manifest(run_dir, base, parts)
+            manifest_path = os.path.join(run_dir, f"{base}_snapshot.json")
+            if load_snapshot(run_dir, base) != original:
+                os.remove(manifest_path)
+                raise ValueError("blob contents differ from the original")
+        except Exception as e:
+            print(f"Could not migrate snapshot {base} in {run_dir}: {e}")
+            report['errors'].append({'snapshot': base, 'error': str(e)})
+            continue
+        report['snapshots'] += 1
+        report['bytes_before'] += sum(os.path.getsize(p) for p in paths)
+        if not keep_originals:
+            for path in paths:
+                os.remove(path)
+    return report
+
+
+class RunStore:
+    """
+    SQLite index of run state: snapshots, events, suggestion results,
+    per-field updates and confirmations
+
+    Rows are keyed by run (the run folder's resolved path, see run_key) and
+    indexed by field and URL. Request handlers queue their writes on the background writer
+    (readers flush it first); each thread gets its own connection and WAL
+    mode lets reads proceed during writes. Runs
+    recorded before the store existed are imported from their JSON files
+    the first time they are looked up.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS runs (
+        run TEXT PRIMARY KEY,
+        registered_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS snapshots (
+        id INTEGER PRIMARY KEY,
+        run TEXT NOT NULL,
+        base TEXT NOT NULL,
+        event_type TEXT,
+        time INTEGER,
+        url TEXT,
+        html_blob TEXT,
+        css_blob TEXT,
+        html_bytes INTEGER,
+        css_bytes INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS snapshots_run_url ON snapshots (run, url, time);
+    CREATE INDEX IF NOT EXISTS snapshots_run_time ON snapshots (run, time);
+    CREATE TABLE IF NOT EXISTS events (
+        id INTEGER PRIMARY KEY,
+        run TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        time INTEGER,
+        type TEXT,
+        url TEXT,
+        element_id TEXT,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS events_run_seq ON events (run, seq);
+    CREATE INDEX IF NOT EXISTS events_run_url ON events (run, url, seq);
+    CREATE TABLE IF NOT EXISTS suggestions (
+        id INTEGER PRIMARY KEY,
+        run TEXT NOT NULL,
+        time INTEGER,
+        field TEXT,
+        name TEXT,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS suggestions_run_field ON suggestions (run, field, time);
+    CREATE INDEX IF NOT EXISTS suggestions_run_name ON suggestions (run, name, time);
+    CREATE TABLE IF NOT EXISTS field_updates (
+        id INTEGER PRIMARY KEY,
+        run TEXT NOT NULL,
+        time INTEGER,
+        field TEXT NOT NULL,
+        range TEXT,
+        examples TEXT,
+        bad_examples TEXT
+    );
+    CREATE INDEX IF NOT EXISTS field_updates_run_field ON field_updates (run, field, time);
+    CREATE TABLE IF NOT EXISTS confirmations (
+        id INTEGER PRIMARY KEY,
+        run TEXT NOT NULL,
+        time INTEGER,
+        field TEXT,
+        url TEXT,
+        data TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS confirmations_run_field ON confirmations (run, field, time);
+    CREATE INDEX IF NOT EXISTS confirmations_run_url ON confirmations (run, url, time);
+    """
+
+    def __init__(self, path, durability):
+        self.path = path
+        self.durability = durability
+        self.local = threading.local()
+        self.import_lock = threading.Lock()
+        with self.connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    def connect(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                f"PRAGMA synchronous={'FULL' if self.durability == 'fsync' else 'NORMAL'}")
+            self.local.conn = conn
+        return conn
+
+    def register_run(self, run):
+        with self.connect() as conn:
+            conn.execute('INSERT OR IGNORE INTO runs (run, registered_at) VALUES (?, ?)',
+                         (run, time.time()))
+
+    def add_snapshot(self, run, base, event_type, snapshot_time, url, parts):
+        """parts is {'html': (digest, size), 'css': (digest, size)} or None for verbatim files"""
+        parts = parts or {}
+        html = parts.get('html', (None, None))
+        css = parts.get('css', (None, None))
+        with self.connect() as conn:
+            conn.execute(
+                'INSERT INTO snapshots (run, base, event_type, time, url, html_blob, css_blob, html_bytes, css_bytes) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (run, base, event_type, snapshot_time, url, html[0], css[0], html[1], css[1]))
+
+    def replace_events(self, run, events):
+        """Store the run's recorded events, replacing any sent earlier"""
+        with self.connect() as conn:
+            conn.execute('DELETE FROM events WHERE run = ?', (run,))
+            conn.executemany(
+                'INSERT INTO events (run, seq, time, type, url, element_id, data) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(run, seq, event.get('time'), event.get('type'), event.get('url'), event.get('id'),
+                  json.dumps(event, ensure_ascii=False)) for seq, event in enumerate(events)])
+
+    def add_suggestions(self, run, result_time, fields):
+        with self.connect() as conn:
+            conn.executemany(
+                'INSERT INTO suggestions (run, time, field, name, data) VALUES (?, ?, ?, ?, ?)',
+                [(run, result_time, field.get('id'), field.get('name'), json.dumps(field, ensure_ascii=False))
+                 for field in fields if isinstance(field, dict)])
+
+    def add_field_update(self, run, update_time, update):
+        with self.connect() as conn:
+            conn.execute(
+                'INSERT INTO field_updates (run, time, field, range, examples, bad_examples) VALUES (?, ?, ?, ?, ?, ?)',
+                (run, update_time, update.get('field'), update.get('range'),
+                 json.dumps(update.get('examples'), ensure_ascii=False),
+                 json.dumps(update.get('bad_examples', []), ensure_ascii=False)))
+
+    def add_confirmation(self, run, confirmation_time, confirmation):
+        with self.connect() as conn:
+            conn.execute(
+                'INSERT INTO confirmations (run, time, field, url, data) VALUES (?, ?, ?, ?, ?)',
+                (run, confirmation_time, confirmation.get('field'), confirmation.get('url'),
+                 json.dumps(confirmation, ensure_ascii=False)))
+
+    def latest_updates(self, run):
+        """Newest update of every field of a run, as {field: {'field', 'range', 'examples', 'bad_examples', 'time'}}"""
+        latest = {}
+        for row in self.connect().execute(
+                'SELECT time, field, range, examples, bad_examples FROM field_updates '
+                'WHERE run = ? ORDER BY time, id', (run,)):
+            latest[row['field']] = {'field': row['field'], 'range': row['range'],
+                                    'examples': json.loads(row['examples']),
+                                    'bad_examples': json.loads(row['bad_examples']),
+                                    'time': row['time']}
+        return latest
+
+    def latest_suggestions(self, run):
+        """
+        Newest /suggest_inputs result of every field of a run, keyed by the
+        field's id and by its name (an id wins over another field's name)
+        """
+        by_id, by_name = {}, {}
+        for row in self.connect().execute(
+                'SELECT field, name, data FROM suggestions WHERE run = ? ORDER BY time, id', (run,)):
+            data = json.loads(row['data'])
+            if row['field']:
+                by_id[row['field']] = data
+            if row['name']:
+                by_name[row['name']] = data
+        return {**by_name, **by_id}
+
+    def find_confirmation(self, run, field_identifier):
+        """
+        Newest confirmation for a field: an exact field match through the
+        index, else the first whose field contains or is contained in
+        field_identifier (the matching find_confirmation_for_field used)
+        """
+        conn = self.connect()
+        row = conn.execute(
+            'SELECT data FROM confirmations WHERE run = ? AND field = ? '
+            'ORDER BY time DESC, id DESC LIMIT 1', (run, field_identifier)).fetchone()
+        if row is None:
+            row = conn.execute(
+                "SELECT data FROM confirmations WHERE run = ? AND field IS NOT NULL "
+                "AND (instr(?, field) > 0 OR instr(field, ?) > 0) ORDER BY time DESC, id DESC LIMIT 1",
+                (run, field_identifier, field_identifier)).fetchone()
+        return json.loads(row['data']) if row else None
+
+    def lookup(self, run, field=None, url=None):
+        """Rows of a run matching a field (id or name) and/or a URL"""
+        conn = self.connect()
+        result = {}
+        if field is not None:
+            result['suggestions'] = [json.loads(row['data']) for row in conn.execute(
+                'SELECT data FROM suggestions WHERE run = ? AND field = ? '
+                'UNION ALL SELECT data FROM suggestions WHERE run = ? AND name = ? AND field IS NOT ?',
+                (run, field, run, field, field))]
+            result['field_updates'] = [dict(row) for row in conn.execute(
+                'SELECT time, field, range, examples, bad_examples FROM field_updates '
+                'WHERE run = ? AND field = ? ORDER BY time', (run, field))]
+            for row in result['field_updates']:
+                row['examples'] = json.loads(row['examples'])
+                row['bad_examples'] = json.loads(row['bad_examples'])
+            result['confirmations'] = [json.loads(row['data']) for row in conn.execute(
+                'SELECT data FROM confirmations WHERE run = ? AND field = ? ORDER BY time', (run, field))]
+        if url is not None:
+            result['snapshots'] = [dict(row) for row in conn.execute(
+                'SELECT base, event_type, time, url, html_blob, css_blob, html_bytes, css_bytes '
+                'FROM snapshots WHERE run = ? AND url = ? ORDER BY time', (run, url))]
+            result['events'] = [json.loads(row['data']) for row in conn.execute(
+                'SELECT data FROM events WHERE run = ? AND url = ? ORDER BY seq', (run, url))]
+            result['url_confirmations'] = [json.loads(row['data']) for row in conn.execute(
+                'SELECT data FROM confirmations WHERE run = ? AND url = ? ORDER BY time', (run, url))]
+        return result
+
+    def export(self, run):
+        """Everything stored for a run, as JSON-serializable lists"""
+        conn = self.connect()
+        snapshots = [dict(row) for row in conn.execute(
+            'SELECT base, event_type, time, url, html_blob, css_blob, html_bytes, css_bytes '
+            'FROM snapshots WHERE run = ? ORDER BY time, id', (run,))]
+        updates = []
+        for row in conn.execute(
+                'SELECT time, field, range, examples, bad_examples FROM field_updates '
+                'WHERE run = ? ORDER BY time, id', (run,)):
+            update = dict(row)
+            update['examples'] = json.loads(update['examples'])
+            update['bad_examples'] = json.loads(update['bad_examples'])
+            updates.append(update)
+        return {
+            'run': run,
+            'snapshots': snapshots,
+            'events': [json.loads(row['data']) for row in conn.execute(
+                'SELECT data FROM events WHERE run = ? ORDER BY seq', (run,))],
+            'suggestions': [dict(time=row['time'], **json.loads(row['data'])) for row in conn.execute(
+                'SELECT time, data FROM suggestions WHERE run = ? ORDER BY time, id', (run,))],
+            'field_updates': updates,
+            'confirmations': [json.loads(row['data']) for row in conn.execute(
+                'SELECT data FROM confirmations WHERE run = ? ORDER BY time, id', (run,))],
+        }
+
+    @staticmethod
+    def run_key(run_dir):
+        """
+        Key of a run folder: its resolved absolute path, so run folders of
+        the same name under different recording roots stay apart
+        """
+        return os.path.realpath(run_dir)
+
+    def ensure_run(self, run_dir):
+        """Import a run folder's JSON files once if the store has not seen the run"""
+        run = self.run_key(run_dir)
+        conn = self.connect()
+        if conn.execute('SELECT 1 FROM runs WHERE run = ?', (run,)).fetchone():
+            return run
+        with self.import_lock:
+            if not conn.execute('SELECT 1 FROM runs WHERE run = ?', (run,)).fetchone():
+                self.import_run_dir(run_dir, run)
+        return run
+
+    def import_run_dir(self, run_dir, run):
+        print(f"Importing run folder {run_dir} into the run store")
+        for name in sorted(os.listdir(run_dir)):
+            path = os.path.join(run_dir, name)
+            try:
+                if name.startswith('confirmation_') and name.endswith('.json'):
+                    with open(path, 'r', encoding='utf-8') as f:
+                        confirmation = json.load(f)
+                    self.add_confirmation(run, confirmation.get('time'), confirmation)
+                elif name.startswith('input_suggestion_updates_') and name.endswith('.json'):
+                    with open(path, 'r', encoding='utf-8') as f:
+                        update = json.load(f)
+                    self.add_field_update(run, int(name.split('_')[3]), update)
+                elif name.startswith('result_suggested_inputs_') and name.endswith('.json'):
+                    with open(path, 'r', encoding='utf-8') as f:
+                        self.add_suggestions(run, int(name[len('result_suggested_inputs_'):-len('.json')]), json.load(f))
+                elif name == 'recorded_events.json':
+                    with open(path, 'r', encoding='utf-8') as f:
+                        self.replace_events(run, json.load(f))
+            except Exception as e:
+                print(f"Could not import {path}: {e}")
+        for base in list_snapshots(run_dir):
+            event_type, _, snapshot_time = base.rpartition('_')
+            manifest_path = os.path.join(run_dir, f"{base}_snapshot.json")
+            parts = None
+            try:
+                if os.path.exists(manifest_path):
+                    with open(manifest_path, 'r', encoding='utf-8') as f:
+                        manifest = json.load(f)
+                    parts = {part: (entry['blob'], entry.get('bytes'))
+                             for part, entry in manifest.items()}
+                url = None
+                event_path = os.path.join(run_dir, f"{base}_event.json")
+                if os.path.exists(event_path):
+                    with open(event_path, 'r', encoding='utf-8') as f:
+                        url = json.load(f).get('url')
+                self.add_snapshot(run, base, event_type, int(snapshot_time) if snapshot_time.isdigit() else None,
+                                  url, parts)
+            except Exception as e:
+                print(f"Could not import snapshot {base} of {run_dir}: {e}")
+        self.register_run(run)
+
+
+run_store = RunStore(RUN_STORE_PATH, PERSISTENCE_MODE)
+# This run's key in the run store
+RUN_KEY = RunStore.run_key(RUN_SAVE_DIR)
+run_store.register_run(RUN_KEY)
+
+
+class FieldStateRegistry:
+    """
+    Latest range, examples and bad_examples of every field updated in this
+    run, kept in memory so /update_input_suggestion and /field_state never
+    go to disk for them
+    """
+
+    def __init__(self):
+        self.states = {}
+        self.lock = threading.Lock()
+
+    def load(self, states):
+        """Replace the registry with {field: state}, e.g. run_store.latest_updates()"""
+        with self.lock:
+            self.states = {field: self._copy(state) for field, state in states.items()}
+
+    def get(self, field):
+        """The field's latest state (a copy), or None"""
+        with self.lock:
+            state = self.states.get(field)
+            return self._copy(state) if state else None
+
+    def set(self, field, state):
+        with self.lock:
+            self.states[field] = self._copy(state)
+
+    def all(self):
+        with self.lock:
+            return {field: self._copy(state) for field, state in self.states.items()}
+
+    @staticmethod
+    def _copy(state):
+        state = dict(state)
+        for key in ('examples', 'bad_examples'):
+            if isinstance(state.get(key), list):
+                state[key] = list(state[key])
+        return state
+
+
+def previous_run_dirs(count):
+    """The count most recent run folders before this one, oldest first"""
+    runs = []
+    for name in os.listdir(SAVE_DIR):
+        parts = name.split('_')
+        if (name != RUN_ID and len(parts) == 3 and parts[0] == 'run' and parts[1].isdigit()
+                and os.path.isdir(os.path.join(SAVE_DIR, name))):
+            runs.append((int(parts[1]), name))
+    runs.sort()
+    return [os.path.join(SAVE_DIR, name) for _, name in runs[-count:]] if count > 0 else []
+
+
+def restore_field_states(count):
+    """Field states of the last count runs (newer runs win) plus this run's"""
+    states = {}
+    for run_dir in previous_run_dirs(count):
+        try:
+            states.update(run_store.latest_updates(run_store.ensure_run(run_dir)))
+        except Exception as e:
+            print(f"Could not restore field states from {run_dir}: {e}")
+    states.update(run_store.latest_updates(RUN_KEY))
+    if states:
+        print(f"Restored the state of {len(states)} field(s) from earlier runs")
+    return states
+
+
+field_states = FieldStateRegistry()
+field_states.load(restore_field_states(FIELD_STATE_RESTORE_RUNS))
+
+
+def save_and_index_snapshot(run_dir, data):
+    """save_snapshot, then record the snapshot in the run store"""
+    parts = save_snapshot(run_dir, f"{data['eventType']}_{data['time']}", data['html'], data['css'])
+    run_store.add_snapshot(os.path.basename(run_dir), f"{data['eventType']}_{data['time']}",
+                           data['eventType'], data['time'], data.get('url'), parts)
+
+
+SNAPSHOT_FRAMES_MIMETYPE = 'application/x-snapshot-frames'
+SNAPSHOT_MAX_HEADER_BYTES = 1024 * 1024
+
+snapshot_slots = threading.BoundedSemaphore(SNAPSHOT_MAX_CONCURRENT)
+
+
+def read_exact(stream, size):
+    return b''.join(iter_body_part(stream, size))
+
+
+def iter_body_part(stream, size):
+    """Yield the next size bytes of stream in chunks of at most SNAPSHOT_CHUNK_BYTES"""
+    while size:
+        chunk = stream.read(min(size, SNAPSHOT_CHUNK_BYTES))
+        if not chunk:
+            raise BadRequest("Snapshot body ended early")
+        size -= len(chunk)
+        yield chunk
+
+
+def ingest_snapshot_frames(stream, run_dir, max_bytes):
+    """
+    Read a framed snapshot body and spool its parts to disk chunk by chunk
+
+    The body is a 4-byte big-endian header length, a UTF-8 JSON header
+    {"eventType", "time", "url", "event", "parts": [[name, size], ...]}
+    and then the raw bytes of each part ('html' and 'css') in header order.
+    Parts go straight to the blob store (or to <base>.html/.css), so the
+    body is never held in memory.
+
+    Returns:
+        tuple: (header, parts) with parts as {'html': (digest, size), ...},
+            None when SNAPSHOT_STORE is 'files'
+    """
+    header_size = int.from_bytes(read_exact(stream, 4), 'big')
+    if header_size > SNAPSHOT_MAX_HEADER_BYTES:
+        raise RequestEntityTooLarge(
+            f"Snapshot header exceeds {SNAPSHOT_MAX_HEADER_BYTES} bytes")
     try:
-        translator = GoogleTranslator(source='fa', target='en')
-        return translator.translate(persian_text)
-    except Exception as e:
-        print(f"Translation error: {e}")
-        return persian_text  # Return original if translation fails
+        header = json.loads(read_exact(stream, header_size))
+        parts = [(str(name), int(size)) for name, size in header['parts']]
+        base = f"{header['eventType']}_{header['time']}"
+    except (ValueError, KeyError, TypeError) as e:
+        raise BadRequest(f"Invalid snapshot header: {e}")
+    if sorted(name for name, _ in parts) != ['css', 'html'] or any(size < 0 for _, size in parts):
+        raise BadRequest("Snapshot header must list one 'html' and one 'css' part")
+    if 4 + header_size + sum(size for _, size in parts) > max_bytes:
+        raise RequestEntityTooLarge(
+            f"Snapshot body exceeds {max_bytes} bytes")
+
+    if SNAPSHOT_STORE == 'blobs':
+        stored = {}
+        for name, size in parts:
+            stored[name] = blob_store.put_stream(iter_body_part(stream, size))
+        write_snapshot_manifest(run_dir, base, stored)
+        return header, stored
+
+    written = []
+    try:
+        for name, size in parts:
+            written.append(os.path.join(run_dir, f"{base}.{name}"))
+            with open(written[-1], 'wb') as f:
+                for chunk in iter_body_part(stream, size):
+                    f.write(chunk)
+                background_writer.finish_file(f)
+    except BaseException:
+        # Do not leave half a snapshot behind
+        for path in written:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    return header, None
+
+
+@app.errorhandler(BadRequest)
+@app.errorhandler(RequestEntityTooLarge)
+def json_http_error(e):
+    return json.dumps({'error': e.description}), e.code, {'Content-Type': 'application/json'}
 
 
 @app.route('/snapshot', methods=['POST'])
 def snapshot():
-    data = request.get_json()
-    print("Received snapshot:", data['eventType'], data['time'])
+    """
+    Save an event's page snapshot
+
+    Accepts JSON {eventType, time, url, html, css, event} or, streamed to
+    disk without buffering, a SNAPSHOT_FRAMES_MIMETYPE body (see
+    ingest_snapshot_frames). Answers 413 above SNAPSHOT_MAX_BODY_BYTES and
+    429 (with Retry-After) when SNAPSHOT_MAX_CONCURRENT snapshots are
+    already being received.
+    """
+    if request.content_length is not None and request.content_length > SNAPSHOT_MAX_BODY_BYTES:
+        raise RequestEntityTooLarge(
+            f"Snapshot body exceeds {SNAPSHOT_MAX_BODY_BYTES} bytes")
+    if not snapshot_slots.acquire(blocking=False):
+        return json.dumps({
+            'error': 'Too many snapshots in progress, retry shortly'
+        }), 429, {'Content-Type': 'application/json', 'Retry-After': '1'}
+    try:
+        if request.mimetype == SNAPSHOT_FRAMES_MIMETYPE:
+            data, parts = ingest_snapshot_frames(
+                request.stream, RUN_SAVE_DIR, SNAPSHOT_MAX_BODY_BYTES)
+            print("Received snapshot stream:", data['eventType'], data['time'])
+            background_writer.submit(
+                run_store.add_snapshot, RUN_KEY, f"{data['eventType']}_{data['time']}",
+                data['eventType'], data['time'], data.get('url'), parts)
+        else:
+            data = request.get_json()
+            # Compressed bodies have no Content-Length to check up front
+            if len(request.get_data()) > SNAPSHOT_MAX_BODY_BYTES:
+                raise RequestEntityTooLarge(
+                    f"Snapshot body exceeds {SNAPSHOT_MAX_BODY_BYTES} bytes")
+            print("Received snapshot:", data['eventType'], data['time'])
+            # Hashing, compression and disk writes happen on the background writer
+            # Blocks, still holding the slot, while the queue's byte budget is used up
+            background_writer.submit(save_and_index_snapshot, RUN_SAVE_DIR, data,
+                                     size=len(data['html']) + len(data['css']))
+    finally:
+        snapshot_slots.release()
+
     base = f"{data['eventType']}_{data['time']}"
-    html_path = os.path.join(RUN_SAVE_DIR, f"{base}.html")
-    css_path = os.path.join(RUN_SAVE_DIR, f"{base}.css")
     event_path = os.path.join(RUN_SAVE_DIR, f"{base}_event.json")
-    with open(html_path, "w", encoding="utf-8") as f:
-        f.write(data['html'])
-    with open(css_path, "w", encoding="utf-8") as f:
-        f.write(data['css'])
 
     if data['eventType'] == 'pageload':
-        with open(event_path, "w", encoding="utf-8") as f:
-            json.dump({"eventType": "pageload",
-                       "time": data['time'],
-                       "url": data['url'], }, f, ensure_ascii=False, indent=2)
+        background_writer.write_json(event_path, {"eventType": "pageload",
+                                                  "time": data['time'],
+                                                  "url": data['url'], })
     elif 'event' in data and data['event'] is not None:
-        with open(event_path, "w", encoding="utf-8") as f:
-            json.dump(data['event'], f, ensure_ascii=False, indent=2)
+        background_writer.write_json(event_path, data['event'])
 
     return 'ok'
 
 
+@app.route('/snapshots/migrate', methods=['POST'])
+def migrate_snapshots():
+    """Convert verbatim snapshots of earlier runs to the blob store"""
+    data = request.get_json(silent=True) or {}
+    # Queued snapshots of this run must be on disk before it is scanned
+    background_writer.flush()
+    runs = data.get('runs') or sorted(
+        name for name in os.listdir(SAVE_DIR)
+        if name.startswith('run_') and os.path.isdir(os.path.join(SAVE_DIR, name)))
+    bytes_written = blob_store.stats()['bytes_written']
+    reports = []
+    for run in runs:
+        run_dir = os.path.join(SAVE_DIR, os.path.basename(run))
+        if not os.path.isdir(run_dir):
+            reports.append({'run': run, 'errors': ['run directory not found']})
+            continue
+        reports.append(migrate_run_dir(
+            run_dir, keep_originals=data.get('keep_originals', False)))
+    bytes_before = sum(report.get('bytes_before', 0) for report in reports)
+    bytes_after = blob_store.stats()['bytes_written'] - bytes_written
+    print(
+        f"Migrated {sum(report.get('snapshots', 0) for report in reports)} snapshot(s): {bytes_before} bytes -> {bytes_after} bytes of new blobs")
+    return (
+        dumps_response({
+            'runs': reports,
+            'bytes_before': bytes_before,
+            'new_blob_bytes': bytes_after,
+        }),
+        200,
+        {'Content-Type': 'application/json'}
+    )
+
+
+_missing_parser_backends = set()
+
+
+def make_soup(html, backend=None):
+    """Parse HTML with the configured parser backend"""
+    backend = backend or HTML_PARSER_BACKEND
+    if backend != 'html.parser' and backend not in _missing_parser_backends:
+        try:
+            return BeautifulSoup(html, backend)
+        except FeatureNotFound:
+            print(
+                f"HTML parser backend '{backend}' is not installed, using html.parser")
+            _missing_parser_backends.add(backend)
+    return BeautifulSoup(html, 'html.parser')
+
+
 def preserve_structure(soup, target_element):
     """Preserve parent structure up to target element"""
     parents = []
@@ -170,8 +1812,67 @@ def preserve_structure(soup, target_element):
     return list(reversed(parents))
 
 
-def truncate_with_context(soup, target_element, max_tokens=100000):
+class DomIndex:
+    """
+    Document-order index of a parsed page, built once per request
+
+    Holds each element's position, serialized length and token count with
+    prefix sums, so the context window before/after a field is found with a
+    binary search instead of re-serializing the page for every field.
+    """
+
+    def __init__(self, soup):
+        self.soup = soup
+        self.lock = threading.Lock()
+        self.elements = None
+        self.positions = None
+        self.lengths = None
+        self.token_prefix = None
+
+    def build(self):
+        with self.lock:
+            if self.elements is not None:
+                return
+            elements = self.soup.find_all()
+            lengths = []
+            token_prefix = [0]
+            for element in elements:
+                element_html = str(element)
+                lengths.append(len(element_html))
+                token_prefix.append(
+                    token_prefix[-1] + count_tokens(element_html))
+            self.positions = {id(element): i for i,
+                              element in enumerate(elements)}
+            self.lengths = lengths
+            self.token_prefix = token_prefix
+            self.elements = elements
+
+    def position(self, element):
+        self.build()
+        return self.positions[id(element)]
+
+    def content_before(self, element, max_tokens):
+        """Closest preceding elements whose tokens add up to at most max_tokens"""
+        end = self.position(element)
+        # Smallest start with prefix[end] - prefix[start] <= max_tokens
+        start = bisect_left(self.token_prefix,
+                            self.token_prefix[end] - max_tokens, 0, end)
+        return ''.join(str(el) for el in self.elements[start:end])
+
+    def content_after(self, element, max_tokens):
+        """Closest following elements whose tokens add up to at most max_tokens"""
+        start = self.position(element) + 1
+        # Largest end with prefix[end] - prefix[start] <= max_tokens
+        end = bisect_right(self.token_prefix,
+                           self.token_prefix[start] + max_tokens, start, len(self.token_prefix)) - 1
+        return ''.join(str(el) for el in self.elements[start:end])
+
+
+def truncate_with_context(soup, target_element, max_tokens=100000, dom_index=None):
     """Try to keep target element with as much context as possible"""
+    if dom_index is None:
+        dom_index = DomIndex(soup)
+
     # Get parent structure
     parents = preserve_structure(soup, target_element)
 
@@ -193,24 +1894,27 @@ def truncate_with_context(soup, target_element, max_tokens=100000):
         temp_structure = str(parent_copy).replace(
             '></', f'>{essential_html}</')
         # Leave room for siblings
-        if count_tokens(temp_structure) < max_tokens * 0.8:
+        temp_tokens = count_tokens(temp_structure)
+        if temp_tokens < max_tokens * 0.8:
             essential_html = temp_structure
-            token_count = count_tokens(essential_html)
+            token_count = temp_tokens
 
     # Try to add siblings and other content
     remaining_tokens = max_tokens - token_count
 
     # Add content before target
     before_content = get_content_before(
-        soup, target_element, remaining_tokens // 2)
+        soup, target_element, remaining_tokens // 2, dom_index)
 
     # Add content after target
     after_content = get_content_after(
-        soup, target_element, remaining_tokens // 2)
+        soup, target_element, remaining_tokens // 2, dom_index)
 
     # Combine everything
     if before_content or after_content:
-        # Create new soup with combined content
+        # Create new soup with combined content. This re-serializes a
+        # fragment, so it stays on html.parser: lxml/html5lib would wrap it
+        # in <html><body> and change the prompt.
         new_soup = BeautifulSoup(
             f"{before_content}{essential_html}{after_content}", 'html.parser')
         return str(new_soup)
@@ -218,53 +1922,115 @@ def truncate_with_context(soup, target_element, max_tokens=100000):
     return essential_html
 
 
-def get_content_before(soup, target_element, max_tokens):
+def get_content_before(soup, target_element, max_tokens, dom_index=None):
     """Get content before target element within token limit"""
-    # Find all elements before target
-    all_elements = soup.find_all()
-    target_index = all_elements.index(target_element)
+    if dom_index is None:
+        dom_index = DomIndex(soup)
+    return dom_index.content_before(target_element, max_tokens)
 
-    before_elements = all_elements[:target_index]
-    before_elements.reverse()  # Start from closest to target
 
-    collected_content = []
-    current_tokens = 0
-
-    for element in before_elements:
-        element_html = str(element)
-        element_tokens = count_tokens(element_html)
-
-        if current_tokens + element_tokens <= max_tokens:
-            collected_content.insert(0, element_html)  # Insert at beginning
-            current_tokens += element_tokens
-        else:
-            break
-
-    return ''.join(collected_content)
-
-
-def get_content_after(soup, target_element, max_tokens):
+def get_content_after(soup, target_element, max_tokens, dom_index=None):
     """Get content after target element within token limit"""
-    # Find all elements after target
-    all_elements = soup.find_all()
-    target_index = all_elements.index(target_element)
-
-    after_elements = all_elements[target_index + 1:]
-
-    collected_content = []
-    current_tokens = 0
-
-    for element in after_elements:
-        element_html = str(element)
-        element_tokens = count_tokens(element_html)
-
-        if current_tokens + element_tokens <= max_tokens:
-            collected_content.append(element_html)
-            current_tokens += element_tokens
-        else:
-            break
+    if dom_index is None:
+        dom_index = DomIndex(soup)
+    return dom_index.content_after(target_element, max_tokens)
+
+
+SCRIPT_PATTERN = re.compile(r'<script\b[^>]*>.*?</script\s*>', re.IGNORECASE | re.DOTALL)
+STYLE_PATTERN = re.compile(r'<style\b[^>]*>.*?</style\s*>', re.IGNORECASE | re.DOTALL)
+COMMENT_PATTERN = re.compile(r'<!--.*?-->', re.DOTALL)
+SVG_PATTERN = re.compile(r'<svg\b[^>]*>.*?</svg\s*>', re.IGNORECASE | re.DOTALL)
+DATA_URI_PATTERN = re.compile(
+    r'data:[\w.+-]+/[\w.+-]+(?:;[\w-]+=[\w.-]+)*;base64,[A-Za-z0-9+/=_-]+', re.IGNORECASE)
+TRACKING_PATTERNS = [
+    re.compile(r'<noscript\b[^>]*>.*?</noscript\s*>', re.IGNORECASE | re.DOTALL),
+    re.compile(r'<iframe\b[^>]*>.*?</iframe\s*>', re.IGNORECASE | re.DOTALL),
+    re.compile(r'<link\b[^>]*>', re.IGNORECASE),
+    # 1x1 tracking pixels
+    re.compile(r'<img\b(?=[^>]*\bwidth=["\']?[01]\b)(?=[^>]*\bheight=["\']?[01]\b)[^>]*>', re.IGNORECASE),
+]
+WHITESPACE_PATTERN = re.compile(r'[ \t\r\f\v]*\n\s*|[ \t\r\f\v]{2,}')
+# Markup whose whitespace is kept as is: tags (with their attribute values),
+# comments and the contents of whitespace-sensitive elements
+_TAG = r'<(?:[^>"\']|"[^"]*"|\'[^\']*\')*>'
+VERBATIM_MARKUP_PATTERN = re.compile(
+    r'<(textarea|pre|script|style)\b(?:[^>"\']|"[^"]*"|\'[^\']*\')*>.*?</\1\s*>|<!--.*?-->|' + _TAG,
+    re.IGNORECASE | re.DOTALL)
+
+
+def prune_tracking(html):
+    for pattern in TRACKING_PATTERNS:
+        html = pattern.sub('', html)
+    return html
+
+
+def collapse_whitespace(html):
+    """Collapse whitespace runs in text between tags, leaving markup and <textarea>/<pre> content alone"""
+    def collapse(text):
+        return WHITESPACE_PATTERN.sub(lambda m: '\n' if '\n' in m.group(0) else ' ', text)
+
+    parts = []
+    end = 0
+    for match in VERBATIM_MARKUP_PATTERN.finditer(html):
+        parts.append(collapse(html[end:match.start()]))
+        parts.append(match.group(0))
+        end = match.end()
+    parts.append(collapse(html[end:]))
+    return ''.join(parts)
+
+
+# Pruning steps by name, applied in the order listed in HTML_PRUNE_STEPS
+PRUNE_STEPS = {
+    'scripts': lambda html: SCRIPT_PATTERN.sub('', html),
+    'styles': lambda html: STYLE_PATTERN.sub('', html),
+    'comments': lambda html: COMMENT_PATTERN.sub('', html),
+    'svg': lambda html: SVG_PATTERN.sub('<svg></svg>', html),
+    'data_uris': lambda html: DATA_URI_PATTERN.sub('data:,', html),
+    'tracking': prune_tracking,
+    'whitespace': collapse_whitespace,
+}
+
+
+def measure_tokens(text):
+    """Token count in the configured TOKEN_COUNT_MODE (estimated or exact)"""
+    if TOKEN_COUNT_MODE == 'estimate':
+        return int(estimate_tokens(text))
+    return count_tokens(text)
+
+
+def prune_html(html, steps=None):
+    """
+    Strip markup the LLM does not need while keeping form fields and labels
 
-    return ''.join(collected_content)
+    Returns:
+        tuple: (pruned_html, report) where report lists bytes and tokens
+            removed and the pruned page's token count
+    """
+    if steps is None:
+        steps = HTML_PRUNE_STEPS
+    original = html
+    original_bytes = len(original.encode('utf-8', 'surrogatepass'))
+
+    removed = {}
+    for step in steps:
+        before = len(html)
+        html = PRUNE_STEPS[step](html)
+        removed[step] = before - len(html)
+
+    pruned_bytes = len(html.encode('utf-8', 'surrogatepass'))
+    report = {
+        'steps': list(steps),
+        'chars_removed_by_step': removed,
+        'bytes_before': original_bytes,
+        'bytes_after': pruned_bytes,
+        'bytes_removed': original_bytes - pruned_bytes,
+    }
+    if steps:
+        # Only the pruned page is counted exactly (the budget check reuses
+        # this count); the original is estimated, which is cheap
+        report['tokens_after'] = measure_tokens(html)
+        report['tokens_removed'] = max(0, round(estimate_tokens(original)) - report['tokens_after'])
+    return html, report
 
 
 def is_element_visible(element):
@@ -284,141 +2050,788 @@ def is_element_visible(element):
     return True
 
 
-def suggest_input_values(html):
-    soup = BeautifulSoup(html, 'html.parser')
+VALID_INPUT_TYPES = [
+    'text',
+    'password',
+    'email',
+    'number',
+    'date',
+    'datetime-local',
+    'month',
+    'range',
+    'search',
+    'tel',
+    'time',
+    'url',
+    'week'
+]
+
+FIELD_PROMPT_EXAMPLES = (
+    "Here are examples for understanding:\n\n"
+
+    "Example 1:\n"
+    "Input:\n"
+    "<input id=\"password\" name=\"password\" type=\"password\" minlength=\"8\" />\n"
+    "Output:\n"
+    "{\n"
+    "  \"name\": \"password\",\n"
+    "  \"id\": \"password\",\n"
+    "  \"type\": \"password\",\n"
+    "  \"examples\": [\"password123\", \"MySecure2024\", \"TestPass99\", \"AdminLogin1\", \"UserAccess88\"],\n"
+    "  \"bad_examples\": [\"123\", \"pass\", \"1234567\", \"a\", \"\"],\n"
+    "  \"limitations\": \"The password must be at least 8 characters long. English lowercase or uppercase letters are allowed. Numbers and other common characters can also be used to increase security.\"\n"
+    "}\n\n"
+
+    "Example 2:\n"
+    "Input:\n"
+    "<input id=\"email\" name=\"email\" type=\"email\" />\n"
+    "Output:\n"
+    "{\n"
+    "  \"name\": \"email\",\n"
+    "  \"id\": \"email\",\n"
+    "  \"type\": \"email\",\n"
+    "  \"examples\": [\"user@example.com\", \"test.email@domain.org\", \"admin@company.co.uk\", \"developer@site.net\", \"contact@business.info\"],\n"
+    "  \"bad_examples\": [\"invalid-email\", \"@domain.com\", \"user@\", \"plaintext\", \"user.domain.com\"],\n"
+    "  \"limitations\": \"Must be a valid email address with @ symbol and proper domain format.\"\n"
+    "}\n\n"
+
+    "Example 3:\n"
+    "Input:\n"
+    "<input id=\"phone\" name=\"phone\" type=\"text\" pattern=\"\\d{11}\" />\n"
+    "Output:\n"
+    "{\n"
+    "  \"name\": \"phone\",\n"
+    "  \"id\": \"phone\",\n"
+    "  \"type\": \"text\",\n"
+    "  \"examples\": [\"09123456789\", \"09351234567\", \"09221234567\", \"09901234567\", \"09111111111\"],\n"
+    "  \"bad_examples\": [\"0912345678\", \"091234567890\", \"abc1234567\", \"09-123-456\", \"123456789\"],\n"
+    "  \"limitations\": \"The phone number must contain exactly 11 numeric digits with no spaces, symbols, or letters allowed.\"\n"
+    "}\n"
+)
+
+# FIELD_PROMPT_EXAMPLES with the limitations written in both languages
+BILINGUAL_FIELD_PROMPT_EXAMPLES = (
+    FIELD_PROMPT_EXAMPLES
+    .replace(
+        "  \"limitations\": \"The password must",
+        "  \"limitations_fa\": \"رمز عبور باید حداقل ۸ کاراکتر باشد. حروف کوچک یا بزرگ انگلیسی مجاز است. برای افزایش امنیت می‌توان از اعداد و سایر کاراکترهای رایج نیز استفاده کرد.\",\n"
+        "  \"limitations_en\": \"The password must")
+    .replace(
+        "  \"limitations\": \"Must be a valid email",
+        "  \"limitations_fa\": \"باید یک آدرس ایمیل معتبر با علامت @ و قالب دامنه صحیح باشد.\",\n"
+        "  \"limitations_en\": \"Must be a valid email")
+    .replace(
+        "  \"limitations\": \"The phone number must",
+        "  \"limitations_fa\": \"شماره تلفن باید دقیقاً ۱۱ رقم باشد و فاصله، نماد یا حرف در آن مجاز نیست.\",\n"
+        "  \"limitations_en\": \"The phone number must")
+)
+
+FIELD_PROMPT_RULES = {
+    'translate': (
+        "name, id, type, limitations, examples, and bad_examples. "
+        "- name: The value of the 'name' attribute.\n"
+        "- id: The value of the 'id' attribute (use the name if id doesn't exist).\n"
+        "- type: Input type (text, password, etc.) or 'textarea'.\n"
+        "- limitations: Validation rules extracted from attributes like minlength, maxlength, pattern, or placeholder. This description should be written in English as complete sentences.\n"
+        "- examples: 5 example values that match these limitations and would be ACCEPTED by the field validation.\n"
+        "- bad_examples: 5 example values that VIOLATE these limitations and would be REJECTED by the field validation (for negative testing).\n"
+        "Keep the keys constant but write limitation values in English.\n"
+    ),
+    'bilingual': (
+        "name, id, type, limitations_en, limitations_fa, examples, and bad_examples. "
+        "- name: The value of the 'name' attribute.\n"
+        "- id: The value of the 'id' attribute (use the name if id doesn't exist).\n"
+        "- type: Input type (text, password, etc.) or 'textarea'.\n"
+        "- limitations_en: Validation rules extracted from attributes like minlength, maxlength, pattern, or placeholder. This description should be written in English as complete sentences.\n"
+        "- limitations_fa: The same description as limitations_en, written in fluent Persian (Farsi script).\n"
+        "- examples: 5 example values that match these limitations and would be ACCEPTED by the field validation.\n"
+        "- bad_examples: 5 example values that VIOLATE these limitations and would be REJECTED by the field validation (for negative testing).\n"
+        "Keep the keys constant; write limitations_en in English and limitations_fa in Persian.\n"
+    ),
+}
+
+
+def call_llm_structured(messages, schema):
+    """Call the configured LLM with a Pydantic schema and return the raw JSON text"""
+    with llm_slots:
+        if is_local:
+            response = chat(model="llama3.1",
+                            messages=messages,
+                            format=schema.model_json_schema(),
+                            options={"num_ctx": 32768}
+                            )
+            return response['message']['content']
+
+        response = client.beta.chat.completions.parse(
+            model=model_name,
+            messages=messages,
+            response_format=schema,
+        )
+        return response.choices[0].message.content
+
+
+def call_llm_text(prompt, temperature=0.7, max_tokens=800):
+    """
+    Send one user prompt to the configured LLM and return its text reply
+
+    temperature and max_tokens apply to both backends (ollama calls the
+    latter num_predict).
+    """
+    with llm_slots:
+        if is_local:
+            response = chat(model="llama3.1",
+                            messages=[{"role": "user", "content": prompt}],
+                            options={"num_ctx": 8192,
+                                     "temperature": temperature,
+                                     "num_predict": max_tokens})
+            return response['message']['content']
+
+        response = client.chat.completions.create(
+            model=model_name,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content
+
+
+def run_concurrently(func, items, max_workers=None):
+    """
+    Run func over items on a bounded thread pool
+
+    Args:
+        func (callable): Called with one item
+        items (list): Work items
+        max_workers (int): Pool size, defaults to the backend's LLM_MAX_IN_FLIGHT
+
+    Returns:
+        list: (result, error) per item in input order; error is None on success
+    """
+    if max_workers is None:
+        max_workers = LLM_MAX_IN_FLIGHT['local' if is_local else 'api']
+    if not items:
+        return []
+
+    def guarded(item):
+        try:
+            return func(item), None
+        except Exception as e:
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(items)))) as executor:
+        return list(executor.map(guarded, items))
+
 
+def extract_target_fields(soup):
+    """Return (element, identifier_type, identifier_value) for every visible input/textarea"""
     # Find all <input> and <textarea> elements
     elements = soup.find_all(['input', 'textarea'])
-    valid_types = [
-        'text',
-        'password',
-        'email',
-        'number',
-        'date',
-        'datetime-local',
-        'month',
-        'range',
-        'search',
-        'tel',
-        'time',
-        'url',
-        'week'
-    ]
+
     # Filter out elements with invalid types and invisible elements
     elements = [
         el for el in elements if (
             el.name == 'textarea' or
             (el.name ==
-             'input' and 'type' in el.attrs and el['type'] in valid_types)
+             'input' and 'type' in el.attrs and el['type'] in VALID_INPUT_TYPES)
         ) and is_element_visible(el)
     ]
 
     # Extract IDs and names (only if they exist)
-    target_identifiers = []
+    targets = []
     for el in elements:
         if 'id' in el.attrs:
-            target_identifiers.append(('id', el['id']))
+            targets.append((el, 'id', el['id']))
         elif 'name' in el.attrs:
-            target_identifiers.append(('name', el['name']))
-
-    extracted_data = []
-    for identifier_type, identifier_value in target_identifiers:
-        if identifier_type == 'id':
-            target_element = soup.find(id=identifier_value)
-        else:  # name
-            target_element = soup.find(attrs={'name': identifier_value})
-        # If the web is more than 60K tokens,
-        # it will be considered as an input within 60K tokens from where the desired input ID is.
-        if count_tokens(html) > 60000:
-            target_html = truncate_with_context(
-                soup, target_element,max_tokens=60000)
+            targets.append((el, 'name', el['name']))
+    return targets
+
+
+def find_target_element(soup, identifier_type, identifier_value):
+    if identifier_type == 'id':
+        return soup.find(id=identifier_value)
+    return soup.find(attrs={'name': identifier_value})
+
+
+def get_context_html(soup, html, anchor_element, dom_index=None, page_over_budget=None):
+    """Return the HTML sent to the LLM for a field (or a group of fields)"""
+    if page_over_budget is None:
+        page_over_budget = exceeds_token_budget(html, 60000)
+    # If the web is more than 60K tokens,
+    # it will be considered as an input within 60K tokens from where the desired input ID is.
+    if page_over_budget:
+        return truncate_with_context(soup, anchor_element, max_tokens=60000, dom_index=dom_index)
+    return html
+
+
+HINT_PATTERN = re.compile(
+    r'hint|help|error|invalid|feedback|description|note|tooltip', re.IGNORECASE)
+HEADING_TAGS = ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']
+FORM_CONTROL_TAGS = ['input', 'textarea', 'select', 'button']
+
+
+def clip_text(text, limit=200):
+    text = ' '.join(text.split())
+    return text if len(text) <= limit else text[:limit] + '...'
+
+
+def get_referenced_text(soup, element, attr):
+    """Text of the elements whose ids are listed in an aria-* reference attribute"""
+    value = element.get(attr)
+    if not value:
+        return []
+    texts = []
+    for ref_id in str(value).split():
+        ref = soup.find(id=ref_id)
+        if ref is not None and ref.get_text(strip=True):
+            texts.append(clip_text(ref.get_text(' ')))
+    return texts
+
+
+def build_field_digest(soup, element):
+    """
+    Build a compact text description of a field for the prompt
+
+    Includes the element itself, its label and aria text, the enclosing
+    form's legend and heading, nearby hint/error text and sibling field names.
+    """
+    if element.name == 'textarea':
+        element_html = clip_text(str(element), 500)
+    else:
+        element_html = str(element)
+    lines = [f"Element: {element_html}"]
+
+    label_tag = find_field_label(soup, element)
+    label = clip_text(label_tag.get_text(' ')) if label_tag else ''
+    if label:
+        lines.append(f"Label: {label}")
+
+    aria = []
+    for attr in ('aria-label', 'aria-placeholder', 'aria-required', 'aria-invalid'):
+        if element.get(attr):
+            aria.append(f"{attr}={clip_text(str(element[attr]))}")
+    for attr in ('aria-labelledby', 'aria-describedby', 'aria-errormessage'):
+        for text in get_referenced_text(soup, element, attr):
+            aria.append(f"{attr}: {text}")
+    if aria:
+        lines.append("ARIA: " + '; '.join(aria))
+
+    form = element.find_parent('form')
+    fieldset = element.find_parent('fieldset')
+    legend = fieldset.find('legend') if fieldset else None
+    if legend is None and form is not None:
+        legend = form.find('legend')
+    if legend is not None and legend.get_text(strip=True):
+        lines.append(f"Form legend: {clip_text(legend.get_text(' '))}")
+    heading = element.find_previous(HEADING_TAGS)
+    if heading is not None and heading.get_text(strip=True):
+        lines.append(f"Heading: {clip_text(heading.get_text(' '))}")
+
+    # Hint and error text next to the field (skipping wrappers of other fields)
+    hints = []
+    container = element.parent
+    if container is not None and container.name == 'label':
+        container = container.parent
+    if container is not None and container.name not in ('body', 'html', '[document]'):
+        for child in container.find_all(True, recursive=False):
+            if len(hints) >= 5:
+                break
+            if child is element or child is label_tag or child.name in FORM_CONTROL_TAGS:
+                continue
+            if child.find(FORM_CONTROL_TAGS) is not None:
+                continue
+            for candidate in [child] + child.find_all(True):
+                marker = ' '.join(candidate.get('class', [])) + \
+                    ' ' + candidate.get('id', '')
+                if (candidate.name == 'small' or HINT_PATTERN.search(marker)) and candidate.get_text(strip=True):
+                    text = clip_text(candidate.get_text(' '))
+                    if text not in hints:
+                        hints.append(text)
+                    break
+    if hints:
+        lines.append("Hints: " + ' | '.join(hints))
+
+    scope = form if form is not None else element.parent
+    siblings = []
+    if scope is not None:
+        for sibling in scope.find_all(['input', 'textarea', 'select']):
+            if sibling is element:
+                continue
+            name = sibling.get('name') or sibling.get('id')
+            if name and sibling.get('type') != 'hidden' and name not in siblings:
+                siblings.append(name)
+    if siblings:
+        lines.append("Sibling fields: " + ', '.join(siblings[:20]))
+
+    return '\n'.join(lines)
+
+
+def get_prompt_context(soup, html, element, dom_index=None, page_over_budget=None, context_mode=None):
+    """Return the user message content for a field in the configured context mode"""
+    if (context_mode or PROMPT_CONTEXT_MODE) == 'digest':
+        return build_field_digest(soup, element)
+    return get_context_html(soup, html, element, dom_index, page_over_budget)
+
+
+def suggest_single_field(soup, html, identifier_type, identifier_value, dom_index=None, page_over_budget=None,
+                         context_mode=None, limitations_mode=None):
+    """Ask the LLM about one field and return its FormField data with Persian limitations"""
+    limitations_mode = limitations_mode or LIMITATIONS_MODE
+    target_element = find_target_element(
+        soup, identifier_type, identifier_value)
+    target_html = get_prompt_context(
+        soup, html, target_element, dom_index, page_over_budget, context_mode)
+
+    # Build the prompt for structured extraction
+    system_msg = {
+        "role": "system",
+        "content": (
+            "You are an HTML parser. You receive HTML below and process only the element whose id or name equals the specified value. "
+            "For that element, create a JSON object with keys: "
+            + FIELD_PROMPT_RULES[limitations_mode] +
+            "Provide output only as a JSON object matching the Pydantic schema.\n"
+            f"Process only and exclusively the element with {'id' if identifier_type == 'id' else 'name'} equal to '{identifier_value}'. Do not include any other element in the output.\n"
+            + (BILINGUAL_FIELD_PROMPT_EXAMPLES if limitations_mode == 'bilingual' else FIELD_PROMPT_EXAMPLES)
+        )
+    }
+
+    user_msg = {"role": "user", "content": target_html}
+
+    # Call the LLM with the JSON schema and parse the structured JSON content
+    data = json.loads(call_llm_structured(
+        [system_msg, user_msg], FIELD_SCHEMAS[limitations_mode][0]))
+
+    # Persian limitations, translated only when the model did not provide them
+    localize_limitations([data], limitations_mode)
+    return data
+
+
+def group_fields_into_batches(targets, batch_size):
+    """Group targets by enclosing <form> (page-level fields share a group) and chunk each group"""
+    groups = {}
+    for target in targets:
+        form = target[0].find_parent('form')
+        groups.setdefault(id(form) if form else None, (form, []))[1].append(target)
+
+    batches = []
+    for form, members in groups.values():
+        for i in range(0, len(members), batch_size):
+            batches.append((form, members[i:i + batch_size]))
+    return batches
+
+
+def match_batch_field(batch_fields, identifier_type, identifier_value, schema=FormField):
+    """Find the model's entry for a requested field, validated against schema"""
+    for entry in batch_fields:
+        if not isinstance(entry, dict):
+            continue
+        if entry.get(identifier_type) == identifier_value or entry.get('id') == identifier_value:
+            try:
+                return schema.model_validate(entry).model_dump()
+            except Exception:
+                return None
+    return None
+
+
+def common_ancestor(elements):
+    """Innermost element containing all of elements, None if only the document does"""
+    chains = [set(map(id, el.parents)) | {id(el)} for el in elements[1:]]
+    for candidate in [elements[0], *elements[0].parents]:
+        if candidate.name == '[document]':
+            return None
+        if all(id(candidate) in chain for chain in chains):
+            return candidate
+    return None
+
+
+def suggest_field_batch(soup, html, form, members, dom_index=None, page_over_budget=None, context_mode=None,
+                        limitations_mode=None):
+    """
+    Describe several fields in one structured request
+
+    In html mode the context window is centred on the members' form or
+    their innermost common ancestor; a batch whose span does not fit is
+    split in two.
+
+    Returns:
+        list: FormField data per member in the same order, None where the
+        model's output was missing or malformed
+    """
+    limitations_mode = limitations_mode or LIMITATIONS_MODE
+    field_schema, batch_schema = FIELD_SCHEMAS[limitations_mode]
+    if (context_mode or PROMPT_CONTEXT_MODE) == 'digest':
+        target_html = '\n\n'.join(build_field_digest(soup, el)
+                                   for el, _, _ in members)
+    else:
+        if form is not None:
+            anchor = form
+        elif len(members) == 1:
+            anchor = members[0][0]
         else:
-            target_html = html
-        # Build the prompt for structured extraction
-
-        system_msg = {
-            "role": "system",
-            "content": (
-                "You are an HTML parser. You receive HTML below and process only the element whose id or name equals the specified value. "
-                "For that element, create a JSON object with keys: name, id, type, limitations, examples, and bad_examples. "
-                "- name: The value of the 'name' attribute.\n"
-                "- id: The value of the 'id' attribute (use the name if id doesn't exist).\n"
-                "- type: Input type (text, password, etc.) or 'textarea'.\n"
-                "- limitations: Validation rules extracted from attributes like minlength, maxlength, pattern, or placeholder. This description should be written in English as complete sentences.\n"
-                "- examples: 5 example values that match these limitations and would be ACCEPTED by the field validation.\n"
-                "- bad_examples: 5 example values that VIOLATE these limitations and would be REJECTED by the field validation (for negative testing).\n"
-                "Keep the keys constant but write limitation values in English.\n"
-                "Provide output only as a JSON object matching the Pydantic schema.\n"
-                f"Process only and exclusively the element with {'id' if identifier_type == 'id' else 'name'} equal to '{identifier_value}'. Do not include any other element in the output.\n"
-                "Here are examples for understanding:\n\n"
-
-                "Example 1:\n"
-                "Input:\n"
-                "<input id=\"password\" name=\"password\" type=\"password\" minlength=\"8\" />\n"
-                "Output:\n"
-                "{\n"
-                "  \"name\": \"password\",\n"
-                "  \"id\": \"password\",\n"
-                "  \"type\": \"password\",\n"
-                "  \"examples\": [\"password123\", \"MySecure2024\", \"TestPass99\", \"AdminLogin1\", \"UserAccess88\"],\n"
-                "  \"bad_examples\": [\"123\", \"pass\", \"1234567\", \"a\", \"\"],\n"
-                "  \"limitations\": \"The password must be at least 8 characters long. English lowercase or uppercase letters are allowed. Numbers and other common characters can also be used to increase security.\"\n"
-                "}\n\n"
-
-                "Example 2:\n"
-                "Input:\n"
-                "<input id=\"email\" name=\"email\" type=\"email\" />\n"
-                "Output:\n"
-                "{\n"
-                "  \"name\": \"email\",\n"
-                "  \"id\": \"email\",\n"
-                "  \"type\": \"email\",\n"
-                "  \"examples\": [\"user@example.com\", \"test.email@domain.org\", \"admin@company.co.uk\", \"developer@site.net\", \"contact@business.info\"],\n"
-                "  \"bad_examples\": [\"invalid-email\", \"@domain.com\", \"user@\", \"plaintext\", \"user.domain.com\"],\n"
-                "  \"limitations\": \"Must be a valid email address with @ symbol and proper domain format.\"\n"
-                "}\n\n"
-
-                "Example 3:\n"
-                "Input:\n"
-                "<input id=\"phone\" name=\"phone\" type=\"text\" pattern=\"\\d{11}\" />\n"
-                "Output:\n"
-                "{\n"
-                "  \"name\": \"phone\",\n"
-                "  \"id\": \"phone\",\n"
-                "  \"type\": \"text\",\n"
-                "  \"examples\": [\"09123456789\", \"09351234567\", \"09221234567\", \"09901234567\", \"09111111111\"],\n"
-                "  \"bad_examples\": [\"0912345678\", \"091234567890\", \"abc1234567\", \"09-123-456\", \"123456789\"],\n"
-                "  \"limitations\": \"The phone number must contain exactly 11 numeric digits with no spaces, symbols, or letters allowed.\"\n"
-                "}\n"
-            )
-        }
+            # Centre the window on the span covering every member
+            anchor = common_ancestor([el for el, _, _ in members])
+        target_html = None
+        if anchor is not None:
+            target_html = get_context_html(
+                soup, html, anchor, dom_index, page_over_budget)
+        if target_html is None and len(members) > 1:
+            # The members' span does not fit the context window: split the
+            # batch so each half gets a window around its own fields
+            middle = len(members) // 2
+            return (suggest_field_batch(soup, html, None, members[:middle], dom_index, page_over_budget,
+                                        context_mode, limitations_mode) +
+                    suggest_field_batch(soup, html, None, members[middle:], dom_index, page_over_budget,
+                                        context_mode, limitations_mode))
+
+    wanted = '\n'.join(
+        f"- element with {identifier_type} equal to '{identifier_value}'"
+        for _, identifier_type, identifier_value in members)
+    system_msg = {
+        "role": "system",
+        "content": (
+            "You are an HTML parser. You receive HTML below and process only the elements listed at the end of this message. "
+            "Return a JSON object with a single key 'fields' holding one object per listed element, in the listed order. "
+            "Each object has keys: "
+            + FIELD_PROMPT_RULES[limitations_mode] +
+            "Provide output only as a JSON object matching the Pydantic schema.\n"
+            "Do not include any element that is not listed.\n"
+            + (BILINGUAL_FIELD_PROMPT_EXAMPLES if limitations_mode == 'bilingual' else FIELD_PROMPT_EXAMPLES) +
+            "\nEach of the outputs above is one entry of the 'fields' list.\n\n"
+            f"Elements to process:\n{wanted}\n"
+        )
+    }
+    user_msg = {"role": "user", "content": target_html}
 
-        user_msg = {"role": "user", "content": target_html}
+    try:
+        batch_fields = json.loads(
+            call_llm_structured([system_msg, user_msg], batch_schema)).get('fields', [])
+    except Exception as e:
+        print(f"Error in batch suggestion, falling back to single fields: {e}")
+        return [None] * len(members)
 
-        # Call the LLM with the JSON schema
-        if is_local:
-            response = chat(model="llama3.1",
-                            messages=[system_msg, user_msg],
-                            format=FormField.model_json_schema(),
-                            options={"num_ctx": 32768}
-                            )
-            raw = response['message']['content']
+    results = [match_batch_field(batch_fields, identifier_type, identifier_value, field_schema)
+               for _, identifier_type, identifier_value in members]
+
+    # Persian limitations for the whole batch, with at most one translation call
+    localize_limitations(
+        [data for data in results if data is not None], limitations_mode)
+    return results
+
+
+SIGNATURE_ATTRIBUTES = ['pattern', 'minlength', 'maxlength',
+                        'min', 'max', 'placeholder', 'required']
+
+
+def normalize_text(text):
+    return ' '.join(text.split()).lower()
+
+
+def find_field_label(soup, element):
+    """Return the <label> associated with a field, if any"""
+    label = None
+    if element.get('id'):
+        label = soup.find('label', attrs={'for': element['id']})
+    if label is None:
+        label = element.find_parent('label')
+    return label
+
+
+def get_field_label_text(soup, element):
+    """Return the normalized text of the <label> associated with a field, if any"""
+    label = find_field_label(soup, element)
+    return normalize_text(label.get_text()) if label else ''
+
+
+def field_signature(soup, element):
+    """Build a normalized signature of a field used as the suggestion cache key"""
+    signature = {
+        'tag': element.name,
+        'type': element.get('type', 'textarea' if element.name == 'textarea' else ''),
+        'id': element.get('id', ''),
+        'name': element.get('name', ''),
+        'label': get_field_label_text(soup, element),
+    }
+    for attr in SIGNATURE_ATTRIBUTES:
+        value = element.get(attr)
+        if value is not None:
+            signature[attr] = normalize_text(str(value))
+    raw = json.dumps(signature, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class FieldSuggestionCache:
+    """LRU cache of FormField results keyed by field signature, persisted as JSON"""
+
+    def __init__(self, path, max_entries, ttl_seconds):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        # Serializes saves so the newest snapshot is the one left on disk
+        self.save_lock = threading.Lock()
+        self.dirty = False
+        self.save_scheduled = False
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            for key, entry in stored[-self.max_entries:]:
+                self.entries[key] = entry
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"Could not load suggestion cache {self.path}: {e}")
+
+    def save(self):
+        """Write the cache if it changed since the last save"""
+        with self.save_lock:
+            with self.lock:
+                self.save_scheduled = False
+                if not self.dirty:
+                    return
+                self.dirty = False
+                snapshot = list(self.entries.items())
+            temp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+            try:
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(snapshot, f, ensure_ascii=False)
+                os.replace(temp_path, self.path)
+            except Exception as e:
+                print(f"Could not save suggestion cache {self.path}: {e}")
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+
+    def schedule_save(self):
+        """Queue one save on the background writer if the cache changed"""
+        with self.lock:
+            if not self.dirty or self.save_scheduled:
+                return
+            self.save_scheduled = True
+        background_writer.submit(self.save)
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and time.time() - entry['time'] > self.ttl_seconds:
+                del self.entries[key]
+                self.dirty = True
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return json.loads(json.dumps(entry['data']))
+
+    def put(self, key, data):
+        with self.lock:
+            self.entries[key] = {'time': time.time(),
+                                 'data': json.loads(json.dumps(data))}
+            self.entries.move_to_end(key)
+            self.dirty = True
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+suggestion_cache = FieldSuggestionCache(
+    SUGGESTION_CACHE_PATH, SUGGESTION_CACHE_MAX_ENTRIES, SUGGESTION_CACHE_TTL_SECONDS)
+
+
+def iter_input_suggestions(html, batch_size=None, use_cache=None, context_mode=None, progress=None,
+                           limitations_mode=None):
+    """
+    Suggest values for every visible input/textarea, yielding each field as it is ready
+
+    LLM requests run concurrently, bounded by LLM_MAX_IN_FLIGHT, and a field
+    whose batch output is missing is retried alone as soon as its batch
+    returns. Fields whose signature is in the suggestion cache are yielded
+    first without calling the model. A field that fails is reported and does
+    not abort the others.
+
+    Args:
+        html (str): Page HTML
+        batch_size (int): Fields per structured request, defaults to
+            SUGGEST_BATCH_SIZE. 1 sends one request per field.
+        use_cache (bool): Look up and store results in the suggestion cache,
+            defaults to SUGGESTION_CACHE_ENABLED
+        context_mode (str): 'html' or 'digest', defaults to PROMPT_CONTEXT_MODE
+        progress (callable): Called as progress(done, total) once the fields
+            are known and again as each one completes
+        limitations_mode (str): 'translate' or 'bilingual', defaults to
+            LIMITATIONS_MODE
+
+    Yields:
+        dict: {'type': 'field', 'index': i, 'field': {...}} or
+        {'type': 'error', 'index': i, <id|name>: value, 'error': msg} in
+        completion order (index is the field's DOM position), then one
+        {'type': 'summary', 'total': n, 'errors': [...], 'pruning': {...}}
+    """
+    if batch_size is None:
+        batch_size = SUGGEST_BATCH_SIZE
+    if use_cache is None:
+        use_cache = SUGGESTION_CACHE_ENABLED
+    if context_mode is None:
+        context_mode = PROMPT_CONTEXT_MODE
+    html, prune_report = prune_html(html)
+    if prune_report['steps']:
+        print(
+            f"Pruned {prune_report['bytes_removed']} bytes (~{prune_report['tokens_removed']} tokens) "
+            f"from page HTML, {prune_report['tokens_after']} tokens left")
+    soup = make_soup(html)
+    targets = extract_target_fields(soup)
+    positions = {id(target[0]): i for i, target in enumerate(targets)}
+    completed = 0
+
+    def reported(event):
+        nonlocal completed
+        completed += 1
+        if progress:
+            progress(completed, len(targets))
+        return event
+
+    if progress:
+        progress(0, len(targets))
+    # Built on first use, only when the page needs truncating
+    dom_index = DomIndex(soup)
+    # The page never changes within a request, so check it once
+    tokenize_seconds = token_counter.stats()['encode_seconds']
+    # Digests never include the page, so there is nothing to count
+    page_over_budget = context_mode != 'digest' and exceeds_token_budget(html, 60000)
+
+    signatures = {}
+    pending = targets
+    if use_cache:
+        pending = []
+        hits = 0
+        for target in targets:
+            signature = field_signature(soup, target[0])
+            cached = suggestion_cache.get(signature)
+            if cached is not None:
+                hits += 1
+                yield reported({'type': 'field', 'index': positions[id(target[0])], 'field': cached})
+            else:
+                signatures[id(target[0])] = signature
+                pending.append(target)
+        print(
+            f"Suggestion cache: {hits} hit(s), {len(pending)} miss(es)")
+
+    def single(target):
+        return suggest_single_field(soup, html, target[1], target[2], dom_index, page_over_budget, context_mode,
+                                    limitations_mode)
+
+    def batch(form, members):
+        return suggest_field_batch(soup, html, form, members, dom_index, page_over_budget, context_mode,
+                                   limitations_mode)
+
+    errors = []
+    max_workers = LLM_MAX_IN_FLIGHT['local' if is_local else 'api']
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+        if batch_size > 1:
+            for form, members in group_fields_into_batches(pending, batch_size):
+                running[executor.submit(batch, form, members)] = (
+                    'batch', members)
         else:
-            response = client.beta.chat.completions.parse(
-                model=model_name,
-                messages=[system_msg, user_msg],
-                response_format=FormField,
-            )
-            raw = response.choices[0].message.content
+            for target in pending:
+                running[executor.submit(single, target)] = ('single', target)
+
+        try:
+            while running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    kind, payload = running.pop(future)
+                    if kind == 'batch':
+                        try:
+                            batch_results = future.result()
+                        except Exception as e:
+                            print(f"Error in batch suggestion: {e}")
+                            batch_results = [None] * len(payload)
+                        for target, data in zip(payload, batch_results):
+                            if data is None:
+                                print(
+                                    f"Batch output missing for {target[1]}={target[2]}, asking for it alone")
+                                running[executor.submit(single, target)] = (
+                                    'single', target)
+                            else:
+                                if id(target[0]) in signatures:
+                                    suggestion_cache.put(
+                                        signatures[id(target[0])], data)
+                                yield reported({'type': 'field', 'index': positions[id(target[0])], 'field': data})
+                        continue
+
+                    el, identifier_type, identifier_value = payload
+                    try:
+                        data = future.result()
+                    except Exception as e:
+                        print(
+                            f"Error suggesting values for {identifier_type}={identifier_value}: {e}")
+                        error = {identifier_type: identifier_value, 'error': str(e)}
+                        errors.append(error)
+                        yield reported({'type': 'error', 'index': positions[id(el)], **error})
+                        continue
+                    if id(el) in signatures:
+                        suggestion_cache.put(signatures[id(el)], data)
+                    yield reported({'type': 'field', 'index': positions[id(el)], 'field': data})
+        except BaseException:
+            # Cancelled job or closed stream: drop queued requests instead of
+            # waiting for them on the way out
+            for future in running:
+                future.cancel()
+            raise
+
+    if use_cache:
+        suggestion_cache.schedule_save()
+
+    print(
+        f"Tokenization: page {'over' if page_over_budget else 'within'} 60K tokens, {token_counter.stats()['encode_seconds'] - tokenize_seconds:.3f}s encoding in this request")
+
+    yield {
+        'type': 'summary',
+        'total': len(targets),
+        'errors': errors,
+        'pruning': prune_report,
+    }
+
 
-            # Parse the structured JSON content
-        data = json.loads(raw)
+def suggest_input_values(html, batch_size=None, use_cache=None, context_mode=None, progress=None,
+                         limitations_mode=None):
+    """
+    Suggest values for every visible input/textarea in the page
 
-        # Translate limitations to Persian
-        data['limitations'] = translate_to_persian(data['limitations'])
+    Collects iter_input_suggestions; see it for the arguments.
 
-        extracted_data.append(data)
-    return {'fields': extracted_data}
+    Returns:
+        dict: {'fields': [...], 'errors': [...], 'pruning': {...}} with
+        fields in DOM order
+    """
+    fields = {}
+    summary = {}
+    for event in iter_input_suggestions(html, batch_size, use_cache, context_mode, progress, limitations_mode):
+        if event['type'] == 'field':
+            fields[event['index']] = event['field']
+        elif event['type'] == 'summary':
+            summary = event
+
+    # Keep DOM order regardless of how fields were grouped or scheduled
+    return {
+        'fields': [fields[i] for i in sorted(fields)],
+        'errors': summary.get('errors', []),
+        'pruning': summary.get('pruning'),
+    }
 
 
 class KatalonTestImprover:
@@ -457,6 +2870,9 @@ class KatalonTestImprover:
                 import threading
 
                 def shutdown_app():
+                    # Finish pending snapshot and suggestion writes
+                    # before the process is killed
+                    background_writer.flush()
                     try:
                         # Send shutdown signal to Flask server
                         import requests
@@ -567,7 +2983,7 @@ class KatalonTestImprover:
 
     def extract_table_content(self, html):
         """Extract just the table content for display"""
-        soup = BeautifulSoup(html, 'html.parser')
+        soup = make_soup(html)
         table = soup.find('table')
         if table:
             rows = table.find_all('tr')
@@ -837,7 +3253,7 @@ command | target | value"""
 </tr>''')
 
         # Get base URL from original HTML
-        soup = BeautifulSoup(self.katalon_html, 'html.parser')
+        soup = make_soup(self.katalon_html)
         base_link = soup.find('link', rel='selenium.base')
         base_url = base_link['href'] if base_link else "http://localhost:3000"
 
@@ -923,6 +3339,7 @@ def events():
     events_path = os.path.join(RUN_SAVE_DIR, 'recorded_events.json')
     with open(events_path, 'w', encoding='utf-8') as f:
         json.dump(data['events'], f, ensure_ascii=False, indent=2)
+    background_writer.submit(run_store.replace_events, RUN_KEY, data['events'])
 
     # Create Katalon Recorder table
     katalon_table = convert_to_katalon_format(data['events'])
@@ -939,71 +3356,100 @@ def events():
     return 'ok'
 
 
-def convert_to_katalon_format(events):
-    """Convert recorded events to Katalon Recorder HTML table format"""
+# Events the extension records about itself; they are left out of the
+# Katalon test, but their duration_ms is not counted as user think time
+KATALON_EXTENSION_EVENTS = frozenset([
+    'suggest_inputs_start',
+    'suggest_inputs_complete',
+    'suggestion_question_mark_click',
+    'suggestion_modal_open',
+    'suggestion_modal_cancel',
+    'suggestion_modal_confirm',
+    'suggestion_modal_submit_start',
+    'suggestion_modal_submit_success',
+    'suggestion_modal_submit_failure'
+])
+
+# Extension-specific element IDs or prefixes
+KATALON_EXTENSION_ELEMENT_IDS = [
+    'edit-range',
+    'edit-examples',
+    'edit-cancel',
+    'edit-confirm',
+    'edit-submit',
+    'input-suggestion-modal',
+    'suggest-inputs'
+]
+extension_element_matcher = re.compile(
+    '|'.join(re.escape(prefix) for prefix in KATALON_EXTENSION_ELEMENT_IDS))
+
+
+class ExtensionDurations:
+    """
+    Total duration_ms of the extension events strictly between two times
 
-    # Filter out extension-specific events
-    extension_events = [
-        'suggest_inputs_start',
-        'suggest_inputs_complete',
-        'suggestion_question_mark_click',
-        'suggestion_modal_open',
-        'suggestion_modal_cancel',
-        'suggestion_modal_confirm',
-        'suggestion_modal_submit_start',
-        'suggestion_modal_submit_success',
-        'suggestion_modal_submit_failure'
-    ]
+    Built once over the whole event log (sorted by time, with prefix sums),
+    so each query is two binary searches instead of a scan of every event.
+    """
 
-    # Extension-specific element IDs or prefixes
-    extension_element_ids = [
-        'edit-range',
-        'edit-examples',
-        'edit-cancel',
-        'edit-confirm',
-        'edit-submit',
-        'input-suggestion-modal',
-        'suggest-inputs'
-    ]
+    def __init__(self, events):
+        timed = sorted(
+            ((event.get('time', 0), index, event['duration_ms'])
+             for index, event in enumerate(events)
+             if event.get('type', '') in KATALON_EXTENSION_EVENTS and 'duration_ms' in event),
+            key=lambda item: item[0])
+        self.times = [item[0] for item in timed]
+        self.timed = timed
+        # Prefix sums are exact for integer durations; float durations are
+        # added up in recording order so the result matches a plain scan
+        self.exact = all(type(item[2]) is int for item in timed)
+        self.prefix = [0]
+        if self.exact:
+            for _, _, duration in timed:
+                self.prefix.append(self.prefix[-1] + duration)
+
+    def between(self, start, end):
+        lo = bisect_right(self.times, start)
+        hi = bisect_left(self.times, end)
+        if lo >= hi:
+            return 0
+        if self.exact:
+            return self.prefix[hi] - self.prefix[lo]
+        total = 0
+        for _, _, duration in sorted(self.timed[lo:hi], key=lambda item: item[1]):
+            total += duration
+        return total
+
+
+def convert_to_katalon_format(events):
+    """Convert recorded events to Katalon Recorder HTML table format"""
 
     # Filter valid events and calculate extension durations
     valid_events = []
     extension_durations = {}  # Track extension processing times between events
+    durations = ExtensionDurations(events)
 
-    for i, event in enumerate(events):
+    for event in events:
         event_type = event.get('type', '')
         element_id = event.get('id', '')
 
         # Skip extension-specific event types
-        if event_type in extension_events:
+        if event_type in KATALON_EXTENSION_EVENTS:
             continue
 
-        # Skip clicks on extension-specific elements
-        if event_type == 'click' and any(element_id.startswith(prefix) for prefix in extension_element_ids):
-            continue
-
-        # Skip typing in extension-specific elements
-        if event_type == 'change' and any(element_id.startswith(prefix) for prefix in extension_element_ids):
+        # Skip clicks on and typing in extension-specific elements
+        if event_type in ('click', 'change') and extension_element_matcher.match(element_id):
             continue
 
         # Skip events from the extension's popup
         if event.get('url', '').startswith('chrome-extension://'):
             continue
 
-        # Calculate extension duration since last valid event
+        # Extension time spent between the last valid event and this one
         extension_duration = 0
         if len(valid_events) > 0:
-            last_valid_time = valid_events[-1]['time']
-            current_time = event.get('time')
-
-            # Find extension events between last valid event and current event
-            for check_event in events:
-                check_time = check_event.get('time', 0)
-                check_type = check_event.get('type', '')
-
-                if last_valid_time < check_time < current_time and check_type in extension_events:
-                    if 'duration_ms' in check_event:
-                        extension_duration += check_event['duration_ms']
+            extension_duration = durations.between(
+                valid_events[-1]['time'], event.get('time'))
 
         # Store the extension duration for this event
         extension_durations[len(valid_events)] = extension_duration
@@ -1145,41 +3591,421 @@ def convert_to_katalon_format(events):
     )
 
 
+class JobCancelled(Exception):
+    """Raised inside a job handler once its job has been cancelled"""
+
+
+class Job:
+    """A unit of background work with progress, result and a cancel flag"""
+
+    def __init__(self, kind, params):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params
+        self.status = 'queued'
+        self.progress = {'done': 0, 'total': None, 'stage': None}
+        self.result = None
+        self.status_code = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.future = None
+        self.cancel_requested = threading.Event()
+        self.finished = threading.Event()
+
+    def report(self, done, total=None, stage=None):
+        """Record progress; raises JobCancelled if the job was cancelled"""
+        self.progress = {'done': done, 'total': total,
+                         'stage': stage or self.progress['stage']}
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self.cancel_requested.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+    def to_dict(self, include_result=False):
+        record = {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+        }
+        if include_result:
+            # Page HTML is saved by the handler; keep the record small
+            record['params'] = {k: v for k, v in self.params.items()
+                                if k != 'html'}
+            record['status_code'] = self.status_code
+            record['result'] = self.result
+        return record
+
+
+class JobManager:
+    """
+    Runs job handlers on an in-process worker pool
+
+    A handler is called as handler(params, job) and returns (payload,
+    status_code); it reports progress through job.report(), which is also
+    where cancellation takes effect. Finished jobs are written to jobs_dir
+    and the oldest ones are dropped from memory past history_limit.
+    """
+
+    FINISHED = ('succeeded', 'failed', 'cancelled')
+
+    def __init__(self, handlers, max_workers, jobs_dir, history_limit):
+        self.handlers = handlers
+        self.jobs_dir = jobs_dir
+        self.history_limit = history_limit
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix='job')
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def submit(self, kind, params):
+        if kind not in self.handlers:
+            raise KeyError(kind)
+        job = Job(kind, params or {})
+        with self.lock:
+            self.jobs[job.id] = job
+        job.future = self.executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def get_record(self, job_id, include_result=False):
+        """Return a job's record from memory or, once evicted, from disk"""
+        job = self.get(job_id)
+        if job is not None:
+            return job.to_dict(include_result)
+        if not re.fullmatch(r'[0-9a-f]{32}', job_id):
+            return None
+        try:
+            with open(os.path.join(self.jobs_dir, f'{job_id}.json'), 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            return None
+        if not include_result:
+            for key in ('params', 'status_code', 'result'):
+                record.pop(key, None)
+        return record
+
+    def records(self):
+        with self.lock:
+            return [job.to_dict() for job in self.jobs.values()]
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns the job or None"""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        job.cancel_requested.set()
+        # A job still in the queue never starts, so finish it here
+        if job.future.cancel():
+            self._finish(job, 'cancelled', {'error': 'Job cancelled'}, 409)
+        return job
+
+    def wait(self, job, timeout=None):
+        job.finished.wait(timeout)
+        return job
+
+    def _run(self, job):
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            job.check_cancelled()
+            payload, status_code = self.handlers[job.kind](job.params, job)
+        except JobCancelled:
+            self._finish(job, 'cancelled', {'error': 'Job cancelled'}, 409)
+        except Exception as e:
+            print(f"Error in {job.kind} job {job.id}: {e}")
+            job.error = str(e)
+            self._finish(job, 'failed', {'error': str(e)}, 500)
+        else:
+            self._finish(job, 'succeeded' if status_code < 400 else 'failed',
+                         payload, status_code)
+
+    def _finish(self, job, status, payload, status_code):
+        job.status = status
+        job.result = payload
+        job.status_code = status_code
+        if status == 'failed' and job.error is None and isinstance(payload, dict):
+            job.error = payload.get('error')
+        job.finished_at = time.time()
+        try:
+            os.makedirs(self.jobs_dir, exist_ok=True)
+            with open(os.path.join(self.jobs_dir, f'{job.id}.json'), 'w', encoding='utf-8') as f:
+                json.dump(job.to_dict(include_result=True),
+                          f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            print(f"Could not save job {job.id}: {e}")
+        job.finished.set()
+
+        with self.lock:
+            finished = [job_id for job_id, j in self.jobs.items()
+                        if j.status in self.FINISHED]
+            for job_id in finished[:max(0, len(finished) - self.history_limit)]:
+                del self.jobs[job_id]
+
+
+def run_job_and_wait(kind, params):
+    """Run a job to completion for one of the synchronous endpoints"""
+    job = job_manager.wait(job_manager.submit(kind, params))
+    return (
+        dumps_response(job.result),
+        job.status_code,
+        {'Content-Type': 'application/json'}
+    )
+
+
 @app.route('/suggest_inputs', methods=['POST'])
 def suggest_inputs():
     print("Received suggest_inputs request")
+    return run_job_and_wait('suggest_inputs', request.get_json())
+
+
+def suggest_inputs_job(data, job):
+    """Job handler behind /suggest_inputs, reporting progress per field"""
     run_time_temp = int(time.time())
-    data = request.get_json()
     html = data.get('html', '')
-    with open(os.path.join(RUN_SAVE_DIR, f'html_suggest_inputs_{run_time_temp}.html'), 'w', encoding='utf-8') as f:
-        f.write(html)
+    background_writer.write_text(os.path.join(
+        RUN_SAVE_DIR, f'html_suggest_inputs_{run_time_temp}.html'), html)
     # return (f"HTML length: {len(html)}")
     try:
-        result = suggest_input_values(html)
+        result = suggest_input_values(
+            html, batch_size=data.get('batch_size'), use_cache=data.get('use_cache'),
+            context_mode=data.get('context_mode'),
+            progress=lambda done, total: job.report(done, total, 'fields'),
+            limitations_mode=data.get('limitations_mode'))
+        # Failed fields were logged as they happened; callers get them too
+        errors = result['errors']
 
         result = fix_json_text(result, html)
 
-        with open(os.path.join(RUN_SAVE_DIR, f'result_suggested_inputs_{run_time_temp}.json'), 'w', encoding='utf-8') as f:
-            f.write(json.dumps(result, ensure_ascii=False, indent=2))
-        return (
-            json.dumps(result, ensure_ascii=False, indent=2),
-            200,
-            {'Content-Type': 'application/json'}
-        )
+        background_writer.write_json(os.path.join(
+            RUN_SAVE_DIR, f'result_suggested_inputs_{run_time_temp}.json'), result)
+        background_writer.submit(
+            run_store.add_suggestions, RUN_KEY, run_time_temp, result)
+        return {'fields': result, 'errors': errors}, 200
+    except JobCancelled:
+        raise
     except Exception as e:
         print(f"Error in suggest_inputs: {e}")
-        return (
-            json.dumps({'error': 'Error processing request'}),
-            500,
-            {'Content-Type': 'application/json'}
-        )
+        return {'error': 'Error processing request'}, 500
+
+
+@app.route('/suggest_inputs_stream', methods=['POST'])
+def suggest_inputs_stream():
+    """
+    Streaming variant of /suggest_inputs (NDJSON, one JSON object per line)
+
+    Emits {"type": "field", "index": i, "field": {...}} in page order, each
+    as soon as it and every field before it are done (duplicates dropped as
+    in fix_json_text, so the same fields are kept), {"type": "error", ...}
+    as soon as a field fails, and finally {"type": "summary", ...}. 'index'
+    is the field's position in the page.
+    """
+    print("Received suggest_inputs_stream request")
+    run_time_temp = int(time.time())
+    data = request.get_json()
+    html = data.get('html', '')
+    background_writer.write_text(os.path.join(
+        RUN_SAVE_DIR, f'html_suggest_inputs_{run_time_temp}.html'), html)
+
+    def generate():
+        deduplicator = FieldDeduplicator()
+        kept = {}
+        try:
+            for event in iter_input_suggestions(
+                    html, batch_size=data.get('batch_size'), use_cache=data.get('use_cache'),
+                    context_mode=data.get('context_mode'), limitations_mode=data.get('limitations_mode')):
+                # Fields are held back until every earlier field is done
+                if event['type'] == 'field':
+                    released = deduplicator.release(event['index'], event['field'])
+                elif event['type'] == 'error':
+                    released = deduplicator.release(event['index'])
+                else:
+                    released = deduplicator.drain()
+                for index, field in released:
+                    kept[index] = field
+                    yield json.dumps({'type': 'field', 'index': index, 'field': field},
+                                     ensure_ascii=False) + '\n'
+                if event['type'] == 'summary':
+                    event['count'] = len(kept)
+                if event['type'] != 'field':
+                    yield json.dumps(event, ensure_ascii=False) + '\n'
+        except Exception as e:
+            print(f"Error in suggest_inputs_stream: {e}")
+            yield json.dumps({'type': 'summary', 'count': len(kept),
+                              'error': 'Error processing request'}) + '\n'
+
+        result = [kept[i] for i in sorted(kept)]
+        background_writer.write_json(os.path.join(
+            RUN_SAVE_DIR, f'result_suggested_inputs_{run_time_temp}.json'), result)
+        background_writer.submit(
+            run_store.add_suggestions, RUN_KEY, run_time_temp, result)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+@app.route('/suggestion_cache', methods=['GET'])
+def suggestion_cache_stats():
+    return (
+        dumps_response(suggestion_cache.stats()),
+        200,
+        {'Content-Type': 'application/json'}
+    )
+
+
+@app.route('/persistence_stats', methods=['GET'])
+def persistence_stats():
+    return (
+        dumps_response(background_writer.stats()),
+        200,
+        {'Content-Type': 'application/json'}
+    )
+
+
+def run_store_run(run):
+    """Run store name for ?run=, importing an earlier run's folder if needed"""
+    if not run or run == RUN_ID:
+        return RUN_KEY
+    run_dir = os.path.join(SAVE_DIR, os.path.basename(run))
+    if not os.path.isdir(run_dir):
+        raise BadRequest(f"Unknown run: {run}")
+    return run_store.ensure_run(run_dir)
+
+
+@app.route('/run_store/lookup', methods=['GET'])
+def run_store_lookup():
+    """Suggestions, updates and confirmations of ?field=, snapshots, events and confirmations of ?url="""
+    field = request.args.get('field')
+    url = request.args.get('url')
+    if field is None and url is None:
+        raise BadRequest("Give a field, a url or both")
+    # Rows written behind the request must be visible
+    background_writer.flush()
+    run = run_store_run(request.args.get('run'))
+    return (
+        dumps_response(run_store.lookup(run, field=field, url=url)),
+        200,
+        {'Content-Type': 'application/json'}
+    )
+
+
+@app.route('/run_store/export', methods=['GET'])
+def run_store_export():
+    """Everything the run store holds for a run (?run=, default: this run) as JSON"""
+    background_writer.flush()
+    run = run_store_run(request.args.get('run'))
+    return (
+        dumps_response(run_store.export(run)),
+        200,
+        {'Content-Type': 'application/json'}
+    )
+
+
+@app.route('/field_state', methods=['GET'])
+def field_state_list():
+    """Latest state of every field updated in this run"""
+    return (
+        dumps_response(field_states.all()),
+        200,
+        {'Content-Type': 'application/json'}
+    )
+
+
+@app.route('/field_state/<path:field>', methods=['GET'])
+def field_state(field):
+    """Latest range, examples and bad_examples of one field"""
+    state = field_states.get(field)
+    if state is None:
+        return json.dumps({'error': f'No updates for field {field}'}), 404, {'Content-Type': 'application/json'}
+    return (
+        dumps_response(state),
+        200,
+        {'Content-Type': 'application/json'}
+    )
+
+
+@app.route('/translation_stats', methods=['GET'])
+def translation_stats():
+    return (
+        dumps_response(translation_service.stats()),
+        200,
+        {'Content-Type': 'application/json'}
+    )
+
+
+@app.route('/token_stats', methods=['GET'])
+def token_stats():
+    stats = token_counter.stats()
+    stats['mode'] = TOKEN_COUNT_MODE
+    stats['estimator'] = TOKEN_ESTIMATOR
+    with token_estimator_lock:
+        stats.update(token_estimator_stats)
+    return (
+        dumps_response(stats),
+        200,
+        {'Content-Type': 'application/json'}
+    )
+
+
+@app.route('/token_estimator/calibrate', methods=['POST'])
+def calibrate_token_estimator_endpoint():
+    """Calibrate the token estimator on HTML snapshots saved under SAVE_DIR"""
+    data = request.get_json(silent=True) or {}
+    sample_size = data.get('sample_size', 50)
+
+    paths = []
+    for root, _, files in os.walk(SAVE_DIR):
+        # Snapshot manifests stand for the page HTML kept in the blob store
+        paths.extend(os.path.join(root, f)
+                     for f in files if f.endswith(('.html', '_snapshot.json')))
+    paths = sorted(paths)[-sample_size:]
+
+    texts = []
+    for path in paths:
+        try:
+            if path.endswith('_snapshot.json'):
+                texts.append(load_snapshot(os.path.dirname(path), os.path.basename(
+                    path)[:-len('_snapshot.json')])['html'])
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                texts.append(f.read())
+        except Exception as e:
+            print(f"Could not read calibration sample {path}: {e}")
+
+    try:
+        params = calibrate_token_estimator(texts)
+    except ValueError as e:
+        return json.dumps({'error': str(e)}), 400, {'Content-Type': 'application/json'}
+
+    if data.get('apply', True):
+        for key in ('ascii_chars_per_token', 'non_ascii_bytes_per_token', 'margin'):
+            TOKEN_ESTIMATOR[key] = params[key]
+    return (
+        dumps_response(params),
+        200,
+        {'Content-Type': 'application/json'}
+    )
 
 
 @app.route('/update_input_suggestion', methods=['POST'])
 def update_input_suggestion():
     print("Received update_input_suggestion request")
+    return run_job_and_wait('update_input_suggestion', request.get_json())
+
+
+def update_input_suggestion_job(data, job):
+    """Job handler behind /update_input_suggestion (one field, one LLM step)"""
     run_time_temp = int(time.time())
-    data = request.get_json()
+    job.report(0, 1, 'field')
     field = data.get('field')
     range_ = data.get('range')
     examples_ = data.get('examples')
@@ -1192,17 +4018,11 @@ def update_input_suggestion():
     previous_examples = None
     previous_bad_examples = None
     try:
-        # Find all previous update files for this field in RUN_SAVE_DIR
-        files = [f for f in os.listdir(RUN_SAVE_DIR) if f.startswith(
-            'input_suggestion_updates_') and f.endswith(f'_{field}.json')]
-        files = sorted(files)  # sort by name (timestamp in name)
-        if files:
-            last_file = files[-1]
-            with open(os.path.join(RUN_SAVE_DIR, last_file), 'r', encoding='utf-8') as f:
-                prev = json.load(f)
-                previous_range = prev.get('range')
-                previous_examples = prev.get('examples')
-                previous_bad_examples = prev.get('bad_examples', [])
+        prev = field_states.get(field)
+        if prev:
+            previous_range = prev.get('range')
+            previous_examples = prev.get('examples')
+            previous_bad_examples = prev.get('bad_examples', [])
     except Exception as e:
         print(f"Could not load previous update for field {field}: {e}")
 
@@ -1218,15 +4038,21 @@ def update_input_suggestion():
                 "\n\nPlease write only a short phrase in English that explains the limitations of this data, without any additional explanation."
             )
 
-            response = client.chat.completions.create(
-                model=model_name,
-                messages=[{"role": "user", "content": range_generation_prompt}],
-                temperature=0.3,
-                max_tokens=100
-            )
-
-            english_range = response.choices[0].message.content.strip()
-            range_ = translate_to_persian(english_range)
+            if (data.get('limitations_mode') or LIMITATIONS_MODE) == 'bilingual':
+                generated = json.loads(call_llm_structured(
+                    [{"role": "user", "content": range_generation_prompt +
+                      " Return that phrase as range_en and the same phrase written in Persian as range_fa."}],
+                    BilingualRangeSchema))
+                # Persian from the model, translated only if it is unusable
+                localized = localize_limitations([{
+                    'limitations_en': generated['range_en'].strip(),
+                    'limitations_fa': generated['range_fa'].strip(),
+                }], 'bilingual')[0]
+                range_ = localized['limitations']
+            else:
+                english_range = call_llm_text(
+                    range_generation_prompt, temperature=0.3, max_tokens=100).strip()
+                range_ = translate_to_persian(english_range)
             print(f"Generated range based on examples: {range_}")
             new_examples = examples_
             new_bad_examples = bad_examples_
@@ -1234,10 +4060,18 @@ def update_input_suggestion():
             print(f"Error generating range from examples: {e}")
             range_ = "محدودیت نامشخص"
     else:
-        # First translate Persian range to English for processing
-        english_range = range_
-        if any('\u0600' <= c <= '\u06FF' for c in range_):  # Check if contains Persian characters
-            english_range = translate_to_english(range_)
+        # First translate Persian ranges (new and previous) to English for
+        # processing, in one call
+        use_previous = previous_range and (
+            previous_examples or previous_bad_examples)
+        ranges = [range_, previous_range if use_previous else '']
+        # Check if contains Persian characters
+        persian = [i for i, text in enumerate(ranges)
+                   if any('\u0600' <= c <= '\u06FF' for c in text)]
+        for i, translation in zip(persian, translation_service.translate_many(
+                [ranges[i] for i in persian], 'fa', 'en')):
+            ranges[i] = translation
+        english_range, prev_english_range = ranges
 
         # --- Build prompt with previous info if available ---
         prompt = (
@@ -1253,12 +4087,7 @@ def update_input_suggestion():
                 f"Bad examples provided: {json.dumps(bad_examples_, ensure_ascii=False)}\n"
                 "New examples should be similar in style and realism to these examples."
             )
-        if previous_range and (previous_examples or previous_bad_examples):
-            # Translate previous range to English if needed
-            prev_english_range = previous_range
-            if any('\u0600' <= c <= '\u06FF' for c in previous_range):
-                prev_english_range = translate_to_english(previous_range)
-
+        if use_previous:
             prompt += (
                 "\nSee the previous limitation and examples and generate new examples that are compatible with the new limitation and are not repetitive.\n"
                 f"Previous limitation: {prev_english_range}\n"
@@ -1299,12 +4128,8 @@ def update_input_suggestion():
             "}\n"
         )
         try:
-            response = client.beta.chat.completions.parse(
-                model=model_name,
-                messages=[{"role": "user", "content": prompt}],
-                response_format=ExampleSchema,
-            )
-            raw = response.choices[0].message.content
+            raw = call_llm_structured(
+                [{"role": "user", "content": prompt}], ExampleSchema)
             data = json.loads(raw)
             new_examples = data['examples']
             new_bad_examples = data['bad_examples']
@@ -1318,11 +4143,8 @@ def update_input_suggestion():
             new_examples = list(set(new_examples))
             new_bad_examples = list(set(new_bad_examples))
         except Exception as e:
-            return (
-                json.dumps({'error': str(e)}),
-                500,
-                {'Content-Type': 'application/json'}
-            )
+            return {'error': str(e)}, 500
+    job.report(1, 1, 'field')
 
     updates = {
         'field': field,
@@ -1330,30 +4152,75 @@ def update_input_suggestion():
         'examples': new_examples,
         'bad_examples': new_bad_examples
     }
-    with open(update_path, 'w', encoding='utf-8') as f:
-        json.dump(updates, f, ensure_ascii=False, indent=2)
-    return (
-        json.dumps(
-            {
-                'status': 'ok',
-                'new_examples': new_examples,
-                'new_bad_examples': new_bad_examples,
-                'range': range_
-            },
-            ensure_ascii=False, indent=2
-        ),
-        200,
-        {'Content-Type': 'application/json'}
-    )
+    background_writer.write_json(update_path, updates)
+    field_states.set(field, dict(updates, time=run_time_temp))
+    background_writer.submit(
+        run_store.add_field_update, RUN_KEY, run_time_temp, updates)
+    return {
+        'status': 'ok',
+        'new_examples': new_examples,
+        'new_bad_examples': new_bad_examples,
+        'range': range_
+    }, 200
+
+
+class FieldDeduplicator:
+    """Apply the fix_json_text rules one field at a time"""
+
+    def __init__(self):
+        self.ids = set()
+        self.names = set()
+        # Fields that finished before an earlier one, by DOM index
+        self.pending = {}
+        self.next_index = 0
+
+    def add(self, field):
+        """Return the field with 'range' instead of 'limitations', or None if it duplicates an earlier one"""
+        field['range'] = field.pop('limitations')
+        if field['id'] in self.ids or field['name'] in self.names:
+            return None
+        self.ids.add(field['id'])
+        self.names.add(field['name'])
+        return field
+
+    def release(self, index, field=None):
+        """
+        Take the field at DOM position index (None for a field that failed)
+        and return the (index, field) pairs that are now ready, in DOM order
+        with duplicates dropped, so the first field in the page wins as in
+        fix_json_text whatever order the results arrive in
+        """
+        self.pending[index] = field
+        released = []
+        while self.next_index in self.pending:
+            field = self.pending.pop(self.next_index)
+            if field is not None:
+                field = self.add(field)
+                if field is not None:
+                    released.append((self.next_index, field))
+            self.next_index += 1
+        return released
+
+    def drain(self):
+        """Release whatever is still held back, in DOM order"""
+        released = []
+        for index in sorted(self.pending):
+            field = self.pending.pop(index)
+            if field is not None:
+                field = self.add(field)
+                if field is not None:
+                    released.append((index, field))
+        return released
 
 
 def fix_json_text(text, html):
     result = text['fields']
     # Only keep fields that exist as <input> or <textarea> in the HTML
+    deduplicator = FieldDeduplicator()
     filtered = []
     for field in result:
-        field['range'] = field.pop('limitations')
-        if not any(f['id'] == field['id'] or f['name'] == field['name'] for f in filtered):
+        field = deduplicator.add(field)
+        if field is not None:
             filtered.append(field)
     return filtered
 
@@ -1373,8 +4240,8 @@ def confirm_suggestion():
     save_path = os.path.join(RUN_SAVE_DIR, filename)
 
     # Save the confirmation data
-    with open(save_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    background_writer.write_json(save_path, data)
+    background_writer.submit(run_store.add_confirmation, RUN_KEY, timestamp, data)
 
     return json.dumps({
         'status': 'success',
@@ -1384,7 +4251,8 @@ def confirm_suggestion():
     }), 200, {'Content-Type': 'application/json'}
 
 
-def generate_test_cases_from_katalon(katalon_path, output_csv_path, num_test_cases):
+def generate_test_cases_from_katalon(katalon_path, output_csv_path, num_test_cases, progress=None,
+                                     strategy=None, strength=None, seed=None, negative_csv_path=None):
     """
     Generate test cases from Katalon test file using LLM with combinations of all field examples
 
@@ -1392,14 +4260,30 @@ def generate_test_cases_from_katalon(katalon_path, output_csv_path, num_test_cas
         katalon_path (str): Path to the Katalon test HTML file
         output_csv_path (str): Path to save the output CSV file
         num_test_cases (int): Number of test cases to generate
+        progress (callable): Called as progress(done, total, stage) per field
+            ('fields') and per chunk of combinations written ('combinations')
+        strategy (str): One of TEST_CASE_STRATEGIES, default TEST_CASE_STRATEGY.
+            A covering array is never cut to num_test_cases, which then only
+            sets how many examples each field gets
+        strength (int): Covering array strength, default TEST_CASE_COVERING_STRENGTH
+        seed: Seed of the 'sample' strategy, default TEST_CASE_SAMPLE_SEED
+        negative_csv_path (str): If given, also write the single-fault
+            negative suite there (see negative_test_rows)
+
+    Returns:
+        dict: Field order, size of the full combination space and rows
+            written; None if nothing was generated
     """
     try:
+        # Confirmations may still be queued for writing
+        background_writer.flush()
+
         # Read the Katalon test file
         with open(katalon_path, 'r', encoding='utf-8') as f:
             katalon_html = f.read()
 
         # Parse the HTML to extract test commands
-        soup = BeautifulSoup(katalon_html, 'html.parser')
+        soup = make_soup(katalon_html)
         table = soup.find('table')
 
         if not table:
@@ -1445,94 +4329,83 @@ def generate_test_cases_from_katalon(katalon_path, output_csv_path, num_test_cas
         field_data = {}
         field_order = []  # To maintain order for CSV headers
 
-        # Process each field
-        for target, commands in type_commands.items():
-            print(f"Processing field: {target}")
-
-            # Get the original value (use the first one if multiple)
-            original_value = commands[0]['value']
-
-            # Determine field type from target
-            field_type = "text"  # default
-            if "password" in target.lower():
-                field_type = "password"
-            elif "email" in target.lower():
-                field_type = "email"
-            elif "phone" in target.lower() or "tel" in target.lower():
-                field_type = "tel"
-            elif "date" in target.lower():
-                field_type = "date"
-            elif "number" in target.lower() or "age" in target.lower():
-                field_type = "number"
-
-            # Look for confirmation files for this field
-            confirmation_data = find_confirmation_for_field(
-                katalon_dir, target)
-
-            if confirmation_data:
-                print(f"Found confirmation data for field: {target}")
-                # Use confirmation data to generate examples
-                generated_examples = generate_examples_from_confirmation(
-                    target, field_type, original_value, confirmation_data.get(
-                        'suggestion', {}), examples_per_field
-                )
-                description = confirmation_data.get(
-                    'range', 'No description available')
-                confirmation_found = True
-            else:
-                print(
-                    f"No confirmation found for field: {target}, using default generation")
-                # Generate examples using default method
-                generated_examples = generate_examples_for_field(
-                    target, field_type, original_value, examples_per_field
-                )
-                description = f"Generated based on field type: {field_type}"
-                confirmation_found = False
-
-            # Store field data
-            field_name = extract_field_identifier(target)
-            field_data[field_name] = {
-                'target': target,
-                'type': field_type,
-                'original_value': original_value,
-                'confirmation_found': confirmation_found,
-                'description': description,
-                'examples': generated_examples
-            }
+        # Bad examples of fields without a confirmation come from their
+        # latest /update_input_suggestion, else their latest /suggest_inputs
+        run = run_store.ensure_run(katalon_dir)
+        field_updates = run_store.latest_updates(run)
+        field_suggestions = run_store.latest_suggestions(run)
+
+        # Process the fields concurrently (bounded by LLM_MAX_IN_FLIGHT);
+        # results come back in Katalon order, which fixes the CSV columns
+        progress_lock = threading.Lock()
+        fields_done = [0]
+
+        def process_field(item):
+            target, commands = item
+            if progress:
+                # Raises JobCancelled, so queued fields stop once cancelled
+                with progress_lock:
+                    progress(fields_done[0], total_fields, 'fields')
+            field = generate_field_test_data(
+                katalon_dir, target, commands, examples_per_field, field_updates, field_suggestions)
+            with progress_lock:
+                fields_done[0] += 1
+                if progress:
+                    progress(fields_done[0], total_fields, 'fields')
+            return field
+
+        items = list(type_commands.items())
+        for (target, commands), (field, error) in zip(items, run_concurrently(process_field, items)):
+            if isinstance(error, JobCancelled):
+                raise error
+            if error is not None:
+                print(f"Error processing field {target}: {error}")
+                field = fallback_field_test_data(target, commands, examples_per_field)
+            field_name, data = field
+            field_data[field_name] = data
             field_order.append(field_name)
-
-        # Generate all combinations of examples
+        if progress:
+            progress(total_fields, total_fields, 'fields')
 
         # Extract examples lists in order
         examples_lists = [field_data[field]['examples']
                           for field in field_order]
 
-        # Generate all combinations
-        combinations = list(product(*examples_lists))
-
+        # The product is never materialized: its size is computed and
+        # the first num_test_cases rows are taken from the iterator
+        combination_space = math.prod(len(examples) for examples in examples_lists)
         print(
-            f"Generated {len(combinations)} total combinations from {len(field_order)} fields")
-
-        # Limit combinations if too many
-        if len(combinations) > num_test_cases:
-            print(f"Limiting to first {num_test_cases} combinations")
-            combinations = combinations[:num_test_cases]
-
-        # Prepare CSV headers (field names)
-        csv_headers = field_order
-
-        # Prepare CSV data (combinations)
-        csv_data = combinations
+            f"{combination_space} total combinations from {len(field_order)} fields")
+        strategy = strategy or TEST_CASE_STRATEGY
+        if strategy == 'pairwise':
+            strategy, strength = 'covering', 2
+        if strategy == 'covering':
+            strength = strength or TEST_CASE_COVERING_STRENGTH
+            indices = covering_array(
+                [len(examples) for examples in examples_lists], strength)
+            print(f"Covering array of strength {strength}: {len(indices)} rows")
+            row_count = len(indices)
+            test_rows = ([examples_lists[field][index] for field, index in enumerate(row)]
+                         for row in indices)
+        elif strategy == 'sample':
+            seed = TEST_CASE_SAMPLE_SEED if seed is None else seed
+            row_count = min(combination_space, num_test_cases)
+            picked = sample_combination_indices(combination_space, row_count, seed)
+            print(f"Sampled {row_count} combinations with seed {seed}")
+            test_rows = (decode_combination(index, examples_lists) for index in picked)
+        else:
+            row_count = min(combination_space, num_test_cases)
+            if combination_space > num_test_cases:
+                print(f"Limiting to first {num_test_cases} combinations")
+            test_rows = islice(product(*examples_lists), num_test_cases)
 
-        # Save to CSV
-        with open(output_csv_path, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            writer.writerow(csv_headers)
-            writer.writerows(csv_data)
+        # Save to CSV, field names as headers
+        rows_written = write_test_case_csv(
+            output_csv_path, field_order, test_rows, row_count, progress)
 
         print(f"Test case combinations saved to: {output_csv_path}")
         print(
-            f"Generated {len(csv_data)} test case combinations with {len(field_order)} fields")
+            f"Generated {rows_written} test case combinations with {len(field_order)} fields")
 
         # Print summary
         print("\nField Summary:")
@@ -1541,16 +4414,274 @@ def generate_test_cases_from_katalon(katalon_path, output_csv_path, num_test_cas
             print(
                 f"  {field}: {len(data['examples'])} examples ({'with confirmation' if data['confirmation_found'] else 'generated'})")
 
+        summary = {
+            'fields': field_order,
+            'strategy': strategy,
+            'combination_space': combination_space,
+            'rows_written': rows_written,
+        }
+
+        if negative_csv_path:
+            negative_count = sum(len(field_data[field]['bad_examples'])
+                                 for field in field_order)
+            summary['negative_csv_path'] = negative_csv_path
+            summary['negative_rows'] = write_test_case_csv(
+                negative_csv_path, ['faulted_field'] + field_order,
+                negative_test_rows(field_order, field_data), negative_count,
+                progress, stage='negative')
+            print(
+                f"Negative test cases saved to: {negative_csv_path} ({summary['negative_rows']} rows)")
+        if strategy == 'covering':
+            summary['strength'] = strength
+        elif strategy == 'sample':
+            summary['seed'] = seed
+        return summary
+
+    except JobCancelled:
+        raise
     except Exception as e:
         print(f"Error generating test cases: {e}")
 
 
+def katalon_field_type(target):
+    """Guess an input's type from its Katalon target"""
+    # Determine field type from target
+    field_type = "text"  # default
+    if "password" in target.lower():
+        field_type = "password"
+    elif "email" in target.lower():
+        field_type = "email"
+    elif "phone" in target.lower() or "tel" in target.lower():
+        field_type = "tel"
+    elif "date" in target.lower():
+        field_type = "date"
+    elif "number" in target.lower() or "age" in target.lower():
+        field_type = "number"
+    return field_type
+
+
+def generate_field_test_data(katalon_dir, target, commands, examples_per_field, field_updates,
+                             field_suggestions):
+    """
+    Examples, bad examples and description for one Katalon input field
+
+    Args:
+        katalon_dir (str): Run directory containing the Katalon file
+        target (str): Target selector of the field
+        commands (list): The field's 'type' commands
+        examples_per_field (int): Number of examples to generate
+        field_updates (dict): Latest update per field of the run
+        field_suggestions (dict): Latest suggestion per field id and name of the run
+
+    Returns:
+        tuple: (field name, field data)
+    """
+    print(f"Processing field: {target}")
+
+    # Get the original value (use the first one if multiple)
+    original_value = commands[0]['value']
+    field_type = katalon_field_type(target)
+
+    # Look for confirmation files for this field
+    confirmation_data = find_confirmation_for_field(
+        katalon_dir, target)
+
+    if confirmation_data:
+        print(f"Found confirmation data for field: {target}")
+        # Use confirmation data to generate examples
+        generated_examples = generate_examples_from_confirmation(
+            target, field_type, original_value, confirmation_data.get(
+                'suggestion', {}), examples_per_field
+        )
+        description = confirmation_data.get(
+            'range', 'No description available')
+        bad_examples = (confirmation_data.get(
+            'suggestion') or {}).get('bad_examples') or []
+        confirmation_found = True
+    else:
+        print(
+            f"No confirmation found for field: {target}, using default generation")
+        # Generate examples using default method
+        generated_examples = generate_examples_for_field(
+            target, field_type, original_value, examples_per_field
+        )
+        description = f"Generated based on field type: {field_type}"
+        bad_examples = []
+        confirmation_found = False
+
+    # Store field data
+    field_name = extract_field_identifier(target)
+    if not bad_examples and field_name in field_updates:
+        bad_examples = field_updates[field_name]['bad_examples'] or []
+    if not bad_examples and field_name in field_suggestions:
+        bad_examples = field_suggestions[field_name].get('bad_examples') or []
+    return field_name, {
+        'target': target,
+        'type': field_type,
+        'original_value': original_value,
+        'confirmation_found': confirmation_found,
+        'description': description,
+        'examples': generated_examples,
+        'bad_examples': list(dict.fromkeys(bad_examples))
+    }
+
+
+def fallback_field_test_data(target, commands, examples_per_field):
+    """Field data made from the recorded value alone, for a field whose generation failed"""
+    original_value = commands[0]['value']
+    field_type = katalon_field_type(target)
+    return extract_field_identifier(target), {
+        'target': target,
+        'type': field_type,
+        'original_value': original_value,
+        'confirmation_found': False,
+        'description': f"Generated based on field type: {field_type}",
+        'examples': [f"{original_value}_{i+1}" for i in range(examples_per_field)],
+        'bad_examples': []
+    }
+
+
+def negative_test_rows(field_order, field_data):
+    """
+    Single-fault negative rows: one field takes one of its bad examples and
+    every other field keeps its value from the recording, which the form
+    accepted. The first column names the faulted field.
+    """
+    for faulted in field_order:
+        for bad_example in field_data[faulted]['bad_examples']:
+            yield [faulted] + [bad_example if field == faulted else field_data[field]['original_value']
+                               for field in field_order]
+
+
+def decode_combination(index, examples_lists):
+    """
+    Row number index of the Cartesian product of examples_lists, in the
+    product's order, read as a mixed-radix number (last field varies fastest)
+    """
+    row = [None] * len(examples_lists)
+    for field in range(len(examples_lists) - 1, -1, -1):
+        index, digit = divmod(index, len(examples_lists[field]))
+        row[field] = examples_lists[field][digit]
+    return row
+
+
+def sample_combination_indices(space, count, seed):
+    """
+    count distinct row numbers drawn uniformly from range(space), reproducible
+    for a seed
+
+    random.sample draws from the range without materializing it, but only
+    while space fits in a C ssize_t; larger spaces (many fields with several
+    examples each) draw numbers one at a time and skip repeats, which are
+    rare when count is that much smaller than space.
+    """
+    rng = random.Random(seed)
+    if space <= sys.maxsize:
+        return rng.sample(range(space), count)
+    picked = {}
+    while len(picked) < count:
+        picked.setdefault(rng.randrange(space), None)
+    return list(picked)
+
+
+def covering_array(sizes, strength):
+    """
+    Rows of value indices covering every combination of values of any
+    strength fields at least once (IPOG)
+
+    Starts from the full product of the first strength fields, then adds one
+    field at a time: each existing row gets the value that covers the most
+    still-uncovered combinations (horizontal growth), and combinations left
+    over are placed in rows with free positions or in new rows (vertical
+    growth). Ties go to the lowest index, so the result is deterministic.
+
+    Args:
+        sizes (list): Number of values of each field
+        strength (int): Number of fields whose value combinations are covered
+
+    Returns:
+        list: Rows as tuples of value indices, one per field
+    """
+    if not sizes or min(sizes) == 0:
+        return []
+    strength = max(1, min(strength, len(sizes)))
+    rows = [list(row) for row in product(*(range(size) for size in sizes[:strength]))]
+
+    for field in range(strength, len(sizes)):
+        # Uncovered combinations: earlier fields -> set of (their values + value of field)
+        uncovered = {
+            fields: set(product(*(range(sizes[f]) for f in fields), range(sizes[field])))
+            for fields in combinations(range(field), strength - 1)
+        }
+
+        # Horizontal growth
+        for row in rows:
+            best_value, best_covered = 0, -1
+            for value in range(sizes[field]):
+                covered = sum(
+                    1 for fields, missing in uncovered.items()
+                    if tuple(row[f] for f in fields) + (value,) in missing)
+                if covered > best_covered:
+                    best_value, best_covered = value, covered
+            row.append(best_value)
+            for fields, missing in uncovered.items():
+                key = tuple(row[f] for f in fields) + (best_value,)
+                if None not in key:
+                    missing.discard(key)
+
+        # Vertical growth
+        for fields, missing in uncovered.items():
+            for key in sorted(missing):
+                for row in rows:
+                    if all(row[f] is None or row[f] == v for f, v in zip(fields + (field,), key)):
+                        break
+                else:
+                    row = [None] * (field + 1)
+                    rows.append(row)
+                for f, v in zip(fields + (field,), key):
+                    row[f] = v
+
+    # Positions no combination needed can take any value
+    return [tuple(index % sizes[f] if value is None else value for f, value in enumerate(row))
+            for index, row in enumerate(rows)]
+
+
+def write_test_case_csv(path, headers, rows, total, progress=None, stage='combinations'):
+    """
+    Stream rows into a CSV file TEST_CASE_CSV_CHUNK_ROWS at a time
+
+    Args:
+        path (str): CSV file to write
+        headers (list): Header row
+        rows (iterable): Rows, consumed lazily
+        total (int): Expected row count, for progress reports
+        progress (callable): Called as progress(done, total, stage) per chunk
+
+    Returns:
+        int: Number of rows written
+    """
+    written = 0
+    rows = iter(rows)
+    with open(path, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(headers)
+        while True:
+            chunk = list(islice(rows, TEST_CASE_CSV_CHUNK_ROWS))
+            if not chunk:
+                break
+            writer.writerows(chunk)
+            written += len(chunk)
+            if progress:
+                progress(written, total, stage)
+    return written
+
+
 def find_confirmation_for_field(katalon_dir, target):
     """
-    Find confirmation files for a specific field target
+    Find the confirmation for a specific field target
 
     Args:
-        katalon_dir (str): Directory containing the Katalon file
+        katalon_dir (str): Run directory containing the Katalon file
         target (str): Target selector (e.g., "id=username", "xpath=//input[@name='email']")
 
     Returns:
@@ -1560,29 +4691,13 @@ def find_confirmation_for_field(katalon_dir, target):
         # Extract field identifier from target
         field_identifier = extract_field_identifier(target)
 
-        # Look for confirmation files in the directory
-        confirmation_files = []
-        for file in os.listdir(katalon_dir):
-            if file.startswith('confirmation_') and file.endswith('.json'):
-                confirmation_files.append(file)
-
-        # Search through confirmation files for matching field
-        for conf_file in confirmation_files:
-            try:
-                with open(os.path.join(katalon_dir, conf_file), 'r', encoding='utf-8') as f:
-                    conf_data = json.load(f)
-
-                # Check if this confirmation matches our target field
-                conf_field = conf_data.get('field', '')
-                if field_identifier in conf_field or conf_field in field_identifier:
-                    print(f"Found matching confirmation file: {conf_file}")
-                    return conf_data
-
-            except Exception as e:
-                print(f"Error reading confirmation file {conf_file}: {e}")
-                continue
-
-        return None
+        # Confirmations are looked up in the run store; a run recorded
+        # before it existed is imported from its files first
+        run = run_store.ensure_run(katalon_dir)
+        conf_data = run_store.find_confirmation(run, field_identifier)
+        if conf_data:
+            print(f"Found matching confirmation for field: {conf_data.get('field')}")
+        return conf_data
 
     except Exception as e:
         print(f"Error finding confirmation for field {target}: {e}")
@@ -1665,19 +4780,7 @@ Return only a JSON array of strings:
 Examples should be realistic and usable for actual testing."""
 
         # Generate examples using LLM
-        if is_local:
-            response = chat(model="llama3.1",
-                            messages=[{"role": "user", "content": prompt}],
-                            options={"num_ctx": 8192})
-            raw_response = response['message']['content']
-        else:
-            response = client.chat.completions.create(
-                model=model_name,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=800
-            )
-            raw_response = response.choices[0].message.content
+        raw_response = call_llm_text(prompt)
 
         # Parse JSON response
         try:
@@ -1773,19 +4876,7 @@ Return only a JSON array of {examples_needed} NEW strings:
 The new examples should complement the existing ones while following the same validation rules."""
 
         # Generate additional examples using LLM
-        if is_local:
-            response = chat(model="llama3.1",
-                            messages=[{"role": "user", "content": prompt}],
-                            options={"num_ctx": 8192})
-            raw_response = response['message']['content']
-        else:
-            response = client.chat.completions.create(
-                model=model_name,
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=800
-            )
-            raw_response = response.choices[0].message.content
+        raw_response = call_llm_text(prompt)
 
         # Parse JSON response
         try:
@@ -1836,31 +4927,150 @@ The new examples should complement the existing ones while following the same va
 @app.route('/generate_test_cases', methods=['POST'])
 def generate_test_cases_endpoint():
     """API endpoint to generate test cases from Katalon file"""
+    return run_job_and_wait('generate_test_cases', request.get_json())
+
+
+def generate_test_cases_job(data, job):
+    """Job handler behind /generate_test_cases, reporting per field and per combination"""
     try:
-        data = request.get_json()
         katalon_path = data.get('katalon_path')
         output_csv_path = data.get('output_csv_path')
         num_test_cases = data.get('num_test_cases', 10)
+        strategy = data.get('strategy') or TEST_CASE_STRATEGY
+        strength = data.get('strength')
+        seed = data.get('seed')
+        negative_csv_path = data.get('negative_csv_path')
+        if data.get('negative') and not negative_csv_path and output_csv_path:
+            negative_csv_path = os.path.splitext(output_csv_path)[0] + '_negative.csv'
 
         if not katalon_path or not output_csv_path:
-            return json.dumps({
+            return {
                 'error': 'katalon_path and output_csv_path are required'
-            }), 400, {'Content-Type': 'application/json'}
+            }, 400
+        if strategy not in TEST_CASE_STRATEGIES:
+            return {
+                'error': f'strategy must be one of {", ".join(TEST_CASE_STRATEGIES)}'
+            }, 400
+        if strength is not None and (not isinstance(strength, int) or strength < 1):
+            return {
+                'error': 'strength must be a positive integer'
+            }, 400
+        if seed is not None and not isinstance(seed, (int, str)):
+            return {
+                'error': 'seed must be an integer or a string'
+            }, 400
 
         # Generate test cases
-        generate_test_cases_from_katalon(
-            katalon_path, output_csv_path, num_test_cases)
+        summary = generate_test_cases_from_katalon(
+            katalon_path, output_csv_path, num_test_cases, progress=job.report,
+            strategy=strategy, strength=strength, seed=seed,
+            negative_csv_path=negative_csv_path)
 
-        return json.dumps({
+        result = {
             'status': 'success',
             'message': f'Test cases generated and saved to {output_csv_path}',
             'num_test_cases': num_test_cases
-        }), 200, {'Content-Type': 'application/json'}
+        }
+        if summary:
+            result.update(summary)
+        return result, 200
 
+    except JobCancelled:
+        raise
     except Exception as e:
-        return json.dumps({
+        return {
             'error': f'Error generating test cases: {str(e)}'
-        }), 500, {'Content-Type': 'application/json'}
+        }, 500
+
+
+job_manager = JobManager(
+    {
+        'suggest_inputs': suggest_inputs_job,
+        'update_input_suggestion': update_input_suggestion_job,
+        'generate_test_cases': generate_test_cases_job,
+    },
+    max_workers=JOB_WORKERS,
+    jobs_dir=JOBS_DIR,
+    history_limit=JOB_HISTORY_LIMIT,
+)
+
+
+@app.route('/jobs/<kind>', methods=['POST'])
+def submit_job(kind):
+    """Queue a job; the body is what the synchronous endpoint of the same name takes"""
+    try:
+        job = job_manager.submit(kind, request.get_json(silent=True) or {})
+    except KeyError:
+        return json.dumps({
+            'error': f'Unknown job kind: {kind}',
+            'kinds': sorted(job_manager.handlers)
+        }), 404, {'Content-Type': 'application/json'}
+    print(f"Queued {kind} job {job.id}")
+    return json.dumps({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'/jobs/{job.id}',
+        'result_url': f'/jobs/{job.id}/result'
+    }), 202, {'Content-Type': 'application/json'}
+
+
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    return (
+        dumps_response(job_manager.records()),
+        200,
+        {'Content-Type': 'application/json'}
+    )
+
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    record = job_manager.get_record(job_id)
+    if record is None:
+        return json.dumps({'error': 'Job not found'}), 404, {'Content-Type': 'application/json'}
+    return (
+        dumps_response(record),
+        200,
+        {'Content-Type': 'application/json'}
+    )
+
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Return a finished job's payload with the status code its endpoint would have used"""
+    record = job_manager.get_record(job_id, include_result=True)
+    if record is None:
+        return json.dumps({'error': 'Job not found'}), 404, {'Content-Type': 'application/json'}
+    if record['status'] not in JobManager.FINISHED:
+        return json.dumps({
+            'error': 'Job has not finished',
+            'status': record['status'],
+            'progress': record['progress']
+        }), 409, {'Content-Type': 'application/json'}
+    return (
+        dumps_response(record['result']),
+        record['status_code'],
+        {'Content-Type': 'application/json'}
+    )
+
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a job; a running job stops at its next progress report"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return json.dumps({'error': 'Job not found'}), 404, {'Content-Type': 'application/json'}
+    if job.status in JobManager.FINISHED:
+        return json.dumps({
+            'error': 'Job has already finished',
+            'status': job.status
+        }), 409, {'Content-Type': 'application/json'}
+    job_manager.cancel(job_id)
+    return json.dumps({
+        'job_id': job.id,
+        'status': job.status,
+        'cancel_requested': True
+    }), 202, {'Content-Type': 'application/json'}
 
 
 # Add shutdown route to Flask app
@@ -1869,6 +5079,7 @@ def shutdown():
     """Shutdown the Flask application"""
     try:
         print("Shutdown request received. Closing Flask server...")
+        background_writer.flush()
         func = request.environ.get('werkzeug.server.shutdown')
         if func is None:
             # Alternative shutdown method
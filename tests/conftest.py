@@ -0,0 +1,50 @@
+import io
+import os
+import re
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class WordEncoding:
+    """
+    Offline stand-in for the cl100k_base encoding: one token per word or
+    punctuation mark. tiktoken downloads cl100k_base on first use, which the
+    tests must not depend on.
+    """
+
+    pattern = re.compile(r'\w+|[^\w\s]')
+
+    def encode(self, text, **kwargs):
+        return self.pattern.findall(text)
+
+    def decode(self, tokens):
+        return ' '.join(tokens)
+
+
+@pytest.fixture(scope='session')
+def server(tmp_path_factory):
+    """
+    recorder_server imported inside a temporary directory, answering 'local'
+    to the backend prompt. The server's paths are relative, so the tests
+    stay in that directory.
+    """
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    import tiktoken
+
+    previous_cwd = os.getcwd()
+    previous_stdin = sys.stdin
+    get_encoding = tiktoken.get_encoding
+    os.chdir(tmp_path_factory.mktemp('recorder'))
+    sys.stdin = io.StringIO("local\n")
+    tiktoken.get_encoding = lambda name: WordEncoding()
+    try:
+        import recorder_server
+    finally:
+        tiktoken.get_encoding = get_encoding
+        sys.stdin = previous_stdin
+    yield recorder_server
+    os.chdir(previous_cwd)
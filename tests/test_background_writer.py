@@ -0,0 +1,87 @@
+import threading
+
+
+def blocked_writer(server, size=0, **kwargs):
+    """
+    A writer busy with a first job of the given size until the returned
+    event is set
+    """
+    writer = server.BackgroundWriter(kwargs.pop('max_items', 100), 'batched', **kwargs)
+    started = threading.Event()
+    release = threading.Event()
+
+    def block():
+        started.set()
+        release.wait()
+
+    writer.submit(block, size=size)
+    assert started.wait(5)
+    return writer, release
+
+
+def submit_in_thread(writer, *args, **kwargs):
+    done = threading.Event()
+
+    def submit():
+        writer.submit(*args, **kwargs)
+        done.set()
+
+    threading.Thread(target=submit, daemon=True).start()
+    return done
+
+
+def test_submit_blocks_while_the_byte_budget_is_used(server):
+    writer, release = blocked_writer(server, size=60, max_bytes=100)
+    second = submit_in_thread(writer, lambda: None, size=60)
+
+    assert not second.wait(0.2)
+    assert writer.stats()['pending_bytes'] == 60
+
+    release.set()
+    assert second.wait(5)
+    writer.flush()
+    assert writer.stats()['pending_bytes'] == 0
+    assert writer.stats()['written'] == 2
+
+
+def test_payloads_within_the_budget_do_not_block(server):
+    writer, release = blocked_writer(server, size=40, max_bytes=100)
+    assert submit_in_thread(writer, lambda: None, size=60).wait(5)
+    assert writer.stats()['pending_bytes'] == 100
+    release.set()
+    writer.flush()
+    assert writer.stats()['pending_bytes'] == 0
+
+
+def test_an_oversized_payload_waits_for_an_empty_queue(server):
+    writer, release = blocked_writer(server, size=10, max_bytes=100)
+    oversized = submit_in_thread(writer, lambda: None, size=500)
+    assert not oversized.wait(0.2)
+    release.set()
+    assert oversized.wait(5)
+    writer.flush()
+    assert writer.stats()['pending_bytes'] == 0
+
+
+def test_item_bound_and_write_order(server, tmp_path):
+    # The writer thread holds the first job, so two more fill the queue
+    writer, release = blocked_writer(server, max_items=2)
+    writer.write_text(str(tmp_path / 'a.txt'), 'a')
+    writer.write_text(str(tmp_path / 'a.txt'), 'b')
+    third = submit_in_thread(writer, writer._write_text, str(tmp_path / 'a.txt'), 'c')
+    assert not third.wait(0.2)
+
+    release.set()
+    assert third.wait(5)
+    writer.flush()
+    assert (tmp_path / 'a.txt').read_text(encoding='utf-8') == 'c'
+
+
+def test_failed_writes_are_counted_and_do_not_stop_the_writer(server, tmp_path):
+    writer = server.BackgroundWriter(10, 'fsync', max_bytes=100)
+    writer.write_text(str(tmp_path / 'missing' / 'x.txt'), 'lost')
+    writer.write_json(str(tmp_path / 'ok.json'), {'field': 'email'})
+    writer.flush()
+    stats = writer.stats()
+    assert (stats['written'], stats['errors'], stats['pending_bytes']) == (1, 1, 0)
+    assert '"field": "email"' in (tmp_path / 'ok.json').read_text(encoding='utf-8')
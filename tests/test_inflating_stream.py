@@ -0,0 +1,72 @@
+import gzip
+import io
+import json
+import os
+import zlib
+
+import pytest
+from werkzeug.exceptions import BadRequest, RequestEntityTooLarge
+
+PAYLOAD = os.urandom(50 * 1024) + b'{"html": "<input>"}' * 20000
+
+
+def compress(data, encoding):
+    if encoding == 'gzip':
+        return gzip.compress(data)
+    if encoding == 'zlib':
+        return zlib.compress(data)
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def inflate(server, body, encoding='gzip', max_bytes=10 * len(PAYLOAD), length=True):
+    stream = server.InflatingStream(io.BytesIO(body), len(body) if length else None,
+                                    'gzip' if encoding == 'gzip' else 'deflate', max_bytes)
+    return io.BufferedReader(stream).read()
+
+
+@pytest.mark.parametrize('encoding', ['gzip', 'zlib', 'raw'])
+@pytest.mark.parametrize('length', [True, False])
+def test_bodies_are_inflated(server, encoding, length):
+    assert inflate(server, compress(PAYLOAD, encoding), encoding, length=length) == PAYLOAD
+
+
+def test_inflating_stops_at_the_size_limit(server):
+    # 256 MB of zeros compress to a few hundred KB
+    bomb = gzip.compress(bytes(256 * 1024 * 1024), compresslevel=9)
+    stream = server.InflatingStream(io.BytesIO(bomb), len(bomb), 'gzip', 1024 * 1024)
+    with pytest.raises(RequestEntityTooLarge):
+        while stream.read(64 * 1024):
+            pass
+    # Cut off within one read of the limit, not after inflating everything
+    assert stream.produced <= 1024 * 1024 + 64 * 1024
+
+
+def test_a_body_of_exactly_the_limit_is_accepted(server):
+    assert inflate(server, gzip.compress(PAYLOAD), max_bytes=len(PAYLOAD)) == PAYLOAD
+    with pytest.raises(RequestEntityTooLarge):
+        inflate(server, gzip.compress(PAYLOAD), max_bytes=len(PAYLOAD) - 1)
+
+
+def test_truncated_and_corrupt_bodies_are_bad_requests(server):
+    body = gzip.compress(PAYLOAD)
+    with pytest.raises(BadRequest):
+        inflate(server, body[:len(body) // 2])
+    with pytest.raises(BadRequest):
+        inflate(server, b'\x1f\x8b' + os.urandom(1000))
+
+
+def test_snapshot_bodies_are_cut_off_at_the_snapshot_limit(server, monkeypatch):
+    monkeypatch.setattr(server, 'SNAPSHOT_MAX_BODY_BYTES', 64 * 1024)
+    body = gzip.compress(json.dumps({'eventType': 'click', 'html': 'x' * (1024 * 1024)}).encode())
+    headers = {'Content-Encoding': 'gzip', 'Content-Type': 'application/json'}
+    with server.app.test_client() as client:
+        assert client.post('/snapshot', data=body, headers=headers).status_code == 413
+
+        confirmation = {'field': 'email', 'time': 1, 'url': 'http://example.com/form',
+                        'note': 'x' * (128 * 1024)}
+        response = client.post('/confirm_suggestion', headers=headers,
+                               data=gzip.compress(json.dumps(confirmation).encode()))
+        assert response.status_code == 200
+        assert response.get_json()['field'] == 'email'
+    server.background_writer.flush()
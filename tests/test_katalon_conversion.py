@@ -0,0 +1,94 @@
+import hashlib
+import random
+
+import pytest
+
+EXTENSION_TYPES = ['suggest_inputs_start', 'suggest_inputs_complete', 'suggestion_question_mark_click',
+                   'suggestion_modal_open', 'suggestion_modal_confirm', 'suggestion_modal_submit_success']
+ELEMENT_IDS = ['edit-range', 'edit-examples0', 'edit-confirm', 'suggest-inputs', 'input-suggestion-modal-x',
+               'xedit-range', 'email', 'name', '', 'edit', 'suggest']
+
+
+def build_events(count, seed):
+    """A recording mixing page actions with the extension's own events"""
+    rng = random.Random(seed)
+    now = 1700000000000
+    events = []
+    for _ in range(count):
+        # Repeated timestamps are common when events fire together
+        now += rng.choice([0, 0, 40, 300, 900, 1100, 2500, 15000])
+        roll = rng.random()
+        if roll < 0.25:
+            event = {'type': rng.choice(EXTENSION_TYPES), 'time': now, 'url': 'popup'}
+            if rng.random() < 0.8:
+                event['duration_ms'] = rng.choice(
+                    [rng.randint(100, 5000), round(rng.uniform(100, 5000), 3), 0.1])
+            if rng.random() < 0.1:
+                # Logged out of order
+                event['time'] = now - rng.randint(0, 3000)
+            if rng.random() < 0.05:
+                del event['time']
+        elif roll < 0.3:
+            event = {'type': 'pageload', 'time': now,
+                     'url': f'https://example.com/page{rng.randint(1, 5)}'}
+        elif roll < 0.4:
+            event = {'type': 'verification_command', 'time': now, 'command': 'verifyText',
+                     'target': f'xpath=//span[{rng.randint(1, 3)}]', 'value': 'ok',
+                     'url': 'https://example.com/form'}
+        else:
+            event = {'type': rng.choice(['click', 'change', 'submit', 'focus']), 'time': now,
+                     'tag': rng.choice(['INPUT', 'TEXTAREA', 'BUTTON', 'SELECT', 'FORM']),
+                     'id': rng.choice(ELEMENT_IDS), 'xpath': rng.choice(['', '//form/input[2]']),
+                     'value': rng.choice(['', 'ann@example.com', 'علی']),
+                     'url': rng.choice(['https://example.com/form', 'chrome-extension://abc/popup.html'])}
+        events.append(event)
+    return events
+
+
+# sha256 of the output of the original convert_to_katalon_format, which
+# rescanned the whole log for every kept event, for build_events(1500, seed)
+ORIGINAL_DIGESTS = {
+    0: '9097c6aae9a9b00bdfcde2b9f2148cbf5aca464ea461a86eb7254775e3c6b39c',
+    1: 'd2a6e38cd239214daafaf50cf92a0f254facca2fbae107a9dd5366136337e0ff',
+    2: 'dc542f6412892419f6c83d25c555ea8edb2ccd091fbc118516b8602f8f908885',
+    3: 'dbd767bbdf414cef3c67dcab52d854388e5ad92a6024c080878e9a9d72ef8441',
+}
+
+
+def scan_between(server, events, start, end):
+    """The original duration lookup: scan every event"""
+    total = 0
+    for event in events:
+        if start < event.get('time', 0) < end and event.get('type', '') in server.KATALON_EXTENSION_EVENTS:
+            if 'duration_ms' in event:
+                total += event['duration_ms']
+    return total
+
+
+@pytest.mark.parametrize('seed', sorted(ORIGINAL_DIGESTS))
+def test_output_is_identical_to_the_original_conversion(server, seed):
+    html = server.convert_to_katalon_format(build_events(1500, seed))
+    assert hashlib.sha256(html.encode()).hexdigest() == ORIGINAL_DIGESTS[seed]
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_extension_durations_match_a_scan(server, seed):
+    rng = random.Random(seed)
+    events = build_events(300, seed)
+    if seed % 2:
+        # Whole milliseconds only, which takes the prefix sum path
+        for event in events:
+            if 'duration_ms' in event:
+                event['duration_ms'] = int(event['duration_ms'])
+    durations = server.ExtensionDurations(events)
+    times = [event['time'] for event in events if 'time' in event]
+    for _ in range(200):
+        start, end = sorted(rng.sample(times, 2))
+        start += rng.choice([-1, 0, 1])
+        assert durations.between(start, end) == scan_between(server, events, start, end)
+
+
+def test_extension_element_matcher_matches_prefixes(server):
+    for element_id in ELEMENT_IDS + ['edit-submit-2', 'input-suggestion-modal', 'Edit-range', ' edit-range']:
+        expected = any(element_id.startswith(prefix) for prefix in server.KATALON_EXTENSION_ELEMENT_IDS)
+        assert bool(server.extension_element_matcher.match(element_id)) == expected
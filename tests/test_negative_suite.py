@@ -0,0 +1,49 @@
+import csv
+import os
+import time
+
+KATALON_HTML = """<html><body><table>
+<thead><tr><td>Command</td><td>Target</td><td>Value</td></tr></thead>
+<tbody>
+<tr><td>open</td><td>http://example.com/form</td><td></td></tr>
+<tr><td>type</td><td>id=email</td><td>ann@example.com</td></tr>
+<tr><td>type</td><td>name=age</td><td>42</td></tr>
+<tr><td>type</td><td>id=city</td><td>Oslo</td></tr>
+</tbody></table></body></html>"""
+
+
+def read_csv(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))
+
+
+def test_unconfirmed_fields_use_latest_suggestion_bad_examples(server, monkeypatch):
+    monkeypatch.setattr(server, 'generate_examples_for_field',
+                        lambda target, field_type, original_value, count: [
+                            f"{original_value}_{i}" for i in range(count)])
+    os.makedirs(server.RUN_SAVE_DIR, exist_ok=True)
+    katalon_path = os.path.join(server.RUN_SAVE_DIR, 'katalon_negative.html')
+    with open(katalon_path, 'w', encoding='utf-8') as f:
+        f.write(KATALON_HTML)
+
+    # Only /suggest_inputs results, no confirmations or updates; the newer
+    # result replaces the older one, and 'age' is matched by its name
+    now = int(time.time() * 1000)
+    server.run_store.add_suggestions(server.RUN_KEY, now, [
+        {'id': 'email', 'name': 'email', 'bad_examples': ['stale']}])
+    server.run_store.add_suggestions(server.RUN_KEY, now + 1, [
+        {'id': 'email', 'name': 'email', 'bad_examples': ['not-an-email', '']},
+        {'id': '', 'name': 'age', 'bad_examples': ['-1']}])
+
+    output_path = os.path.join(server.RUN_SAVE_DIR, 'cases.csv')
+    negative_path = os.path.join(server.RUN_SAVE_DIR, 'cases_negative.csv')
+    summary = server.generate_test_cases_from_katalon(
+        katalon_path, output_path, 4, negative_csv_path=negative_path)
+
+    assert summary is not None
+    assert read_csv(negative_path) == [
+        ['faulted_field', 'email', 'age', 'city'],
+        ['email', 'not-an-email', '42', 'Oslo'],
+        ['email', '', '42', 'Oslo'],
+        ['age', 'ann@example.com', '-1', 'Oslo'],
+    ]
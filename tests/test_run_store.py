@@ -0,0 +1,29 @@
+import json
+
+
+def write_confirmation(run_dir, field, range_):
+    run_dir.mkdir(parents=True)
+    confirmation = {'field': field, 'time': 1700000000, 'url': 'http://example.com/form',
+                    'range': range_, 'suggestion': {'examples': ['a']}}
+    (run_dir / f'confirmation_1700000000_{field}_form.json').write_text(
+        json.dumps(confirmation), encoding='utf-8')
+
+
+def test_same_named_runs_under_different_roots_stay_apart(server, tmp_path):
+    first = tmp_path / 'laptop' / 'run_1700000000_abcdef12'
+    second = tmp_path / 'desktop' / 'run_1700000000_abcdef12'
+    write_confirmation(first, 'email', 'valid email')
+    write_confirmation(second, 'email', 'company email only')
+
+    assert server.find_confirmation_for_field(str(first), 'id=email')['range'] == 'valid email'
+    assert server.find_confirmation_for_field(str(second), 'id=email')['range'] == 'company email only'
+    assert server.run_store.ensure_run(str(first)) != server.run_store.ensure_run(str(second))
+
+
+def test_a_run_is_found_by_any_path_to_its_folder(server, tmp_path):
+    run_dir = tmp_path / 'root' / 'run_1700000001_abcdef12'
+    write_confirmation(run_dir, 'phone', '11 digits')
+    relative = tmp_path / 'root' / '..' / 'root' / 'run_1700000001_abcdef12'
+
+    assert server.run_store.ensure_run(str(relative)) == server.run_store.ensure_run(str(run_dir))
+    assert server.find_confirmation_for_field(str(relative), 'id=phone')['range'] == '11 digits'
@@ -0,0 +1,103 @@
+import random
+from itertools import combinations, product
+
+import pytest
+
+
+def uncovered_combinations(rows, sizes, strength):
+    """t-way value combinations of sizes that no row contains"""
+    missing = []
+    for fields in combinations(range(len(sizes)), strength):
+        seen = {tuple(row[f] for f in fields) for row in rows}
+        for values in product(*(range(sizes[f]) for f in fields)):
+            if values not in seen:
+                missing.append((fields, values))
+    return missing
+
+
+@pytest.mark.parametrize('strength', [1, 2, 3])
+@pytest.mark.parametrize('seed', range(8))
+def test_covering_array_covers_every_t_way_combination(server, strength, seed):
+    rng = random.Random(seed)
+    sizes = [rng.randint(1, 5) for _ in range(rng.randint(strength, 7))]
+    rows = server.covering_array(sizes, strength)
+
+    assert all(len(row) == len(sizes) for row in rows)
+    assert all(0 <= value < size for row in rows for value, size in zip(row, sizes))
+    assert uncovered_combinations(rows, sizes, strength) == []
+
+
+def test_pairwise_is_much_smaller_than_the_product(server):
+    sizes = [8] * 12
+    rows = server.covering_array(sizes, 2)
+    assert uncovered_combinations(rows, sizes, 2) == []
+    # At least 8 * 8 rows are needed; IPOG stays within a small factor
+    assert 64 <= len(rows) <= 200
+
+
+def test_covering_array_edge_cases(server):
+    assert server.covering_array([], 2) == []
+    assert server.covering_array([3, 0, 2], 2) == []
+    # Strength above the field count is the full product
+    assert sorted(server.covering_array([2, 3], 5)) == list(product(range(2), range(3)))
+    assert server.covering_array([3, 4], 2) == server.covering_array([3, 4], 2)
+
+
+def encode_combination(row, examples_lists):
+    """Inverse of decode_combination for rows of distinct examples"""
+    index = 0
+    for value, examples in zip(row, examples_lists):
+        index = index * len(examples) + examples.index(value)
+    return index
+
+
+def test_decode_combination_follows_the_product_order(server):
+    examples_lists = [['a', 'b'], ['x'], ['1', '2', '3'], ['p', 'q']]
+    rows = [list(row) for row in product(*examples_lists)]
+    assert [server.decode_combination(i, examples_lists) for i in range(len(rows))] == rows
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_decode_combination_round_trips(server, seed):
+    rng = random.Random(seed)
+    examples_lists = [[f'f{field}v{value}' for value in range(rng.randint(1, 9))]
+                      for field in range(40)]
+    space = 1
+    for examples in examples_lists:
+        space *= len(examples)
+    for index in [0, space - 1] + [rng.randrange(space) for _ in range(100)]:
+        row = server.decode_combination(index, examples_lists)
+        assert encode_combination(row, examples_lists) == index
+
+
+@pytest.mark.parametrize('space', [10, 1000, 2 ** 62, 9 ** 40])
+def test_sampled_indices_are_distinct_in_range_and_reproducible(server, space):
+    count = min(space, 50)
+    picked = server.sample_combination_indices(space, count, seed=7)
+    assert len(picked) == count == len(set(picked))
+    assert all(0 <= index < space for index in picked)
+    assert picked == server.sample_combination_indices(space, count, seed=7)
+    assert picked != server.sample_combination_indices(space, count, seed=8) or space == count
+
+
+def test_sample_strategy_handles_a_combination_space_beyond_sys_maxsize(server, monkeypatch, tmp_path):
+    # 30 fields of 9 examples: 9 ** 30 combinations, far past sys.maxsize
+    fields = [f'field{i}' for i in range(30)]
+    rows = ''.join(f'<tr><td>type</td><td>id={field}</td><td>v{i}</td></tr>'
+                   for i, field in enumerate(fields))
+    katalon_path = tmp_path / 'katalon_test.html'
+    katalon_path.write_text(f'<table><thead><tr><td>x</td></tr></thead>{rows}</table>',
+                            encoding='utf-8')
+    monkeypatch.setattr(server, 'generate_examples_for_field',
+                        lambda target, field_type, original_value, count: [
+                            f'{original_value}_{i}' for i in range(9)])
+    monkeypatch.setattr(server, 'find_confirmation_for_field', lambda katalon_dir, target: None)
+
+    output_path = tmp_path / 'cases.csv'
+    summary = server.generate_test_cases_from_katalon(
+        str(katalon_path), str(output_path), 25, strategy='sample', seed=3)
+
+    assert summary['combination_space'] == 9 ** 30
+    lines = output_path.read_text(encoding='utf-8').splitlines()
+    assert lines[0].split(',') == fields
+    assert len(lines) == 26 == len(set(lines))
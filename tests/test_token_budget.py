@@ -0,0 +1,132 @@
+import random
+
+import pytest
+from bs4 import BeautifulSoup
+
+TAGS = ['div', 'section', 'p', 'span', 'label', 'form']
+WORDS = ['name', 'email', 'نام', 'شماره', 'address', 'phone', 'city', '12345', 'کد', 'submit']
+
+
+def build_page(seed, elements=120):
+    """A random nested page whose elements are all distinct (unique ids)"""
+    rng = random.Random(seed)
+    counter = [0]
+
+    def node(depth):
+        counter[0] += 1
+        if depth > 4 or rng.random() < 0.3:
+            return (f'<input id="i{counter[0]}" name="{rng.choice(WORDS)}" '
+                    f'placeholder="{" ".join(rng.choices(WORDS, k=rng.randint(1, 4)))}">')
+        tag = rng.choice(TAGS)
+        children = ''.join(node(depth + 1) for _ in range(rng.randint(1, 4))
+                           if counter[0] < elements)
+        text = ' '.join(rng.choices(WORDS, k=rng.randint(0, 6)))
+        return f'<{tag} id="e{counter[0]}" class="c{depth}">{text}{children}</{tag}>'
+
+    return f'<html><body>{"".join(node(0) for _ in range(4))}</body></html>'
+
+
+def reference_content_before(server, soup, target_element, max_tokens):
+    """get_content_before as it was before DomIndex: rescans the page"""
+    all_elements = soup.find_all()
+    before_elements = all_elements[:all_elements.index(target_element)]
+    before_elements.reverse()
+    collected, current = [], 0
+    for element in before_elements:
+        element_html = str(element)
+        element_tokens = server.count_tokens(element_html)
+        if current + element_tokens > max_tokens:
+            break
+        collected.insert(0, element_html)
+        current += element_tokens
+    return ''.join(collected)
+
+
+def reference_content_after(server, soup, target_element, max_tokens):
+    """get_content_after as it was before DomIndex"""
+    all_elements = soup.find_all()
+    after_elements = all_elements[all_elements.index(target_element) + 1:]
+    collected, current = [], 0
+    for element in after_elements:
+        element_html = str(element)
+        element_tokens = server.count_tokens(element_html)
+        if current + element_tokens > max_tokens:
+            break
+        collected.append(element_html)
+        current += element_tokens
+    return ''.join(collected)
+
+
+def reference_truncate_with_context(server, soup, target_element, max_tokens):
+    """truncate_with_context as it was before DomIndex"""
+    parents = server.preserve_structure(soup, target_element)
+    essential_html = str(target_element)
+    token_count = server.count_tokens(essential_html)
+    if token_count >= max_tokens:
+        return None
+    for parent in parents:
+        parent_copy = soup.new_tag(parent.name)
+        for attr_name, attr_value in parent.attrs.items():
+            parent_copy[attr_name] = attr_value
+        temp_structure = str(parent_copy).replace('></', f'>{essential_html}</')
+        if server.count_tokens(temp_structure) < max_tokens * 0.8:
+            essential_html = temp_structure
+            token_count = server.count_tokens(essential_html)
+    remaining_tokens = max_tokens - token_count
+    before_content = reference_content_before(server, soup, target_element, remaining_tokens // 2)
+    after_content = reference_content_after(server, soup, target_element, remaining_tokens // 2)
+    if before_content or after_content:
+        return str(BeautifulSoup(f"{before_content}{essential_html}{after_content}", 'html.parser'))
+    return essential_html
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_truncate_with_context_matches_page_rescan(server, seed):
+    soup = BeautifulSoup(build_page(seed, elements=80), 'html.parser')
+    dom_index = server.DomIndex(soup)
+    for target in soup.find_all('input'):
+        for max_tokens in (20, 150, 600, 5000):
+            assert server.truncate_with_context(soup, target, max_tokens, dom_index) == \
+                reference_truncate_with_context(server, soup, target, max_tokens)
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_dom_index_windows_match_page_rescan(server, seed):
+    soup = BeautifulSoup(build_page(seed), 'html.parser')
+    dom_index = server.DomIndex(soup)
+    for element in soup.find_all():
+        for max_tokens in (0, 10, 100, 1000):
+            assert dom_index.content_before(element, max_tokens) == \
+                reference_content_before(server, soup, element, max_tokens)
+            assert dom_index.content_after(element, max_tokens) == \
+                reference_content_after(server, soup, element, max_tokens)
+
+
+def test_estimate_mode_agrees_with_exact_counts(server, monkeypatch):
+    texts = [build_page(seed, elements=size)
+             for seed, size in zip(range(40), [10, 40, 80, 160] * 10)]
+    params = server.calibrate_token_estimator(texts)
+    monkeypatch.setitem(server.TOKEN_ESTIMATOR, 'ascii_chars_per_token', params['ascii_chars_per_token'])
+    monkeypatch.setitem(server.TOKEN_ESTIMATOR, 'non_ascii_bytes_per_token', params['non_ascii_bytes_per_token'])
+    monkeypatch.setitem(server.TOKEN_ESTIMATOR, 'margin', params['margin'])
+
+    for text in texts:
+        exact = server.count_tokens(text)
+        for budget in (exact // 3, exact - 1, exact, exact + 1, exact * 3):
+            assert server.exceeds_token_budget(text, budget, mode='estimate') == (exact > budget)
+
+
+def test_estimator_counters_do_not_lose_updates_across_threads(server, monkeypatch):
+    monkeypatch.setitem(server.token_estimator_stats, 'estimates', 0)
+    monkeypatch.setitem(server.token_estimator_stats, 'exact_fallbacks', 0)
+    text = build_page(1, elements=20)
+    exact = server.count_tokens(text)
+    # One budget far from the count, one at it (which needs the exact count)
+    budgets = [exact * 10, exact] * 2000
+
+    results = server.run_concurrently(
+        lambda budget: server.exceeds_token_budget(text, budget, mode='estimate'), budgets, max_workers=8)
+
+    assert [result for result, _ in results] == [exact > budget for budget in budgets]
+    assert server.token_estimator_stats['estimates'] == len(budgets)
+    assert server.token_estimator_stats['exact_fallbacks'] == len(budgets) // 2